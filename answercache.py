@@ -0,0 +1,141 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from rapidfuzz import fuzz, process
+
+
+class AnswerCache:
+    """LRU cache of generated chat answers.
+
+    Entries are keyed by the normalized question plus a hash of the exact facts
+    that were placed in the prompt, so an answer is only reused for the same
+    knowledge. An answer whose prompt held earlier messages of a session is
+    stored for that session only; the others are shared. A question within
+    `similarity` (RapidFuzz score, 0-100) of a cached one asked against the same
+    facts also hits. Graph mutations evict the entries whose facts they touch,
+    like QueryCache.
+    """
+
+    ANY = ("any",)
+
+    def __init__(self, max_entries=1000, similarity=92):
+        self.max_entries = max_entries
+        self.similarity = similarity  # None or 100: exact matches only
+        self._entries = OrderedDict()  # (fact_hash, session, question) -> (answer, tags, question as asked)
+        self._questions = {}  # (fact_hash, session) -> list of normalized questions
+        self._tags = {}  # tag -> set of keys
+        self._hashed = (None, None)  # (facts list, hash) of the last fact set hashed
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def normalize(question):
+        return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+    def fact_set_hash(self, facts):
+        """Hash of the fields the prompt shows (message_id stands for the body it hashes).
+        The fact list returned by the query cache is the same object until the graph
+        changes, so repeated calls are free."""
+        facts_seen, digest = self._hashed
+        if facts_seen is facts:
+            return digest
+        h = hashlib.blake2b(digest_size=16)
+        for fact in facts:
+            h.update("\x1f".join(str(fact.get(field)) for field in
+                                 ("subject", "predicate", "object", "created_at", "message_id")).encode("utf-8"))
+            h.update(b"\x1e")
+        digest = h.hexdigest()
+        self._hashed = (facts, digest)
+        return digest
+
+    def get(self, question, fact_hash, session=None, exact=False):
+        """The answer cached for `question` over `fact_hash`, for `session` or shared.
+
+        With `exact`, only the very same message text hits: a message that merely
+        normalizes to a cached question ("alice likes bob." for "alice likes
+        bob?") may not be a question at all, so only lookups made after intent
+        analysis found a plain query should accept near matches.
+        """
+        asked = question.strip()
+        question = self.normalize(question)
+        with self._lock:
+            for scope in ((fact_hash, session), (fact_hash, None)) if session is not None else ((fact_hash, None),):
+                key = scope + (question,)
+                entry = self._entries.get(key)
+                if entry is not None and exact and entry[2] != asked:
+                    entry = None
+                if entry is None and not exact and self.similarity and self.similarity < 100:
+                    match = process.extractOne(question, self._questions.get(scope, ()),
+                                               scorer=fuzz.token_sort_ratio, score_cutoff=self.similarity)
+                    if match:
+                        key = scope + (match[0],)
+                        entry = self._entries.get(key)
+                        if entry is not None:
+                            self.near_hits += 1
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, question, fact_hash, answer, session=None, tags=(ANY,)):
+        """Cache `answer`; pass the session when its prompt held that session's messages"""
+        key = (fact_hash, session, self.normalize(question))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (answer, tags, question.strip())
+            self._questions.setdefault(key[:2], []).append(key[2])
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        answer, tags, _ = self._entries.pop(key)
+        questions = self._questions.get(key[:2])
+        if questions is not None:
+            questions.remove(key[2])
+            if not questions:
+                del self._questions[key[:2]]
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, subject=None, predicate=None, obj=None):
+        """Graph listener: evict answers built from facts touching (subject, predicate, object)"""
+        with self._lock:
+            if subject is None and predicate is None and obj is None:
+                keys = list(self._entries)
+            else:
+                keys = set()
+                for tag in (self.ANY, ("entity", subject), ("entity", obj), ("predicate", predicate)):
+                    keys.update(self._tags.get(tag, ()))
+            for key in keys:
+                if key in self._entries:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations
+            }
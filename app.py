@@ -1,46 +1,357 @@
 import time
 import json
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, make_response, Response, stream_with_context, g
 from flask_cors import CORS
-from utils.docker import ensure_docker_running, start_neo4j_container
+from flask_compress import Compress
+from functools import wraps
+from utils.docker import bootstrap_neo4j, DEFAULT_NEO4J_URI
 from knowledgegraph import KnowledgeGraph
+from storage import create_backend
+from graphtraversal import GraphTraversal
+from subgraph import SubgraphBuilder
+from graphlayout import GraphLayout
+from graphanalytics import GraphAnalytics
+from jobs import JobManager, JobStore
+from conversationmemory import ConversationMemory
+from answercache import AnswerCache
+import bulkio
+import chatprompt
+import metrics
+import tempfile
 from languagemodel import LocalLLM
-from openai import OpenAI
-from utils.utils import debug_print
+import llmclient
+from utils.log import configure_logging, get_logger, restart_after_fork
+from utils.timestamps import parse_bound
 import difflib
 from datetime import datetime
-import re
 import os
-from collections import deque
+import re
+import threading
+import uuid
 
-OPENAI_API_KEY = 0
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+configure_logging()
+log = get_logger(__name__)
 
 app = Flask(__name__)
-CORS(app)  
-
-short_term_memory = deque(maxlen=20)
+CORS(app, expose_headers=["ETag"])
+# gzip/brotli for large JSON bodies; small responses are sent as-is
+app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+app.config["COMPRESS_MIMETYPES"] = ["application/json", "text/html", "text/css", "application/javascript"]
+app.config["COMPRESS_MIN_SIZE"] = 1024
+Compress(app)
 
 # initialisation
-ensure_docker_running()
-start_neo4j_container()
-kg = KnowledgeGraph()
-# import_data = kg.import_csv_once('/Users/trixieliew/Desktop/social_media_kg_project/data/reddit_vaccine_discourse.csv')  # Import data from CSV
+# Heavy components are created lazily on first use so that importing the app
+# (and forking gunicorn workers) stays fast. See gunicorn.conf.py for preloading.
+NEO4J_URI = os.getenv("NEO4J_URI")
+NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+NEO4J_READY_TIMEOUT = float(os.getenv("NEO4J_READY_TIMEOUT", "60"))
+# neo4j (default), sqlite (embedded file, no Docker) or memory (process-local, nothing persisted)
+STORAGE_BACKEND = os.getenv("KG_BACKEND", "neo4j")
+SQLITE_PATH = os.getenv("KG_SQLITE_PATH", "knowledgegraph.db")
+# per-session chat history, shared by all workers
+CHAT_MEMORY_DB = os.getenv("CHAT_MEMORY_DB", "conversations.db")
+CHAT_MEMORY_MESSAGES = int(os.getenv("CHAT_MEMORY_MESSAGES", "50"))
+# answers reused for the same question over the same facts; similarity 100 disables near-duplicate hits
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "92"))
+# processes computing PageRank, components and communities of the analytics job (default: up to 3)
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", "0")) or None
+# required as X-Admin-Token on /api/admin/*; when unset those endpoints only answer localhost
+ADMIN_TOKEN = os.getenv("KG_ADMIN_TOKEN")
+
+_kg = None
+_llm = None
+_traversal = None
+_layout = None
+_analytics = None
+_jobs = None
+_memory = None
+_answers = None
+_kg_lock = threading.Lock()
+_llm_lock = threading.Lock()
+_jobs_lock = threading.Lock()
+_memory_lock = threading.Lock()
+
+def get_kg():
+    """Return the shared KnowledgeGraph, opening its storage backend on first use.
+    Raises RuntimeError while the backend cannot be opened."""
+    global _kg, _answers
+    if _kg is None:
+        with _kg_lock:
+            if _kg is None:
+                if STORAGE_BACKEND == "neo4j":
+                    if not bootstrap_neo4j(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, timeout=NEO4J_READY_TIMEOUT):
+                        raise RuntimeError("Neo4j is not reachable")
+                    graph = KnowledgeGraph(neo4j_uri=NEO4J_URI or DEFAULT_NEO4J_URI, user=NEO4J_USER, password=NEO4J_PASSWORD)
+                elif STORAGE_BACKEND == "sqlite":
+                    graph = KnowledgeGraph(store=create_backend("sqlite", path=SQLITE_PATH))
+                else:
+                    graph = KnowledgeGraph(store=create_backend(STORAGE_BACKEND))
+                if graph.store is None:
+                    # not cached: the next call tries to open the backend again
+                    raise RuntimeError(f"{STORAGE_BACKEND} storage backend is unavailable")
+                metrics.instrument_store(graph.store)
+                _answers = AnswerCache(max_entries=ANSWER_CACHE_SIZE, similarity=ANSWER_CACHE_SIMILARITY)
+                graph.add_listener(_answers.invalidate)
+                _kg = graph
+                # Import data from CSV as a background job (reads a server path, so not submittable through /api/jobs):
+                # get_jobs().submit("import_csv", {"csv_path": ".../reddit_vaccine_discourse.csv"})
+    return _kg
+
+def get_answers():
+    """Return the chat answer cache of the current KnowledgeGraph"""
+    get_kg()
+    return _answers
+
+def get_traversal():
+    """Return the traversal helper bound to the current KnowledgeGraph"""
+    global _traversal
+    graph = get_kg()
+    if _traversal is None or _traversal.kg is not graph:
+        _traversal = GraphTraversal(graph)
+    return _traversal
+
+def get_layout():
+    """Return the cached server-side layout bound to the current KnowledgeGraph"""
+    global _layout
+    graph = get_kg()
+    if _layout is None or _layout.kg is not graph:
+        _layout = GraphLayout(graph)
+    return _layout
+
+def get_analytics():
+    """Return the graph analytics (and its process pool) bound to the current KnowledgeGraph"""
+    global _analytics
+    graph = get_kg()
+    if _analytics is None or _analytics.kg is not graph:
+        if _analytics is not None:
+            _analytics.close()
+        _analytics = GraphAnalytics(graph, workers=ANALYTICS_WORKERS)
+    return _analytics
+
+def _import_csv_job(ctx, csv_path, max_rows=100):
+    return get_kg().import_csv_once(csv_path, max_rows=max_rows, progress=ctx.progress, should_stop=ctx.cancelled)
+
+def _sync_job(ctx, batch_size=1000, limit=None):
+    edges = get_kg().sync_from_store(batch_size=batch_size, limit=limit, progress=ctx.progress, should_stop=ctx.cancelled)
+    return {"edges": edges}
+
+def _purge_job(ctx, cutoff, batch_size=10000):
+    return get_kg().purge_store(cutoff, batch_size=batch_size, progress=ctx.progress, should_stop=ctx.cancelled)
+
+def _discard_purge(cutoff, **_):
+    # cancelled while queued: nothing was deleted, so the hidden facts come back
+    get_kg().end_purge(cutoff, restore=True)
+
+def _migrate_timestamps_job(ctx, batch_size=10000):
+    return get_kg().migrate_timestamps(batch_size=batch_size, progress=ctx.progress, should_stop=ctx.cancelled)
+
+def _merge_entities_job(ctx, threshold=90, batch_size=500, dry_run=False):
+    return get_kg().merge_duplicate_entities(threshold=threshold, batch_size=batch_size, dry_run=dry_run,
+                                             progress=ctx.progress, should_stop=ctx.cancelled)
+
+def _migrate_messages_job(ctx, batch_size=10000):
+    return get_kg().migrate_messages(batch_size=batch_size, progress=ctx.progress, should_stop=ctx.cancelled)
+
+def _analytics_job(ctx, predicates=None, alpha=0.85, resolution=1.0, top=20, batch_size=10000):
+    return get_analytics().run(predicates=predicates, alpha=float(alpha), resolution=float(resolution), top=int(top),
+                               batch_size=batch_size, progress=ctx.progress, should_stop=ctx.cancelled)
+
+def _spool_path(spool, format):
+    """File of an upload spooled by /api/import; only ids it generates resolve, never a client-chosen path"""
+    if not re.fullmatch(r"[0-9a-f]{32}", str(spool)) or format not in bulkio.FORMATS:
+        raise ValueError(f"Invalid import spool: {spool}")
+    return os.path.join(tempfile.gettempdir(), f"import-{spool}.{format}")
+
+def _discard_spool(spool, format, **_):
+    try:
+        os.remove(_spool_path(spool, format))
+    except FileNotFoundError:
+        pass
 
-llm = LocalLLM()  # Initialize LLM
+def _import_facts_job(ctx, spool, format, chunk_size=5000):
+    path = _spool_path(spool, format)
+    try:
+        return get_kg().bulk_add_facts(bulkio.decode(path, format, chunk_size), progress=ctx.progress, should_stop=ctx.cancelled)
+    finally:
+        os.remove(path)
+
+def get_jobs():
+    """Return the background job manager with the bulk operations registered"""
+    global _jobs
+    if _jobs is None:
+        with _jobs_lock:
+            if _jobs is None:
+                manager = JobManager(JobStore(os.getenv("JOBS_DB", "jobs.db")))
+                # one heavy job of each kind at a time keeps request threads responsive
+                # jobs reading server files are only submitted by the app itself
+                manager.register("import_csv", _import_csv_job, concurrency=1, internal=True)
+                manager.register("sync", _sync_job, concurrency=1)
+                manager.register("purge", _purge_job, concurrency=1, discard=_discard_purge)
+                manager.register("import_facts", _import_facts_job, concurrency=1, internal=True, discard=_discard_spool)
+                manager.register("migrate_timestamps", _migrate_timestamps_job, concurrency=1)
+                manager.register("merge_entities", _merge_entities_job, concurrency=1)
+                manager.register("migrate_messages", _migrate_messages_job, concurrency=1)
+                manager.register("analytics", _analytics_job, concurrency=1)
+                _jobs = manager
+    return _jobs
+
+def get_memory():
+    """Return the conversation memory store"""
+    global _memory
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                _memory = ConversationMemory(CHAT_MEMORY_DB, max_messages=CHAT_MEMORY_MESSAGES)
+    return _memory
+
+def get_llm():
+    """Return the shared LocalLLM, loading spaCy on first use"""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = LocalLLM()
+    return _llm
+
+def preload_components():
+    """Load fork-safe components once (in the gunicorn master) so workers share them copy-on-write"""
+    get_llm()
+
+def reset_after_fork():
+    """Drop connections inherited from the master; each worker opens its own storage connection"""
+    global _kg, _traversal, _layout, _jobs, _memory, _answers
+    _kg = None
+    _answers = None
+    _traversal = None
+    _layout = None
+    _jobs = None  # executor threads do not survive fork
+    _memory = None  # nor may SQLite connections be shared with the master
+    restart_after_fork()  # neither does the log listener thread
+    llmclient.reset_after_fork()
+
+def admin_only(view):
+    """Guard diagnostics endpoints with KG_ADMIN_TOKEN, or localhost when no token is configured"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN:
+            allowed = request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+        else:
+            allowed = request.remote_addr in ("127.0.0.1", "::1")
+        if not allowed:
+            return jsonify({"error": "Forbidden"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def time_window():
+    """(since, until) query parameters as canonical timestamps; raises ValueError"""
+    return parse_bound(request.args.get('since')), parse_bound(request.args.get('until'))
+
+# facts carry message_id; the body is fetched only when ?fields= asks for original_message
+FACT_FIELDS = ("id", "subject", "predicate", "object", "created_at", "src", "message_id", "version")
+MAX_MESSAGE_IDS = 1000
+
+def projection():
+    """Field list of the ?fields= query parameter (None: every field but original_message); raises ValueError"""
+    fields = [field.strip() for field in request.args.get('fields', '').split(',') if field.strip()]
+    if not fields:
+        return None
+    unknown = [field for field in fields if field not in FACT_FIELDS and field != "original_message"]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def project(facts, fields):
+    """Facts reduced to `fields`, with message bodies attached when requested"""
+    if fields is None:
+        return facts
+    if "original_message" in fields:
+        facts = get_kg().with_messages(facts)
+    return [{field: fact.get(field) for field in fields} for fact in facts]
+
+def versioned(view):
+    """Tag read responses with the graph version as ETag and answer 304 when it is unchanged"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # read the version before the data so a concurrent write can only make the tag older
+        etag = f"g{get_kg().get_version()}"
+        try:
+            window = [bound for bound in time_window() if bound]
+        except ValueError:
+            window = []  # the view answers 400
+        if window:
+            # a duration ("since=1h") moves with the clock, so the resolved window is part of the tag
+            etag += "-" + "-".join(re.sub(r"\D", "", bound) for bound in window)
+        # Flask-Compress suffixes the tag with the encoding, e.g. "g12:br"
+        matched = next((tag for tag in request.if_none_match if tag.split(':')[0] == etag), None)
+        if matched:
+            response = app.response_class(status=304)
+            response.set_etag(matched)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+metrics.register_graph_collector(lambda: _kg)
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        # label by route template, not the raw path, to keep cardinality bounded
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_LATENCY.labels(request.method, route, str(response.status_code)).observe(time.perf_counter() - start)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, mimetype=content_type)
 
 @app.route('/')
 def index():
     return render_template('index.html')
-    
+
+@app.route('/healthz', methods=['GET'])
+def liveness():
+    return jsonify({"status": "alive"}), 200
+
+@app.route('/readyz', methods=['GET'])
+def readiness():
+    try:
+        graph = get_kg()
+        if not graph.store:
+            return jsonify({"status": "not ready", "storage": STORAGE_BACKEND}), 503
+        graph.store.ping()
+    except Exception as e:
+        log.warning("Readiness check failed: %s", e)
+        return jsonify({"status": "not ready", "storage": STORAGE_BACKEND}), 503
+    return jsonify({"status": "ready", "storage": graph.store.name, "llm_loaded": _llm is not None}), 200
+
 # API endpoint with pagination
 @app.route('/api/facts', methods=['GET'])
+@versioned
 def get_facts():
     page = int(request.args.get('page', 1))
     page_size = int(request.args.get('page_size', 100))
     skip = (page - 1) * page_size
-    facts = kg.get_facts_batch(skip=skip, limit=page_size)
-    return jsonify(facts)
+    try:
+        since, until = time_window()
+        fields = projection()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    facts = get_kg().get_facts_batch(skip=skip, limit=page_size, since=since, until=until)
+    return jsonify(project(facts, fields))
 
 @app.route('/api/add_fact', methods=['POST'])
 def add_fact():
@@ -53,13 +364,13 @@ def add_fact():
         object_ = data.get('object')
         if not all([subject, predicate, object_]):
             return jsonify({"error": "Missing required fields (subject, predicate, object)", "refresh": False}), 400
-        success = kg.add_fact(subject, predicate, object_, src="Manual", original_message=None)
+        success = get_kg().add_fact(subject, predicate, object_, src="Manual", original_message=None)
         if success:
             return jsonify({"message": f"Fact added: {subject} {predicate} {object_}", "refresh": True}), 200
         else:
             return jsonify({"error": f"Fact already exists: {subject} {predicate} {object_}", "refresh": False}), 409  # Use 409 Conflict status
     except Exception as e:
-        debug_print(f"Internal server error in add_fact: {str(e)}")
+        log.exception("Internal server error in add_fact: %s", e)
         return jsonify({"error": f"Internal server error: {str(e)}", "refresh": False}), 500
 
 @app.route('/api/update_fact', methods=['POST'])
@@ -75,62 +386,227 @@ def update_fact():
         id = data.get('id')
         if not all([subject, old_predicate, old_object, new_predicate, id]):
             return jsonify({"error": "Missing required fields (subject, old_predicate, old_object, new_predicate, id)", "refresh": False}), 400
-        success = kg.update_fact(subject, old_predicate, old_object, new_predicate, new_src="Manual", new_original_message=None)
+        success = get_kg().update_fact(subject, old_predicate, old_object, new_predicate, new_src="Manual", new_original_message=None)
         if success:
             return jsonify({"message": f"Fact updated: {subject} {old_predicate} {old_object} (ID: {id}) to {subject} {new_predicate} {old_object}", "refresh": True}), 200
         return jsonify({"error": f"Update failed: {subject} {old_predicate} {old_object} (ID: {id}) not found or new predicate is same", "refresh": False}), 404
     except Exception as e:
-        debug_print(f"Internal server error in update_fact: {str(e)}")
+        log.exception("Internal server error in update_fact: %s", e)
         return jsonify({"error": f"Internal server error: {str(e)}", "refresh": False}), 500
 
 @app.route('/api/update_timeline', methods=['GET'])
+@versioned
 def update_timeline():
     subject = request.args.get('subject')
     object_ = request.args.get('object')
     id = request.args.get('id')
     if not all([subject, object_, id]):
         return jsonify({"error": "Missing required fields (subject, object, id)"}), 400
-    timeline = kg.get_update_timeline(subject, object_, id)
+    timeline = get_kg().get_update_timeline(subject, object_, id)
     return jsonify(timeline)
-    
 
+@app.route('/api/messages', methods=['GET', 'POST'])
+def get_messages():
+    """Message bodies by message_id: GET ?ids=a,b or POST {"ids": [...]}"""
+    if request.method == 'POST':
+        ids = (request.get_json(silent=True) or {}).get('ids')
+    else:
+        ids = [key for key in request.args.get('ids', '').split(',') if key]
+    if not isinstance(ids, list) or not ids:
+        return jsonify({"error": "ids must be a non-empty list of message ids"}), 400
+    if len(ids) > MAX_MESSAGE_IDS:
+        return jsonify({"error": f"At most {MAX_MESSAGE_IDS} ids per request"}), 400
+    response = jsonify(get_kg().messages(str(key) for key in ids))
+    if request.method == 'GET':
+        # a message id is the hash of its body, so a body never changes
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
 
 @app.route('/api/delete_fact', methods=['POST'])
 def delete_fact():
-    start_time = time.time()
-
+    # latency is recorded per route on /metrics
     data = request.get_json()
     subject = data.get('subject')
     predicate = data.get('predicate')
     object_ = data.get('object')
 
     if not all([subject, predicate, object_]):
-        duration = (time.time() - start_time) * 1000  # duration in milliseconds
-        print(f"[MONITOR] /api/delete_fact took {duration:.2f}ms (400 Missing fields)")
         return jsonify({"error": "Missing required fields", "refresh": False}), 400
 
-    success = kg.delete_fact(subject, predicate, object_)
-    duration = (time.time() - start_time) * 1000
+    success = get_kg().delete_fact(subject, predicate, object_)
 
     if success:
-        print(f"[MONITOR] /api/delete_fact took {duration:.2f}ms (200 OK)")
         return jsonify({"message": f"Fact deleted: {subject} {predicate} {object_}", "refresh": True})
 
-    print(f"[MONITOR] /api/delete_fact took {duration:.2f}ms (400 Not found)")
     return jsonify({"error": f"Delete failed: {subject} {predicate} {object_} not found", "refresh": False}), 400
 
+@app.route('/api/add_facts', methods=['POST'])
+def add_facts():
+    try:
+        data = request.get_json()
+        facts = data.get('facts') if isinstance(data, dict) else data
+        if not isinstance(facts, list) or not facts:
+            return jsonify({"error": "Request body must contain a non-empty list of facts", "refresh": False}), 400
+        results = get_kg().add_facts(facts, src="Manual", original_message=None)
+        added = sum(1 for r in results if r['status'] == 'added')
+        return jsonify({"message": f"Added {added} of {len(facts)} facts", "results": results, "refresh": added > 0}), 200
+    except Exception as e:
+        log.exception("Internal server error in add_facts: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}", "refresh": False}), 500
+
+@app.route('/api/update_facts', methods=['POST'])
+def update_facts():
+    try:
+        data = request.get_json()
+        updates = data.get('updates') if isinstance(data, dict) else data
+        if not isinstance(updates, list) or not updates:
+            return jsonify({"error": "Request body must contain a non-empty list of updates", "refresh": False}), 400
+        results = get_kg().update_facts(updates, new_src="Manual", new_original_message=None)
+        updated = sum(1 for r in results if r['status'] == 'updated')
+        return jsonify({"message": f"Updated {updated} of {len(updates)} facts", "results": results, "refresh": updated > 0}), 200
+    except Exception as e:
+        log.exception("Internal server error in update_facts: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}", "refresh": False}), 500
+
+@app.route('/api/delete_facts', methods=['POST'])
+def delete_facts():
+    try:
+        data = request.get_json()
+        facts = data.get('facts') if isinstance(data, dict) else data
+        if not isinstance(facts, list) or not facts:
+            return jsonify({"error": "Request body must contain a non-empty list of facts", "refresh": False}), 400
+        results = get_kg().delete_facts(facts)
+        deleted = sum(1 for r in results if r['status'] == 'deleted')
+        return jsonify({"message": f"Deleted {deleted} of {len(facts)} facts", "results": results, "refresh": deleted > 0}), 200
+    except Exception as e:
+        log.exception("Internal server error in delete_facts: %s", e)
+        return jsonify({"error": f"Internal server error: {str(e)}", "refresh": False}), 500
+
 @app.route('/api/delete_all_facts', methods=['POST'])
 def delete_all_facts():
     try:
-        success = kg.delete_all_facts()
-        if success:
+        graph = get_kg()
+        if graph.purge_cutoff is not None or any(get_jobs().list(job_type="purge", state=state, limit=1)
+                                                 for state in ("queued", "running")):
+            return jsonify({"error": "A purge is already queued or running", "refresh": False}), 409
+        cutoff = graph.clear_local_state()
+        if cutoff is None:
+            return jsonify({"error": "Failed to delete all facts", "refresh": False}), 500
+        if not graph.store:
             return jsonify({"message": "All facts deleted", "refresh": True}), 200
-        return jsonify({"error": "Failed to delete all facts", "refresh": False}), 500
+        try:
+            job = get_jobs().submit("purge", {"cutoff": cutoff})
+        except Exception:
+            graph.end_purge(cutoff, restore=True)
+            raise
+        return jsonify({"message": f"All facts deleted; purging {graph.store.name} in the background", "job": job, "refresh": True}), 202
     except Exception as e:
-        debug_print(f"Internal server error in delete_all_facts: {str(e)}")
+        log.exception("Internal server error in delete_all_facts: %s", e)
         return jsonify({"error": f"Internal server error: {str(e)}", "refresh": False}), 500
 
+@app.route('/api/export', methods=['GET'])
+def export_facts():
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in bulkio.FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(bulkio.FORMATS)}"}), 400
+    try:
+        chunk_size = min(max(int(request.args.get('chunk_size', 5000)), 1), 50000)
+    except ValueError:
+        return jsonify({"error": "chunk_size must be an integer"}), 400
+    try:
+        since, until = time_window()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    graph = get_kg()
+    chunks = graph.iter_facts(
+        predicate=request.args.get('predicate'),
+        src=request.args.get('src'),
+        since=since,
+        until=until,
+        chunk_size=chunk_size
+    )
+    # exports are self-contained: each chunk's message bodies are fetched in one batch
+    chunks = ([{field: fact.get(field) for field in bulkio.FACT_FIELDS} for fact in graph.with_messages(chunk, missing=None)]
+              for chunk in chunks)
+    filename = f"facts-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+    return Response(stream_with_context(bulkio.encode(chunks, fmt)), mimetype=bulkio.FORMATS[fmt],
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+@app.route('/api/import', methods=['POST'])
+def import_facts():
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in bulkio.FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(bulkio.FORMATS)}"}), 400
+    # spool the upload to disk in blocks; the job reads it back in chunks
+    upload = request.files.get('file')
+    source = upload.stream if upload else request.stream
+    spool = uuid.uuid4().hex
+    path = _spool_path(spool, fmt)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    size = 0
+    with os.fdopen(fd, "wb") as f:
+        while True:
+            block = source.read(1024 * 1024)
+            if not block:
+                break
+            f.write(block)
+            size += len(block)
+    if size == 0:
+        os.remove(path)
+        return jsonify({"error": "Upload is empty", "refresh": False}), 400
+    job = get_jobs().submit("import_facts", {"spool": spool, "format": fmt})
+    return jsonify({"message": f"Import of {size} bytes queued", "job": job, "refresh": False}), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        limit = 50
+    return jsonify(get_jobs().list(job_type=request.args.get('type'), state=request.args.get('state'), limit=limit))
+
+@app.route('/api/jobs', methods=['POST'])
+@admin_only
+def submit_job():
+    data = request.get_json(silent=True) or {}
+    job_type = data.get('type')
+    params = data.get('params') or {}
+    if job_type not in get_jobs().submittable():
+        return jsonify({"error": f"Unknown job type: {job_type}", "types": get_jobs().submittable()}), 400
+    if not isinstance(params, dict):
+        return jsonify({"error": "params must be an object"}), 400
+    try:
+        job = get_jobs().submit(job_type, params)
+    except Exception as e:
+        log.error("Failed to submit %s job: %s", job_type, e)
+        return jsonify({"error": f"Failed to submit job: {str(e)}"}), 500
+    return jsonify(job), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_jobs().get(job_id)
+    if not job:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    job = get_jobs().get(job_id)
+    if not job:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    if job['state'] != 'completed':
+        return jsonify({"error": f"Job {job_id} is {job['state']}", "state": job['state']}), 409
+    return jsonify(job['result'])
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@admin_only
+def cancel_job(job_id):
+    if get_jobs().cancel(job_id):
+        return jsonify({"message": f"Cancellation requested for job {job_id}"}), 200
+    return jsonify({"error": f"Job {job_id} is not queued or running"}), 409
+
 @app.route('/api/query_entity', methods=['GET'])
+@versioned
 def query_entity():
     entity = request.args.get('entity')
     if not entity:
@@ -139,12 +615,18 @@ def query_entity():
         limit = int(request.args.get('limit', 100))
     except ValueError:
         limit = 100
+    try:
+        since, until = time_window()
+        fields = projection()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    facts = kg.query_by_entity(entity)
+    facts = get_kg().query_by_entity(entity, since=since, until=until)
     facts = facts[:limit]
-    return jsonify(facts)
+    return jsonify(project(facts, fields))
 
 @app.route('/api/query_predicate', methods=['GET'])
+@versioned
 def query_predicate():
     predicate = request.args.get('predicate')
     if not predicate:
@@ -153,12 +635,18 @@ def query_predicate():
         limit = int(request.args.get('limit', 100))
     except ValueError:
         limit = 100
+    try:
+        since, until = time_window()
+        fields = projection()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    facts = kg.query_by_predicate(predicate)
+    facts = get_kg().query_by_predicate(predicate, since=since, until=until)
     facts = facts[:limit]
-    return jsonify(facts)
+    return jsonify(project(facts, fields))
 
 @app.route('/api/query_object', methods=['GET'])
+@versioned
 def query_object():
     obj = request.args.get('object')
     if not obj:
@@ -167,10 +655,146 @@ def query_object():
         limit = int(request.args.get('limit', 100))
     except ValueError:
         limit = 100
+    try:
+        since, until = time_window()
+        fields = projection()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    facts = kg.query_by_object(obj)
+    facts = get_kg().query_by_object(obj, since=since, until=until)
     facts = facts[:limit]
-    return jsonify(facts)
+    return jsonify(project(facts, fields))
+
+@app.route('/api/neighborhood', methods=['GET'])
+def neighborhood():
+    entity = request.args.get('entity')
+    if not entity:
+        return jsonify({"error": "Entity parameter is required"}), 400
+    try:
+        hops = min(max(int(request.args.get('hops', 1)), 1), 5)
+        fanout = min(max(int(request.args.get('fanout', 50)), 1), 500)
+    except ValueError:
+        return jsonify({"error": "hops and fanout must be integers"}), 400
+    direction = request.args.get('direction', 'both')
+    if direction not in ('in', 'out', 'both'):
+        return jsonify({"error": "direction must be one of in, out, both"}), 400
+    predicates = request.args.getlist('predicate') or None
+
+    entity = get_kg().entities.resolve(entity)
+    result = get_traversal().neighborhood(entity, hops=hops, predicates=predicates, direction=direction, fanout=fanout)
+    return jsonify(result)
+
+@app.route('/api/path', methods=['GET'])
+def path():
+    source = request.args.get('from')
+    target = request.args.get('to')
+    if not all([source, target]):
+        return jsonify({"error": "Missing required fields (from, to)"}), 400
+    try:
+        max_hops = min(max(int(request.args.get('max_hops', 6)), 1), 10)
+        fanout = min(max(int(request.args.get('fanout', 50)), 1), 500)
+    except ValueError:
+        return jsonify({"error": "max_hops and fanout must be integers"}), 400
+    directed = request.args.get('directed', 'false').lower() == 'true'
+    predicates = request.args.getlist('predicate') or None
+
+    source, target = get_kg().entities.resolve(source), get_kg().entities.resolve(target)
+    result = get_traversal().shortest_path(source, target, max_hops=max_hops, predicates=predicates, directed=directed, fanout=fanout)
+    if result is None:
+        return jsonify({"error": f"No path found from {source} to {target} within {max_hops} hops"}), 404
+    return jsonify(result)
+
+@app.route('/api/subgraph', methods=['GET'])
+def subgraph():
+    focus = request.args.get('focus') or None
+    try:
+        hops = min(max(int(request.args.get('hops', 1)), 1), 3)
+        max_nodes = min(max(int(request.args.get('max_nodes', 200)), 1), 2000)
+        max_edges = min(max(int(request.args.get('max_edges', 400)), 1), 5000)
+        min_degree = max(int(request.args.get('min_degree', 2)), 0)
+    except ValueError:
+        return jsonify({"error": "hops, max_nodes, max_edges and min_degree must be integers"}), 400
+    predicates = request.args.getlist('predicate') or None
+
+    focus = get_kg().entities.resolve(focus)
+    builder = SubgraphBuilder(get_kg(), get_traversal())
+    result = builder.build(focus=focus, hops=hops, max_nodes=max_nodes, max_edges=max_edges,
+                           min_degree=min_degree, predicates=predicates)
+    if request.args.get('positions', 'true').lower() == 'true':
+        positions = get_layout().positions(
+            [node['id'] for node in result['nodes']],
+            edges=[(edge['source'], edge['target']) for edge in result['edges']]
+        )
+        for node in result['nodes']:
+            node['position'] = positions.get(node['id'])
+    return jsonify(result)
+
+@app.route('/api/layout', methods=['POST'])
+def layout():
+    data = request.get_json(silent=True) or {}
+    nodes = data.get('nodes')
+    if not isinstance(nodes, list) or not nodes:
+        return jsonify({"error": "nodes must be a non-empty list"}), 400
+    edges = [(edge.get('source'), edge.get('target')) for edge in data.get('edges', []) if isinstance(edge, dict)]
+    return jsonify({"positions": get_layout().positions(nodes, edges=edges)})
+
+@app.route('/api/stats', methods=['GET'])
+def graph_stats():
+    """Fact counts per predicate, source and stance/sentiment, and the ?top= best connected entities"""
+    try:
+        top = min(max(int(request.args.get('top', 10)), 1), 1000)
+    except ValueError:
+        top = 10
+    return jsonify(get_kg().get_stats(top))
+
+@app.route('/api/analytics/entities', methods=['GET'])
+def analytics_entities():
+    """PageRank, component and community of entities, from the last analytics job; highest PageRank first.
+    Filters: ?entity=a,b, ?community=, ?component=; ?limit= (default 100)"""
+    try:
+        community = int(request.args['community']) if 'community' in request.args else None
+        component = int(request.args['component']) if 'component' in request.args else None
+        limit = min(max(int(request.args.get('limit', 100)), 1), 10000)
+    except ValueError:
+        return jsonify({"error": "community, component and limit must be integers"}), 400
+    names = [name for name in request.args.get('entity', '').split(',') if name.strip()] or None
+    return jsonify(get_kg().entity_metrics(names=names, community=community, component=component, limit=limit))
+
+@app.route('/api/cache_stats', methods=['GET'])
+def cache_stats():
+    return jsonify(dict(get_kg().query_cache.stats(), answers=get_answers().stats()))
+
+@app.route('/api/admin/queries', methods=['GET'])
+@admin_only
+def admin_queries():
+    """Canonical statements of the storage backend and their recorded timings"""
+    graph = get_kg()
+    if not graph.store:
+        return jsonify({"error": "Storage backend unavailable"}), 503
+    return jsonify({"backend": graph.store.name, "statements": graph.store.statements(),
+                    "stats": graph.store.query_stats()})
+
+@app.route('/api/admin/explain', methods=['POST'])
+@admin_only
+def admin_explain():
+    """EXPLAIN (or PROFILE, rolled back) a canonical statement: {"statement", "params", "profile"}"""
+    graph = get_kg()
+    if not graph.store:
+        return jsonify({"error": "Storage backend unavailable"}), 503
+    data = request.get_json() or {}
+    statement = data.get('statement')
+    if statement not in graph.store.statements():
+        return jsonify({"error": f"Unknown statement: {statement}", "statements": graph.store.statements()}), 400
+    try:
+        plan = graph.store.explain(statement, data.get('params') or {}, profile=bool(data.get('profile')))
+    except NotImplementedError:
+        return jsonify({"error": f"{graph.store.name} backend does not support query plans"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        log.warning("Explain of %s failed: %s", statement, e)
+        return jsonify({"error": str(e)}), 400
+    return jsonify(plan)
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
@@ -179,17 +803,30 @@ def chat():
         message = data.get('message')
         if not message:
             return jsonify({"error": "Message cannot be empty", "refresh": False}), 400
+        session_id = str(data.get('session_id') or request.headers.get('X-Session-Id') or "default")
 
         # -----------------------------
-        # record intent analysis time
-        intent_start = time.perf_counter()
-        intent_result = llm.analyze_intent_with_gpt(message)
-        intent_end = time.perf_counter()
-        debug_print(f"Intent analysis result: {intent_result}")
-        debug_print(f"Intent extraction time: {intent_end - intent_start:.6f} seconds")
+        # the same message over the same facts was answered before: no LLM call at all.
+        # Exact text only, as a near match may be an add or delete rather than a question.
+        all_facts = None
+        cached = None
+        if len(get_answers()):
+            all_facts = get_kg().get_all_facts()
+            cached = get_answers().get(message, get_answers().fact_set_hash(all_facts), session=session_id,
+                                       exact=True)
+        if cached is not None:
+            get_memory().append(session_id, message)
+            log.debug("Answer cache hit for: %s", message)
+            return jsonify(chatprompt.cached_response(session_id, cached))
+
+        # -----------------------------
+        # intent analysis (timed on /metrics as call="intent")
+        intent_result = get_llm().analyze_intent_with_gpt(message)
+        log.debug("Intent analysis result: %s", intent_result)
         # -----------------------------
 
         operation_message = None
+        outcome = None
         facts = []
         refresh = False
         memory_text = "No related facts found"
@@ -200,155 +837,86 @@ def chat():
             intent_result['query'] = {"keywords": message.split()}
 
         # -----------------------------
-        # handle intent operations of add, update, delete, query
-        if intent_result.get("add"):
-            # existing add logic
-            add_data = intent_result["add"]
-            try:
-                success = kg.add_fact(
-                    subject=add_data["subject"],
-                    predicate=add_data["predicate"],
-                    obj=add_data["object"],
-                    src="Chat",
-                    original_message=message
-                )
-                if success:
-                    operation_message = f"Fact added: {add_data['subject']} {add_data['predicate']} {add_data['object']}."
-                    refresh = True
-                else:
-                    operation_message = ""
-            except Exception as e:
-                debug_print(f"Error adding fact: {str(e)}")
-                operation_message = ""
-
-        elif intent_result.get("update"):
-            # existing update logic
-            update_data = intent_result["update"]
+        # handle intent operations: every add, update and delete of the message in one batch
+        operations = {kind: intent_result.get(kind) or [] for kind in ("add", "update", "delete")}
+        if any(operations.values()):
             try:
-                if update_data["old_predicate"] == update_data["new_predicate"]:
-                    operation_message = f"New predicate {update_data['new_predicate']} is same as old predicate {update_data['old_predicate']}, skipping update."
-                else:
-                    success = kg.update_fact(
-                        subject=update_data["subject"],
-                        old_predicate=update_data["old_predicate"],
-                        object=update_data["object"],
-                        new_predicate=update_data["new_predicate"],
-                        new_src="Chat",
-                        new_original_message=message
-                    )
-                    if success:
-                        operation_message = f"Fact updated: {update_data['subject']} {update_data['old_predicate']} {update_data['object']} to {update_data['subject']} {update_data['new_predicate']} {update_data['object']}."
-                        refresh = True
-                    else:
-                        add_success = kg.add_fact(
-                            subject=update_data["subject"],
-                            predicate=update_data["new_predicate"],
-                            obj=update_data["object"],
-                            src="Chat",
-                            original_message=message
-                        )
-                        if add_success:
-                            operation_message = f"Original fact not found for update, added new fact: {update_data['subject']} {update_data['new_predicate']} {update_data['object']}."
-                            refresh = True
-                        else:
-                            operation_message = ""
+                outcome = get_kg().apply_operations(adds=operations["add"], updates=operations["update"],
+                                                    deletes=operations["delete"], src="Chat", original_message=message)
+                # an update of a fact that does not exist adds it with the new predicate instead
+                missing = chatprompt.missing_updates(operations, outcome)
+                if missing:
+                    added = get_kg().add_facts([fact for _, fact in missing], src="Chat", original_message=message)
+                    chatprompt.merge_added(outcome, missing, added)
             except Exception as e:
-                debug_print(f"Error updating fact: {str(e)}")
-                operation_message = ""
-
-        elif intent_result.get("delete"):
-            # existing delete logic
-            delete_data = intent_result["delete"]
-            try:
-                success = kg.delete_fact(
-                    subject=delete_data["subject"],
-                    predicate=delete_data["predicate"],
-                    object=delete_data["object"]
-                )
-                if success:
-                    operation_message = f"Fact deleted: {delete_data['subject']} {delete_data['predicate']} {delete_data['object']}."
-                    refresh = True
-                else:
-                    operation_message = ""
-            except Exception as e:
-                debug_print(f"Error deleting fact: {str(e)}")
-                operation_message = ""
+                log.error("Error applying chat operations: %s", e)
+            operation_message, refresh = chatprompt.operation_summary(operations, outcome)
 
         elif intent_result.get("query"):
             # fetch all facts
-            facts = kg.get_all_facts()
-            memory_text = "\n".join([
-                f"{i+1}. {fact['subject']} {fact['predicate']} {fact['object']} (Created At: {fact['created_at']})\nOriginal Message: {fact['original_message']}"
-                for i, fact in enumerate(facts)
-            ]) if facts else "No related facts found"
+            facts = all_facts if all_facts is not None else get_kg().get_all_facts()
+            memory_text = chatprompt.facts_text(get_kg().with_messages(facts))
 
         # -----------------------------
-        # prepare recent messages for prompt
+        # prepare this session's most similar earlier messages for prompt
         recent_messages_for_prompt = "No recent messages"
+        similar_messages = []
         if facts:
-            recent_count = min(3, len(short_term_memory))
-            similar_messages = list(reversed(short_term_memory))[:recent_count]
-            recent_messages_for_prompt = "\n".join([
-                f"{i+1}. {entry['message']} (Timestamp: {entry['timestamp']})"
-                for i, entry in enumerate(similar_messages)
-            ]) if similar_messages else "No relevant recent messages"
-
-        full_prompt = f"""
-                        Known facts:
-                        {memory_text}
-
-                        Recent messages:
-                        {recent_messages_for_prompt}
-
-                        User question:
-                        {message}
-
-                        Response(Please answer in English.):
-                        """
-        debug_print(f"Full prompt sent to LLM: {full_prompt}")
+            similar_messages = get_memory().recall(session_id, message, limit=3)
+            recent_messages_for_prompt = chatprompt.recent_text(similar_messages)
+            # a plain query: a near match of a cached question is answered the same way
+            cached = get_answers().get(message, get_answers().fact_set_hash(facts), session=session_id)
+            if cached is not None:
+                get_memory().append(session_id, message)
+                log.debug("Answer cache near hit for: %s", message)
+                return jsonify(chatprompt.cached_response(session_id, cached))
+
+        full_prompt = chatprompt.build_prompt(memory_text, recent_messages_for_prompt, message)
+        log.debug("Prompt sent to LLM (%s chars): %.2000s", len(full_prompt), full_prompt)
 
         # -----------------------------
         # generate GPT response
-        gpt_start = time.perf_counter()
+        cacheable = False
         try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant managing a memory system."},
-                    {"role": "user", "content": full_prompt}
-                ],
-                temperature=0.7,
-                max_tokens=500
-            )
-            response = response.choices[0].message.content.strip()
+            completion = llmclient.get_openai().complete("answer", **chatprompt.answer_request(full_prompt))
+            response = completion.choices[0].message.content.strip()
+            # only plain queries; local-model answers are a degraded stand-in and not reused
+            cacheable = outcome is None and not any(operations.values())
         except Exception as e:
-            debug_print(f"OpenAI error: {str(e)}")
-            return jsonify({"error": f"OpenAI failed: {str(e)}", "refresh": False}), 500
-        gpt_end = time.perf_counter()
-        debug_print(f"GPT response generation time: {gpt_end - gpt_start:.6f} seconds")
+            # breaker open, deadline passed or provider error: answer with the local model
+            log.warning("OpenAI answer unavailable, falling back to local model: %s", e)
+            response = get_llm().chat(full_prompt)
+            if response is None:
+                if not operation_message:
+                    return jsonify({"error": f"Language model unavailable: {str(e)}", "refresh": refresh}), 503
+                response = ""
 
-        response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL | re.IGNORECASE)
-        response = re.sub(r'\n\s*\n', '\n', response).strip()
+        response = chatprompt.clean_answer(response)
+
+        if cacheable and response:
+            # an answer built from this session's messages is not served to other sessions
+            get_answers().put(message, get_answers().fact_set_hash(facts), response,
+                              session=session_id if similar_messages else None)
 
         if operation_message:
             response = f"{operation_message}\n{response}"
 
         # -----------------------------
-        # add current message to short-term memory
-        short_term_memory.append({
-            "message": message,
-            "timestamp": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        })
+        # add current message to the session's memory
+        get_memory().append(session_id, message)
 
-        debug_print(f"Final processed response: {response}")
+        log.debug("Final processed response: %s", response)
         return jsonify({
             "response": response,
             "recent_messages": recent_messages_for_prompt,
-            "refresh": refresh
+            "session_id": session_id,
+            "operations": outcome,
+            "refresh": refresh,
+            "cached": False
         })
 
     except Exception as e:
-        debug_print(f"Internal server error: {str(e)}")
+        log.exception("Internal server error: %s", e)
         return jsonify({"error": f"Internal server error: {str(e)}", "refresh": False}), 500
 
 
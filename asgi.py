@@ -0,0 +1,196 @@
+"""ASGI entry point: /api/chat runs natively async, every other route is the Flask app.
+
+    uvicorn asgi:application --workers 2
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+
+A chat request waiting on OpenAI, Ollama or Neo4j holds no thread, so one process
+serves as many in-flight chats as LLM_ASYNC_MAX_CONCURRENCY allows. The Flask
+routes run unchanged in asgiref's thread pool; the WSGI entry point (app:app)
+keeps working as before.
+"""
+import asyncio
+import json
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app as webapp
+import chatprompt
+import llmclient
+import metrics
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+wsgi = WsgiToAsgi(webapp.app)
+
+
+async def _read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    return json.loads(body) if body else None
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    (b"access-control-allow-origin", b"*")]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _header(scope, name):
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _chat(data, header_session_id):
+    """/api/chat of app.py with every LLM, storage and SQLite call awaited. Returns (status, payload)."""
+    message = (data or {}).get('message')
+    if not message:
+        return 400, {"error": "Message cannot be empty", "refresh": False}
+    session_id = str(data.get('session_id') or header_session_id or "default")
+    # initialised at startup (see lifespan), so these return at once
+    kg = webapp.get_kg()
+    llm = webapp.get_llm()
+    answers = webapp.get_answers()
+    memory = webapp.get_memory()
+
+    all_facts = None
+    cached = None
+    if len(answers):
+        all_facts = await kg.aget_all_facts()
+        cached = answers.get(message, answers.fact_set_hash(all_facts), session=session_id, exact=True)
+    if cached is not None:
+        await asyncio.to_thread(memory.append, session_id, message)
+        return 200, chatprompt.cached_response(session_id, cached)
+
+    intent_result = await llm.analyze_intent_async(message)
+    log.debug("Intent analysis result: %s", intent_result)
+
+    operation_message = None
+    outcome = None
+    facts = []
+    refresh = False
+    memory_text = "No related facts found"
+
+    if not any(intent_result.values()):
+        intent_result['query'] = {"keywords": message.split()}
+
+    operations = {kind: intent_result.get(kind) or [] for kind in ("add", "update", "delete")}
+    if any(operations.values()):
+        try:
+            outcome = await kg.aapply_operations(adds=operations["add"], updates=operations["update"],
+                                                 deletes=operations["delete"], src="Chat", original_message=message)
+            missing = chatprompt.missing_updates(operations, outcome)
+            if missing:
+                added = await kg.aadd_facts([fact for _, fact in missing], src="Chat", original_message=message)
+                chatprompt.merge_added(outcome, missing, added)
+        except Exception as e:
+            log.error("Error applying chat operations: %s", e)
+        operation_message, refresh = chatprompt.operation_summary(operations, outcome)
+
+    elif intent_result.get("query"):
+        facts = all_facts if all_facts is not None else await kg.aget_all_facts()
+        memory_text = chatprompt.facts_text(await asyncio.to_thread(kg.with_messages, facts))
+
+    recent_messages_for_prompt = "No recent messages"
+    similar_messages = []
+    if facts:
+        similar_messages = await asyncio.to_thread(memory.recall, session_id, message, 3)
+        recent_messages_for_prompt = chatprompt.recent_text(similar_messages)
+        cached = answers.get(message, answers.fact_set_hash(facts), session=session_id)
+        if cached is not None:
+            await asyncio.to_thread(memory.append, session_id, message)
+            return 200, chatprompt.cached_response(session_id, cached)
+
+    full_prompt = chatprompt.build_prompt(memory_text, recent_messages_for_prompt, message)
+    log.debug("Prompt sent to LLM (%s chars): %.2000s", len(full_prompt), full_prompt)
+
+    cacheable = False
+    try:
+        completion = await llmclient.get_async_openai().complete("answer", **chatprompt.answer_request(full_prompt))
+        response = completion.choices[0].message.content.strip()
+        cacheable = outcome is None and not any(operations.values())
+    except Exception as e:
+        log.warning("OpenAI answer unavailable, falling back to local model: %s", e)
+        response = await llm.chat_async(full_prompt)
+        if response is None:
+            if not operation_message:
+                return 503, {"error": f"Language model unavailable: {str(e)}", "refresh": refresh}
+            response = ""
+
+    response = chatprompt.clean_answer(response)
+    if cacheable and response:
+        answers.put(message, answers.fact_set_hash(facts), response,
+                    session=session_id if similar_messages else None)
+    if operation_message:
+        response = f"{operation_message}\n{response}"
+
+    await asyncio.to_thread(memory.append, session_id, message)
+    return 200, {
+        "response": response,
+        "recent_messages": recent_messages_for_prompt,
+        "session_id": session_id,
+        "operations": outcome,
+        "refresh": refresh,
+        "cached": False
+    }
+
+
+async def chat(scope, receive, send):
+    start = time.perf_counter()
+    try:
+        status, payload = await _chat(await _read_json(receive), _header(scope, b"x-session-id"))
+    except Exception as e:
+        log.exception("Internal server error: %s", e)
+        status, payload = 500, {"error": f"Internal server error: {str(e)}", "refresh": False}
+    await _send_json(send, status, payload)
+    metrics.REQUEST_LATENCY.labels("POST", "/api/chat", str(status)).observe(time.perf_counter() - start)
+
+
+ROUTES = {
+    ("POST", "/api/chat"): chat
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                # the storage backend (possibly waiting for Neo4j) and spaCy load off the event loop
+                await asyncio.to_thread(webapp.get_kg)
+                await asyncio.to_thread(webapp.get_llm)
+            except Exception as e:
+                log.exception("Startup failed: %s", e)
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            try:
+                await webapp.get_kg().aclose()
+            except Exception as e:
+                log.error("Failed to close async storage connections: %s", e)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    handler = ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+    if handler is None:
+        await wsgi(scope, receive, send)
+        return
+    await handler(scope, receive, send)
@@ -0,0 +1,234 @@
+"""KnowledgeGraph micro-benchmarks with scaling curves.
+
+Generates a synthetic Reddit-like discourse graph (Zipf-distributed authors,
+preferential-attachment reply trees, stance/sentiment labels) at each requested
+size, times the KnowledgeGraph operations and writes latency percentiles,
+throughput and peak RSS as JSON. Each size runs in its own subprocess so peak
+RSS is measured per size.
+
+    python benchmarks/bench_knowledgegraph.py --sizes 1000,10000,100000
+    python benchmarks/bench_knowledgegraph.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_knowledgegraph.py --baseline benchmarks/baseline.json --threshold 0.25
+
+--backend picks the storage backend: memory (default), sqlite (a scratch file
+per size) or neo4j (--neo4j-uri / NEO4J_URI). Running against Neo4j wipes that
+database, so point it at a scratch instance.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STANCES = ["Pro", "Anti", "Neutral", "None"]
+SENTIMENTS = ["Positive", "Negative", "Neutral", "None"]
+
+
+def generate_facts(n_facts, seed=42):
+    """Synthetic triples shaped like the Reddit vaccine discourse import"""
+    rng = random.Random(seed)
+    n_authors = max(10, n_facts // 40)
+    # Zipf-like author activity: a few very active authors, a long tail
+    author_weights = [1.0 / (rank ** 1.1) for rank in range(1, n_authors + 1)]
+    facts = []
+    reply_targets = []  # posts repeated once per reply they received (preferential attachment)
+    post = 0
+    while len(facts) < n_facts:
+        post_id = f"post_{post}"
+        author = f"user_{rng.choices(range(n_authors), weights=author_weights)[0]}"
+        facts.append((author, "POSTED", post_id))
+        if reply_targets and rng.random() < 0.8:
+            parent = rng.choice(reply_targets)
+            facts.append((post_id, "REPLIES_TO", parent))
+            reply_targets.append(parent)
+        reply_targets.append(post_id)
+        facts.append((post_id, "HAS_STANCE", rng.choice(STANCES)))
+        facts.append((post_id, "HAS_SENTIMENT", rng.choice(SENTIMENTS)))
+        post += 1
+    return facts[:n_facts]
+
+
+def summarize(samples, elapsed):
+    samples = sorted(samples)
+    count = len(samples)
+
+    def pct(p):
+        return round(samples[min(count - 1, int(p * count))] * 1000, 4) if count else None
+
+    return {
+        "count": count,
+        "mean_ms": round(sum(samples) / count * 1000, 4) if count else None,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "max_ms": round(samples[-1] * 1000, 4) if count else None,
+        "throughput_ops": round(count / elapsed, 2) if elapsed > 0 else None
+    }
+
+
+def timed(fn, args_list):
+    samples = []
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - start)
+
+
+def run_size(n_facts, samples, backend, neo4j_uri, seed):
+    from knowledgegraph import KnowledgeGraph
+    from storage import create_backend
+
+    rng = random.Random(seed)
+    facts = generate_facts(n_facts, seed)
+    subjects = sorted({s for s, _, _ in facts})
+    objects = sorted({o for _, _, o in facts})
+    predicates = sorted({p for _, p, _ in facts})
+    results = {}
+
+    # KnowledgeGraph prints on every call; keep that out of the measurements' output
+    with contextlib.redirect_stdout(io.StringIO()):
+        if backend == "neo4j":
+            kg = KnowledgeGraph(neo4j_uri=neo4j_uri)
+            kg.delete_all_facts()
+        else:
+            kg = KnowledgeGraph(store=create_backend(backend, path="bench.db") if backend == "sqlite" else create_backend(backend))
+        results["add_fact"] = timed(
+            lambda s, p, o: kg.add_fact(s, p, o, src="Manual", original_message=None), facts)
+
+        def pick(values, k=samples):
+            return [(rng.choice(values),) for _ in range(k)]
+
+        def uncached(fn):
+            # measure the query itself, not the result cache
+            def call(*args):
+                kg.query_cache.clear()
+                return fn(*args)
+            return call
+
+        results["query_by_entity"] = timed(uncached(kg.query_by_entity), pick(subjects))
+        results["query_by_entity_cached"] = timed(kg.query_by_entity, pick(subjects[:10]))
+        results["query_by_predicate"] = timed(uncached(kg.query_by_predicate), pick(predicates, min(samples, 20)))
+        results["query_by_object"] = timed(uncached(kg.query_by_object), pick(objects))
+        # difflib over every edge: keep the sample small on large graphs
+        fuzzy_samples = max(3, min(samples, 200_000 // max(n_facts, 1)))
+        results["fuzzy_query_facts"] = timed(uncached(kg.fuzzy_query_facts), pick(subjects, fuzzy_samples))
+
+        updates = [facts[rng.randrange(len(facts))] for _ in range(samples)]
+        updated = []
+
+        def update(s, p, o):
+            if kg.update_fact(s, p, o, p + "_v2", new_src="Manual", new_original_message=None):
+                updated.append((s, o, kg.graph[s][o][next(iter(kg.graph[s][o]))].get('id')))
+
+        results["update_fact"] = timed(update, list(dict.fromkeys(updates)))
+        if updated:
+            results["get_update_timeline"] = timed(kg.get_update_timeline, [rng.choice(updated) for _ in range(samples)])
+        if kg.store:
+            results["sync_from_store"] = timed(lambda: kg.sync_from_store(batch_size=5000, limit=None), [()] * 3)
+        kg.close()
+
+    results["graph"] = {"facts": n_facts, "nodes": len(set(subjects) | set(objects))}
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["peak_rss_mb"] = round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    return results
+
+
+def compare(report, baseline, threshold):
+    """Return regressions where p95 latency grew by more than `threshold`"""
+    regressions = []
+    for size, ops in report["results"].items():
+        base_ops = baseline.get("results", {}).get(size, {})
+        for op, stats in ops.items():
+            base = base_ops.get(op)
+            if not isinstance(stats, dict) or not isinstance(base, dict) or not base.get("p95_ms") or stats.get("p95_ms") is None:
+                continue
+            ratio = stats["p95_ms"] / base["p95_ms"]
+            if ratio > 1 + threshold:
+                regressions.append({"size": size, "operation": op, "baseline_p95_ms": base["p95_ms"],
+                                    "p95_ms": stats["p95_ms"], "ratio": round(ratio, 3)})
+        base_rss = base_ops.get("peak_rss_mb")
+        if base_rss and ops.get("peak_rss_mb", 0) > base_rss * (1 + threshold):
+            regressions.append({"size": size, "operation": "peak_rss_mb", "baseline": base_rss,
+                                "value": ops["peak_rss_mb"], "ratio": round(ops["peak_rss_mb"] / base_rss, 3)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated fact counts, up to 1000000")
+    parser.add_argument("--samples", type=int, default=200, help="timed calls per query/update operation")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "neo4j"], default="memory", help="storage backend to benchmark")
+    parser.add_argument("--neo4j-uri", default=os.getenv("NEO4J_URI", "bolt://localhost:7687"), help="Neo4j to use with --backend neo4j")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="compare against this stored report and exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative p95 / RSS growth over the baseline")
+    parser.add_argument("--save-baseline", help="store this run as the new baseline")
+    parser.add_argument("--single-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single_size:
+        # child process: run one size in a scratch directory (history/log/SQLite files)
+        os.chdir(tempfile.mkdtemp(prefix="kg-bench-"))
+        print(json.dumps(run_size(args.single_size, args.samples, args.backend, args.neo4j_uri, args.seed)))
+        return 0
+
+    report = {
+        "meta": {
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "samples": args.samples,
+            "seed": args.seed,
+            "timestamp": time.strftime('%Y-%m-%d %H:%M:%S')
+        },
+        "results": {}
+    }
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"Benchmarking {size} facts...", file=sys.stderr)
+        cmd = [sys.executable, os.path.abspath(__file__), "--single-size", str(size),
+               "--samples", str(args.samples), "--seed", str(args.seed),
+               "--backend", args.backend, "--neo4j-uri", args.neo4j_uri]
+        child = subprocess.run(cmd, capture_output=True, text=True)
+        if child.returncode != 0:
+            print(child.stderr, file=sys.stderr)
+            return child.returncode
+        report["results"][str(size)] = json.loads(child.stdout.strip().splitlines()[-1])
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(report, json.load(f), args.threshold)
+        if report["regressions"]:
+            exit_code = 1
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(output)
+        print(f"Baseline saved to {args.save_baseline}", file=sys.stderr)
+    if exit_code:
+        print(f"{len(report['regressions'])} regressions over {args.threshold:.0%} threshold", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+
+FACT_FIELDS = ["id", "subject", "predicate", "object", "created_at", "src", "original_message", "version"]
+FORMATS = {
+    "jsonl": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+
+# ---------------------------
+# Export: fact chunks -> encoded byte chunks
+# ---------------------------
+def stream_jsonl(chunks):
+    for chunk in chunks:
+        yield "".join(json.dumps(fact, ensure_ascii=False, default=str) + "\n" for fact in chunk).encode("utf-8")
+
+
+def stream_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FACT_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    for chunk in chunks:
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_parquet(chunks):
+    """One Parquet row group per chunk, emitted as soon as it is written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.string()),
+        ("subject", pa.string()),
+        ("predicate", pa.string()),
+        ("object", pa.string()),
+        ("created_at", pa.string()),
+        ("src", pa.string()),
+        ("original_message", pa.string()),
+        ("version", pa.int64())
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for chunk in chunks:
+            columns = {field: [fact.get(field) for fact in chunk] for field in FACT_FIELDS}
+            columns["version"] = [int(v) if v is not None else None for v in columns["version"]]
+            columns["created_at"] = [str(v) if v is not None else None for v in columns["created_at"]]
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def encode(chunks, fmt):
+    if fmt == "jsonl":
+        return stream_jsonl(chunks)
+    if fmt == "csv":
+        return stream_csv(chunks)
+    if fmt == "parquet":
+        return stream_parquet(chunks)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+# ---------------------------
+# Import: file -> fact chunks
+# ---------------------------
+def read_jsonl(path, chunk_size):
+    chunk = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                chunk.append(json.loads(line))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_csv(path, chunk_size):
+    chunk = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            chunk.append({key: (value if value != "" else None) for key, value in row.items()})
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_parquet(path, chunk_size):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+
+def decode(path, fmt, chunk_size=5000):
+    if fmt == "jsonl":
+        return read_jsonl(path, chunk_size)
+    if fmt == "csv":
+        return read_csv(path, chunk_size)
+    if fmt == "parquet":
+        return read_parquet(path, chunk_size)
+    raise ValueError(f"Unsupported format: {fmt}")
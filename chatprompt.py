@@ -0,0 +1,88 @@
+"""Prompt building and response shaping shared by the Flask (app.py) and ASGI (asgi.py) /api/chat"""
+import re
+
+
+def missing_updates(operations, outcome):
+    """Updates whose fact was not found; chat adds them with the new predicate instead"""
+    return [(idx, {"subject": operations["update"][idx]["subject"], "predicate": operations["update"][idx]["new_predicate"],
+                   "object": operations["update"][idx]["object"]})
+            for idx, result in enumerate(outcome["update"]) if result["status"] == "not_found"]
+
+
+def merge_added(outcome, missing, added):
+    for (idx, _), result in zip(missing, added):
+        if result["status"] == "added":
+            outcome["update"][idx] = dict(result, index=idx, status="added_new")
+
+
+def operation_summary(operations, outcome):
+    """(operation message, refresh flag) describing what a chat message changed"""
+    lines = []
+    for result, item in zip(outcome["delete"] if outcome else [], operations["delete"]):
+        if result["status"] == "deleted":
+            lines.append(f"Fact deleted: {item['subject']} {item['predicate']} {item['object']}.")
+    for result, item in zip(outcome["update"] if outcome else [], operations["update"]):
+        if result["status"] == "updated":
+            lines.append(f"Fact updated: {item['subject']} {item['old_predicate']} {item['object']} to {item['subject']} {item['new_predicate']} {item['object']}.")
+        elif result["status"] == "unchanged":
+            lines.append(f"New predicate {item['new_predicate']} is same as old predicate {item['old_predicate']}, skipping update.")
+        elif result["status"] == "added_new":
+            lines.append(f"Original fact not found for update, added new fact: {item['subject']} {item['new_predicate']} {item['object']}.")
+    for result, item in zip(outcome["add"] if outcome else [], operations["add"]):
+        if result["status"] == "added":
+            lines.append(f"Fact added: {item['subject']} {item['predicate']} {item['object']}.")
+    refresh = bool(outcome) and any(result["status"] in ("added", "updated", "deleted", "added_new")
+                                    for results in outcome.values() for result in results)
+    return "\n".join(lines), refresh
+
+
+def facts_text(facts):
+    return "\n".join([
+        f"{i+1}. {fact['subject']} {fact['predicate']} {fact['object']} (Created At: {fact['created_at']})\nOriginal Message: {fact['original_message']}"
+        for i, fact in enumerate(facts)
+    ]) if facts else "No related facts found"
+
+
+def recent_text(similar_messages):
+    return "\n".join([
+        f"{i+1}. {entry['message']} (Timestamp: {entry['timestamp']})"
+        for i, entry in enumerate(similar_messages)
+    ]) if similar_messages else "No relevant recent messages"
+
+
+def build_prompt(memory_text, recent_messages_for_prompt, message):
+    return f"""
+                        Known facts:
+                        {memory_text}
+
+                        Recent messages:
+                        {recent_messages_for_prompt}
+
+                        User question:
+                        {message}
+
+                        Response(Please answer in English.):
+                        """
+
+
+def answer_request(full_prompt):
+    """chat.completions arguments of the answer call"""
+    return {
+        "model": "gpt-4o",
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant managing a memory system."},
+            {"role": "user", "content": full_prompt}
+        ],
+        "temperature": 0.7,
+        "max_tokens": 500
+    }
+
+
+def clean_answer(response):
+    response = re.sub(r'<think>.*?</think>', '', response, flags=re.DOTALL | re.IGNORECASE)
+    return re.sub(r'\n\s*\n', '\n', response).strip()
+
+
+def cached_response(session_id, answer):
+    return {"response": answer, "recent_messages": "No recent messages", "session_id": session_id,
+            "operations": None, "refresh": False, "cached": True}
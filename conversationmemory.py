@@ -0,0 +1,119 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from rapidfuzz import fuzz, process
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class ConversationMemory:
+    """Per-session chat history in SQLite, shared by all worker processes.
+
+    Each session keeps only its last `max_messages` messages, and sessions idle
+    for longer than `session_ttl` seconds are dropped. `recall` ranks a session's
+    messages by RapidFuzz similarity to the new message rather than by recency.
+    """
+
+    def __init__(self, path="conversations.db", max_messages=50, session_ttl=7 * 24 * 3600, prune_interval=300):
+        self.path = path
+        self.max_messages = max_messages
+        self.session_ttl = session_ttl
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                message TEXT NOT NULL,
+                timestamp TEXT
+            );
+            CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, seq);
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_seen REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+        """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def append(self, session_id, message, timestamp=None):
+        timestamp = timestamp or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT INTO messages (session_id, message, timestamp) VALUES (?, ?, ?)",
+                         (session_id, message, timestamp))
+            # keep the newest max_messages of this session
+            conn.execute("""
+                DELETE FROM messages WHERE session_id = ? AND seq <= (
+                    SELECT seq FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT 1 OFFSET ?
+                )
+            """, (session_id, session_id, self.max_messages))
+            conn.execute("INSERT OR REPLACE INTO sessions (session_id, last_seen) VALUES (?, ?)",
+                         (session_id, time.time()))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_prune()
+
+    def messages(self, session_id):
+        """The session's messages, oldest first"""
+        rows = self._connect().execute(
+            "SELECT message, timestamp FROM messages WHERE session_id = ? ORDER BY seq", (session_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def recent(self, session_id, limit=3):
+        return list(reversed(self.messages(session_id)))[:limit]
+
+    def recall(self, session_id, query, limit=3, min_score=50):
+        """Up to `limit` messages of the session most similar to `query`, best first.
+        Falls back to the most recent ones when nothing scores `min_score` (0-100)."""
+        messages = self.messages(session_id)
+        if not messages:
+            return []
+        matches = process.extract(query, [entry['message'] for entry in messages], scorer=fuzz.token_set_ratio,
+                                  processor=str.lower, limit=limit, score_cutoff=min_score)
+        if not matches:
+            return list(reversed(messages))[:limit]
+        # ties go to the newer message
+        matches.sort(key=lambda match: (-match[1], -match[2]))
+        return [dict(messages[index], score=round(score, 1)) for _, score, index in matches]
+
+    def clear(self, session_id):
+        conn = self._connect()
+        conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _maybe_prune(self):
+        now = time.monotonic()
+        if now - self._last_prune < self.prune_interval:
+            return
+        self._last_prune = now
+        cutoff = time.time() - self.session_ttl
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM messages WHERE session_id IN (SELECT session_id FROM sessions WHERE last_seen < ?)",
+                         (cutoff,))
+            expired = conn.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,)).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if expired:
+            log.info("Dropped %s idle conversation sessions", expired)
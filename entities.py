@@ -0,0 +1,142 @@
+import threading
+import unicodedata
+from collections import defaultdict
+
+from rapidfuzz import fuzz, process
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+def normalize_name(name):
+    """Lookup key of an entity name: Unicode-normalized, case-folded, whitespace collapsed"""
+    return " ".join(unicodedata.normalize("NFKC", str(name)).casefold().split())
+
+
+def clean_name(name):
+    """Display form of a new entity name: surrounding and repeated whitespace removed"""
+    return " ".join(str(name).split())
+
+
+class EntityIndex:
+    """Normalized key -> canonical entity name, shared by all writes and lookups of a KnowledgeGraph.
+
+    Names are registered as facts are written, so "Alice", "alice" and "Alice "
+    all resolve to whichever spelling was stored first. Aliases recorded by the
+    merge job map the keys of merged-away names to the surviving entity.
+    """
+
+    def __init__(self):
+        self._names = {}  # key -> canonical name of an entity in the store
+        self._aliases = {}  # key -> canonical name it was merged into
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    def load(self, names, aliases=None):
+        """Rebuild from the store's entity names and alias table ({key: canonical})"""
+        with self._lock:
+            self._names = {}
+            # first spelling wins, matching what resolve() would have returned at write time
+            for name in names:
+                self._names.setdefault(normalize_name(name), name)
+            self._aliases = dict(aliases or {})
+
+    def resolve(self, name):
+        """Canonical spelling of `name` if the entity is known, else its cleaned form"""
+        if name is None:
+            return None
+        key = normalize_name(name)
+        with self._lock:
+            return self._aliases.get(key) or self._names.get(key) or clean_name(name)
+
+    def canonical(self, name):
+        """resolve(), registering `name` as a new entity when it is unknown"""
+        if name is None:
+            return None
+        key = normalize_name(name)
+        with self._lock:
+            known = self._aliases.get(key) or self._names.get(key)
+            if known is None:
+                known = self._names[key] = clean_name(name)
+            return known
+
+    def add_aliases(self, pairs):
+        """Record merges: [{"alias", "canonical"}]"""
+        with self._lock:
+            retarget = {pair['alias']: pair['canonical'] for pair in pairs}
+            for key, name in self._aliases.items():
+                if name in retarget:
+                    self._aliases[key] = retarget[name]
+            for pair in pairs:
+                key = normalize_name(pair['alias'])
+                self._aliases[key] = pair['canonical']
+                if self._names.get(key) == pair['alias']:
+                    del self._names[key]
+                self._names.setdefault(normalize_name(pair['canonical']), pair['canonical'])
+
+    def aliases(self):
+        with self._lock:
+            return dict(self._aliases)
+
+
+def _blocks(keys, prefix, max_block):
+    """Group keys sharing their first `prefix` characters; oversized blocks are split on a longer prefix"""
+    groups = defaultdict(list)
+    for key in keys:
+        groups[key[:prefix]].append(key)
+    for block_keys in groups.values():
+        if len(block_keys) > max_block and any(len(key) > prefix for key in block_keys):
+            yield from _blocks(block_keys, prefix + 1, max_block)
+        else:
+            yield block_keys
+
+
+def find_duplicates(degrees, threshold=90, prefix=3, max_block=2000):
+    """Clusters of entity names that denote the same thing.
+
+    `degrees` maps every entity name to its number of facts. Names with the same
+    normalized key always cluster; other keys cluster when their RapidFuzz ratio
+    reaches `threshold` (0-100, None to skip fuzzy matching). Only keys sharing
+    their first `prefix` characters are compared (blocking), so the work stays
+    near-linear in the number of entities.
+
+    Returns [{"canonical", "aliases"}]; the canonical name is the best connected one.
+    """
+    by_key = defaultdict(list)
+    for name in degrees:
+        key = normalize_name(name)
+        if key:
+            by_key[key].append(name)
+
+    parent = {key: key for key in by_key}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    if threshold is not None:
+        for block in _blocks(list(by_key), prefix, max_block):
+            if len(block) < 2:
+                continue
+            scores = process.cdist(block, block, scorer=fuzz.ratio, score_cutoff=threshold, workers=-1)
+            for i, j in zip(*scores.nonzero()):
+                if i < j:
+                    parent[find(block[i])] = find(block[j])
+
+    clusters = defaultdict(list)
+    for key, names in by_key.items():
+        clusters[find(key)].extend(names)
+
+    merges = []
+    for names in clusters.values():
+        if len(names) < 2:
+            continue
+        names.sort(key=lambda name: (-degrees[name], len(name), name))
+        merges.append({"canonical": names[0], "aliases": names[1:]})
+    log.debug("Found %s duplicate clusters among %s entities", len(merges), len(degrees))
+    return merges
@@ -0,0 +1,283 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+# ---------------------------
+# Vectorized algorithms (run in the process pool)
+# ---------------------------
+def pagerank(adjacency, alpha=0.85, tol=1e-6, max_iter=100):
+    """PageRank of a weighted directed adjacency matrix by power iteration.
+
+    Dangling nodes spread their rank uniformly, as in networkx.pagerank.
+    Returns (ranks, iterations).
+    """
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0), 0
+    out = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out == 0
+    inverse = np.divide(1.0, out, out=np.zeros(n), where=~dangling)
+    transition = (sparse.diags(inverse) @ adjacency).T.tocsr()
+    rank = np.full(n, 1.0 / n)
+    for iteration in range(1, max_iter + 1):
+        new = alpha * (transition @ rank + rank[dangling].sum() / n) + (1 - alpha) / n
+        if np.abs(new - rank).sum() < n * tol:
+            return new, iteration
+        rank = new
+    log.warning("PageRank did not converge in %s iterations", max_iter)
+    return rank, max_iter
+
+
+def _by_size(labels):
+    """Relabel so that 0 is the largest group, 1 the next and so on"""
+    sizes = np.bincount(labels)
+    order = np.argsort(-sizes, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[labels]
+
+
+def components(adjacency):
+    """Weakly connected components, numbered by size (0 is the largest)"""
+    if adjacency.shape[0] == 0:
+        return np.zeros(0, dtype=np.intp)
+    _, labels = connected_components(adjacency, directed=True, connection="weak")
+    return _by_size(labels)
+
+
+def _membership_matrix(labels, count):
+    n = len(labels)
+    return sparse.csr_matrix((np.ones(n), (np.arange(n), labels)), shape=(n, count))
+
+
+def modularity(graph, labels, resolution=1.0):
+    """Modularity of a partition of a symmetric weighted adjacency matrix"""
+    total = graph.sum()
+    if total == 0:
+        return 0.0
+    degrees = np.asarray(graph.sum(axis=1)).ravel()
+    members = _membership_matrix(labels, labels.max() + 1)
+    inside = (members.T @ graph @ members).diagonal().sum()
+    tot = np.bincount(labels, weights=degrees)
+    return float(inside / total - resolution * (tot ** 2).sum() / total ** 2)
+
+
+def _local_moving(graph, total, resolution, max_sweeps, rng, tol=1e-4):
+    """Louvain's first phase with all nodes evaluated at once.
+
+    Each sweep computes, with one sparse product, every node's link weight into
+    each neighbouring community and the modularity gain of joining it. A random
+    half of the nodes with a better community move, so neighbours do not keep
+    swapping places. Stops when at most a `tol` fraction of nodes would move.
+    """
+    n = graph.shape[0]
+    degrees = np.asarray(graph.sum(axis=1)).ravel()
+    loops = graph.diagonal()
+    labels = np.arange(n)
+    for _ in range(max_sweeps):
+        links = (graph @ _membership_matrix(labels, n)).tocsr()
+        counts = np.diff(links.indptr)
+        rows = np.repeat(np.arange(n), counts)
+        cols = links.indices
+        tot = np.bincount(labels, weights=degrees, minlength=n)
+        # node i is taken out of its own community before comparing
+        own = cols == labels[rows]
+        weight = links.data - np.where(own, loops[rows], 0.0)
+        tot_other = tot[cols] - np.where(own, degrees[rows], 0.0)
+        gain = weight - resolution * degrees[rows] * tot_other / total
+        stay = -resolution * degrees * (tot[labels] - degrees) / total
+        stay[rows[own]] = gain[own]
+
+        # best community of each node with links: first entry reaching the row maximum
+        linked = counts > 0
+        starts = links.indptr[:-1][linked]
+        best_gain = np.maximum.reduceat(gain, starts)
+        at_best = gain == np.repeat(best_gain, counts[linked])
+        first = np.minimum.reduceat(np.where(at_best, np.arange(len(gain)), len(gain)), starts)
+        best_rows, best_cols = rows[first], cols[first]
+        better = (best_cols != labels[best_rows]) & (best_gain > stay[best_rows] + 1e-12)
+        # the last sweeps only shuffle a few nodes; stop once moves are negligible
+        if better.sum() <= n * tol:
+            break
+        move = better & (rng.random(len(first)) < 0.5)
+        labels[best_rows[move]] = best_cols[move]
+    return labels
+
+
+def communities(adjacency, resolution=1.0, max_levels=20, max_sweeps=20, seed=42):
+    """Louvain-style communities of the undirected version of `adjacency`.
+
+    Alternates vectorized local moving with aggregation of each community into
+    one node until a level merges nothing. Few sweeps per level are enough, as
+    aggregation finishes what local moving leaves. Returns (labels numbered by
+    size, modularity).
+    """
+    graph = (adjacency + adjacency.T).tocsr().astype(np.float64)
+    n = graph.shape[0]
+    labels = np.arange(n)
+    total = graph.sum()
+    if total == 0:
+        return labels, 0.0
+    rng = np.random.default_rng(seed)
+    level_graph = graph
+    for _ in range(max_levels):
+        moved = _local_moving(level_graph, total, resolution, max_sweeps, rng)
+        uniques, moved = np.unique(moved, return_inverse=True)
+        if len(uniques) == level_graph.shape[0]:
+            break
+        labels = moved[labels]
+        members = _membership_matrix(moved, len(uniques))
+        level_graph = (members.T @ level_graph @ members).tocsr()
+    labels = _by_size(labels)
+    return labels, modularity(graph, labels, resolution)
+
+
+# ---------------------------
+# Graph export and jobs
+# ---------------------------
+def adjacency_matrix(chunks):
+    """(entity names, CSR adjacency) from chunks of facts; entry [i, j] counts the facts from i to j"""
+    subjects, objects = [], []
+    for chunk in chunks:
+        for fact in chunk:
+            subjects.append(fact['subject'])
+            objects.append(fact['object'])
+    codes, names = pd.factorize(pd.Series(subjects + objects, dtype=object))
+    m = len(subjects)
+    n = len(names)
+    adjacency = sparse.csr_matrix((np.ones(m), (codes[:m], codes[m:])), shape=(n, n))
+    adjacency.sum_duplicates()
+    return np.asarray(names, dtype=object), adjacency
+
+
+class GraphAnalytics:
+    """PageRank, connected components and communities of the whole stored graph.
+
+    The facts (optionally only some predicates) are exported from the store
+    into a SciPy sparse matrix and the three algorithms run concurrently in a
+    process pool. Results are cached per graph version and written back as
+    entity properties (pagerank, component, community) in the store and the
+    in-memory graph, where /api/analytics/entities reads them.
+    """
+
+    MAX_CACHED = 4
+
+    def __init__(self, kg, workers=None):
+        self.kg = kg
+        self.workers = workers or min(3, os.cpu_count() or 1)
+        self._pool = None
+        self._cache = OrderedDict()  # (version, params) -> summary
+        self._lock = threading.Lock()
+
+    @property
+    def pool(self):
+        """Started on first use; spawned, since the app's threads (log writer, drivers) are not fork-safe"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _chunks(self, predicates):
+        for predicate in predicates or [None]:
+            yield from self.kg.iter_facts(predicate=predicate)
+
+    def run(self, predicates=None, alpha=0.85, resolution=1.0, top=20, batch_size=10000,
+            progress=None, should_stop=None):
+        """Compute and store the analytics of the current graph version, unless already cached.
+        Returns a summary: sizes, top entities by PageRank and the largest communities."""
+        should_stop = should_stop or (lambda: False)
+        predicates = sorted(predicates) if predicates else None
+        version = self.kg.get_version()
+        key = (version, tuple(predicates or ()), alpha, resolution, top)
+        with self._lock:
+            if key in self._cache:
+                return dict(self._cache[key], cached=True)
+
+        start = time.perf_counter()
+        names, adjacency = adjacency_matrix(self._chunks(predicates))
+        if progress:
+            progress(stage="computing", nodes=len(names), edges=int(adjacency.sum()))
+        if should_stop():
+            return {"stopped": True}
+        ranks = self.pool.submit(pagerank, adjacency, alpha)
+        weak = self.pool.submit(components, adjacency)
+        groups = self.pool.submit(communities, adjacency, resolution)
+        ranks, iterations = ranks.result()
+        weak = weak.result()
+        groups, score = groups.result()
+        computed = time.perf_counter() - start
+        if should_stop():
+            return {"stopped": True}
+
+        self._write_back(names, ranks, weak, groups, batch_size, progress, should_stop)
+        summary = {
+            "version": version,
+            "predicates": predicates,
+            "nodes": len(names),
+            "edges": int(adjacency.sum()),
+            "pagerank": {"iterations": iterations, "top": self._top_ranked(names, ranks, top)},
+            "components": {"count": int(weak.max()) + 1 if len(weak) else 0,
+                           "largest": np.bincount(weak)[:top].tolist() if len(weak) else []},
+            "communities": {"count": int(groups.max()) + 1 if len(groups) else 0, "modularity": score,
+                            "largest": self._largest_communities(names, ranks, groups, top)},
+            "seconds": {"compute": round(computed, 3), "total": round(time.perf_counter() - start, 3)}
+        }
+        with self._lock:
+            self._cache[key] = summary
+            while len(self._cache) > self.MAX_CACHED:
+                self._cache.popitem(last=False)
+        log.info("Graph analytics of %s nodes and %s edges finished in %.1fs: %s communities (modularity %.3f)",
+                 summary['nodes'], summary['edges'], summary['seconds']['total'], summary['communities']['count'], score)
+        return dict(summary, cached=False)
+
+    def _write_back(self, names, ranks, weak, groups, batch_size, progress, should_stop):
+        rows = [{"name": name, "pagerank": float(rank), "component": int(component), "community": int(community)}
+                for name, rank, component, community in zip(names, ranks, weak, groups)]
+        graph = self.kg.graph
+        for row in rows:
+            if row['name'] in graph:
+                graph.nodes[row['name']].update(pagerank=row['pagerank'], component=row['component'],
+                                                community=row['community'])
+        if self.kg.store:
+            written = self.kg.store.set_entity_metrics(rows, run=uuid.uuid4().hex, batch_size=batch_size,
+                                                       progress=progress, should_stop=should_stop)
+            log.debug("Wrote analytics properties of %s entities", written)
+
+    @staticmethod
+    def _top_ranked(names, ranks, top):
+        best = np.argsort(-ranks, kind="stable")[:top]
+        return [{"entity": names[i], "pagerank": float(ranks[i])} for i in best]
+
+    @staticmethod
+    def _largest_communities(names, ranks, groups, top, members=5):
+        if not len(groups):
+            return []
+        sizes = np.bincount(groups)
+        largest = []
+        for community in range(min(top, len(sizes))):
+            nodes = np.flatnonzero(groups == community)
+            best = nodes[np.argsort(-ranks[nodes], kind="stable")[:members]]
+            largest.append({"community": community, "size": int(sizes[community]),
+                            "top": [names[i] for i in best]})
+        return largest
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
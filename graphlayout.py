@@ -0,0 +1,235 @@
+import threading
+import zlib
+import numpy as np
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class GraphLayout:
+    """Server-side node coordinates for the Cytoscape view.
+
+    A vectorized Fruchterman-Reingold layout over the in-memory NetworkX graph.
+    Coordinates are cached; after mutations only the changed nodes and their
+    direct neighbours are re-relaxed while the rest of the layout stays fixed.
+    Layouts are computed on a background thread from a snapshot of the graph;
+    requests are served the last published layout and never wait for one.
+    """
+
+    DENSE_LIMIT = 1000       # above this many nodes, repulsion is sampled
+    REPULSION_SAMPLE = 64    # nodes sampled per row when repulsion is sampled
+    CHUNK_ROWS = 4096        # rows per repulsion block
+    FULL_RELAYOUT_RATIO = 0.2
+
+    def __init__(self, kg, scale=1000.0, iterations=50, local_iterations=15, seed=42):
+        self.kg = kg
+        self.scale = scale
+        self.iterations = iterations
+        self.local_iterations = local_iterations
+        self.rng = np.random.default_rng(seed)
+        # (nodes, node -> row, positions), replaced as a whole so readers never mix two layouts
+        self._layout = ([], {}, np.zeros((0, 2)))
+        self._dirty = set()
+        self._needs_full = True
+        self._lock = threading.Lock()          # guards the dirty set and the worker
+        self._compute_lock = threading.Lock()  # one layout computation at a time
+        self._worker = None
+        kg.add_listener(self._on_change)
+
+    def _on_change(self, subject, predicate, obj):
+        with self._lock:
+            if subject is None and obj is None:
+                self._needs_full = True
+            else:
+                self._dirty.update(n for n in (subject, obj) if n is not None)
+
+    # ---------------------------
+    # Force-directed core
+    # ---------------------------
+    def _snapshot(self):
+        """(nodes, edges without self-loops) of the in-memory graph, copied under its lock
+        since jobs mutate it on other threads"""
+        graph = self.kg.graph
+        with self.kg.graph_lock:
+            return list(graph.nodes), [(u, v) for u, v in graph.edges() if u != v]
+
+    @staticmethod
+    def _edge_arrays(edges, index):
+        src = np.fromiter((index[u] for u, _ in edges), dtype=np.intp, count=len(edges))
+        dst = np.fromiter((index[v] for _, v in edges), dtype=np.intp, count=len(edges))
+        return src, dst
+
+    def _relax(self, pos, src, dst, rows, iterations, temperature):
+        """Run force-directed iterations moving only the nodes in `rows`"""
+        n = len(pos)
+        if n < 2 or len(rows) == 0:
+            return pos
+        k = np.sqrt(1.0 / n)
+        movable = np.zeros(n, dtype=bool)
+        movable[rows] = True
+        # only edges touching a movable node contribute
+        edge_mask = movable[src] | movable[dst]
+        src, dst = src[edge_mask], dst[edge_mask]
+        cooling = temperature / (iterations + 1)
+
+        for _ in range(iterations):
+            # repulsion: exact for small graphs, sampled and rescaled otherwise;
+            # computed in row chunks to bound peak memory
+            disp = np.zeros_like(pos)
+            for start in range(0, len(rows), self.CHUNK_ROWS):
+                chunk = rows[start:start + self.CHUNK_ROWS]
+                if n <= self.DENSE_LIMIT:
+                    delta = pos[chunk, None, :] - pos[None, :, :]
+                    weight = 1.0
+                else:
+                    sample = self.rng.integers(0, n, size=(len(chunk), self.REPULSION_SAMPLE))
+                    delta = pos[chunk, None, :] - pos[sample]
+                    weight = n / self.REPULSION_SAMPLE
+                dist2 = np.maximum((delta ** 2).sum(axis=-1), 1e-9)
+                disp[chunk] = (delta * (k * k / dist2)[..., None]).sum(axis=1) * weight
+
+            # attraction along edges
+            delta = pos[src] - pos[dst]
+            dist = np.sqrt(np.maximum((delta ** 2).sum(axis=-1), 1e-9))
+            force = delta * (dist / k)[:, None]
+            np.add.at(disp, src, -force)
+            np.add.at(disp, dst, force)
+
+            # cap displacement by the current temperature
+            disp[~movable] = 0
+            length = np.sqrt(np.maximum((disp ** 2).sum(axis=-1), 1e-9))
+            pos = pos + disp * (np.minimum(length, temperature) / length)[:, None]
+            temperature -= cooling
+        return pos
+
+    def _seed_position(self, node, pos_lookup, adjacent):
+        """Place a new node at the centroid of its already positioned neighbours"""
+        neighbors = [pos_lookup[m] for m in adjacent.get(node, ()) if m in pos_lookup]
+        jitter = self.rng.normal(scale=0.01, size=2)
+        if neighbors:
+            return np.mean(neighbors, axis=0) + jitter
+        return self.rng.random(2)
+
+    # ---------------------------
+    # Full and incremental layout
+    # ---------------------------
+    def _previous(self):
+        _, index, pos = self._layout
+        return {node: pos[i] for node, i in index.items()}
+
+    def _full_layout(self, nodes, edges):
+        old = self._previous()
+        index = {node: i for i, node in enumerate(nodes)}
+        # warm start from previous coordinates where available
+        pos = np.array([old[node] if node in old else self.rng.random(2) for node in nodes]).reshape(-1, 2)
+        src, dst = self._edge_arrays(edges, index)
+        rows = np.arange(len(nodes))
+        self._layout = (nodes, index, self._relax(pos, src, dst, rows, self.iterations, temperature=0.1))
+        log.info("Full layout computed for %s nodes", len(nodes))
+
+    def _incremental_layout(self, nodes, edges, dirty):
+        old = self._previous()
+        index = {node: i for i, node in enumerate(nodes)}
+        # neighbours of the new and changed nodes only
+        wanted = {node for node in nodes if node not in old} | dirty
+        adjacent = {}
+        for u, v in edges:
+            if u in wanted:
+                adjacent.setdefault(u, []).append(v)
+            if v in wanted:
+                adjacent.setdefault(v, []).append(u)
+
+        pos = np.empty((len(nodes), 2))
+        for i, node in enumerate(nodes):
+            pos[i] = old[node] if node in old else self._seed_position(node, old, adjacent)
+
+        # re-relax the changed nodes and their direct neighbours only
+        affected = set()
+        for node in dirty:
+            if node in index:
+                affected.add(node)
+                affected.update(adjacent.get(node, ()))
+        rows = np.fromiter((index[node] for node in affected), dtype=np.intp)
+        src, dst = self._edge_arrays(edges, index)
+        self._layout = (nodes, index, self._relax(pos, src, dst, rows, self.local_iterations, temperature=0.02))
+        log.debug("Incremental layout updated %s of %s nodes", len(rows), len(nodes))
+
+    def refresh(self):
+        """Bring cached coordinates up to date with the graph on the calling thread"""
+        with self._compute_lock:
+            self._refresh()
+
+    def _refresh(self):
+        with self._lock:
+            dirty = self._dirty
+            self._dirty = set()
+            needs_full = self._needs_full
+            self._needs_full = False
+        if not (needs_full or dirty):
+            return
+        nodes, edges = self._snapshot()
+        if needs_full or not self._layout[0] or len(dirty) > self.FULL_RELAYOUT_RATIO * max(len(nodes), 1):
+            self._full_layout(nodes, edges)
+        else:
+            self._incremental_layout(nodes, edges, dirty)
+
+    def _pending(self):
+        with self._lock:
+            return self._needs_full or bool(self._dirty)
+
+    def refresh_async(self):
+        """Start a background refresh unless one is running or nothing changed"""
+        with self._lock:
+            if not (self._needs_full or self._dirty) or (self._worker is not None and self._worker.is_alive()):
+                return
+            self._worker = threading.Thread(target=self._refresh_pending, name="graph-layout", daemon=True)
+            self._worker.start()
+
+    def _refresh_pending(self):
+        # changes made while a layout is computed are picked up by the next pass
+        while self._pending():
+            try:
+                self.refresh()
+            except Exception as e:
+                log.error("Layout computation failed: %s", e)
+                with self._lock:
+                    self._needs_full = True  # retried on the next request
+                return
+
+    def _scaled(self, xy):
+        return {"x": round(float(xy[0]) * self.scale, 2), "y": round(float(xy[1]) * self.scale, 2)}
+
+    def positions(self, nodes=None, edges=()):
+        """Positions for the requested nodes ({node: {"x", "y"}}).
+
+        Nodes outside the in-memory graph (Neo4j fallbacks, cluster nodes) are
+        placed next to a positioned neighbour from `edges`, or deterministically
+        by name if they have none; so are nodes added since the last published
+        layout, which a background refresh is started for.
+        """
+        self.refresh_async()
+        layout_nodes, index, pos = self._layout  # one consistent layout, even if another refresh publishes
+        if nodes is None:
+            nodes = layout_nodes
+        positions = {}
+        missing = []
+        for node in nodes:
+            i = index.get(node)
+            if i is not None:
+                positions[node] = self._scaled(pos[i])
+            else:
+                missing.append(node)
+
+        if missing:
+            neighbors = {}
+            for source, target in edges:
+                neighbors.setdefault(source, []).append(target)
+                neighbors.setdefault(target, []).append(source)
+            for node in missing:
+                h = zlib.crc32(str(node).encode('utf-8'))
+                offset = np.array([(h & 0xFFFF) / 0xFFFF - 0.5, (h >> 16) / 0xFFFF - 0.5]) * 0.05
+                anchors = [pos[index[m]] for m in neighbors.get(node, []) if m in index]
+                base = np.mean(anchors, axis=0) if anchors else np.array([(h & 0xFF) / 0xFF, (h >> 8 & 0xFF) / 0xFF])
+                positions[node] = self._scaled(base + offset)
+        return positions
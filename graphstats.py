@@ -0,0 +1,111 @@
+import heapq
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# predicates whose object is a label (a post's stance or sentiment): counted per value
+LABEL_PREDICATES = ("HAS_STANCE", "HAS_SENTIMENT")
+
+
+class GraphStats:
+    """Fact counts and entity degrees of the whole store, kept by the KnowledgeGraph's writes.
+
+    Each write adjusts a handful of counters in O(1), so reading the statistics
+    never scans facts. The counters are rebuilt from the store's aggregates on
+    sync, after bulk operations (import, purge, entity merge) and, at most every
+    refresh interval, once other workers have written. Degrees count a self-loop
+    once, like StorageBackend.entity_degrees.
+    """
+
+    def __init__(self, label_predicates=LABEL_PREDICATES):
+        self.label_predicates = tuple(label_predicates)
+        self.stale = True  # other processes may have written since the last rebuild
+        self.loaded_at = None  # time.monotonic() of the last rebuild
+        self.rebuilt_at = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.facts = 0
+        self.predicates = Counter()
+        self.sources = Counter()
+        self.labels = {predicate: Counter() for predicate in self.label_predicates}
+        self.degrees = Counter()
+        self._top = {}  # k -> top-k entities, dropped on every change
+
+    def load(self, counts, degrees):
+        """Replace the counters with store aggregates (see StorageBackend.fact_counts)"""
+        with self._lock:
+            self._reset()
+            self.facts = counts['facts']
+            self.predicates.update(counts['predicates'])
+            self.sources.update({src or 'Unknown': n for src, n in counts['sources'].items()})
+            for predicate, values in counts['labels'].items():
+                if predicate in self.labels:
+                    self.labels[predicate].update(values)
+            self.degrees.update(degrees)
+            self.stale = False
+            self.loaded_at = time.monotonic()
+            self.rebuilt_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        log.debug("Graph statistics rebuilt: %s facts, %s entities", self.facts, len(self.degrees))
+
+    def clear(self):
+        """Zero every counter, as when all facts were deleted; writes keep adjusting them"""
+        with self._lock:
+            self._reset()
+
+    @staticmethod
+    def _adjust(counter, key, delta):
+        value = counter[key] + delta
+        if value > 0:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+
+    def _count(self, subject, predicate, obj, src, delta):
+        self.facts += delta
+        self._adjust(self.predicates, predicate, delta)
+        self._adjust(self.sources, src or 'Unknown', delta)
+        if predicate in self.labels:
+            self._adjust(self.labels[predicate], obj, delta)
+        self._adjust(self.degrees, subject, delta)
+        if obj != subject:
+            self._adjust(self.degrees, obj, delta)
+        self._top.clear()
+
+    def added(self, subject, predicate, obj, src, count=1):
+        with self._lock:
+            self._count(subject, predicate, obj, src, count)
+
+    def deleted(self, subject, predicate, obj, src, count=1):
+        with self._lock:
+            self._count(subject, predicate, obj, src, -count)
+
+    def updated(self, subject, old_predicate, obj, old_src, new_predicate, new_src):
+        with self._lock:
+            self._count(subject, old_predicate, obj, old_src, -1)
+            self._count(subject, new_predicate, obj, new_src, 1)
+
+    def snapshot(self, top=10):
+        """Counts per predicate, source and label value, and the `top` best connected entities"""
+        with self._lock:
+            if top not in self._top:
+                # O(entities * log top), cached until the next write; ties by name
+                self._top[top] = [{"entity": name, "degree": degree}
+                                  for name, degree in heapq.nsmallest(top, self.degrees.items(),
+                                                                      key=lambda item: (-item[1], item[0]))]
+            return {
+                "facts": self.facts,
+                "entities": len(self.degrees),
+                "predicates": dict(self.predicates),
+                "sources": dict(self.sources),
+                "labels": {predicate: dict(values) for predicate, values in self.labels.items()},
+                "top_entities": self._top[top],
+                "rebuilt_at": self.rebuilt_at,
+                "stale": self.stale
+            }
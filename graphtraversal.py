@@ -0,0 +1,244 @@
+import threading
+from collections import OrderedDict
+
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+_MISSING = object()
+
+
+class GraphTraversal:
+    """Multi-hop traversal (k-hop neighborhoods, shortest paths) over a KnowledgeGraph.
+
+    Expansion uses the in-memory NetworkX graph for resident nodes and falls back
+    to one batched storage backend query per hop for nodes that were not synced into memory.
+    Results are cached per graph version, including writes by other workers.
+    """
+
+    def __init__(self, kg, cache_size=256, default_fanout=50, max_nodes=2000):
+        self.kg = kg
+        self.cache_size = cache_size
+        self.default_fanout = default_fanout
+        self.max_nodes = max_nodes
+        self._cache = OrderedDict()  # (version, *request) -> result
+        self._cache_version = None
+        self._lock = threading.Lock()
+
+    # ---------------------------
+    # Cache (invalidated on graph version change)
+    # ---------------------------
+    def _cache_key(self, *request):
+        """Cache key of `request` under the current version; older entries are dropped"""
+        version = self.kg.cache_version()
+        with self._lock:
+            if self._cache_version != version:
+                self._cache.clear()
+                self._cache_version = version
+        return (version,) + request
+
+    def _cache_get(self, key):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        return _MISSING
+
+    def _cache_put(self, key, value):
+        with self._lock:
+            # computed under a version that has since changed: not worth keeping
+            if key[0] != self._cache_version:
+                return
+            self._cache[key] = value
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ---------------------------
+    # Neighbor expansion
+    # ---------------------------
+    @staticmethod
+    def _edge_to_fact(subject, obj, attr):
+        return {
+            "id": attr.get('id'),
+            "subject": subject,
+            "predicate": attr.get('predicate'),
+            "object": obj,
+            "created_at": attr.get('created_at', 'Unknown'),
+            "src": attr.get('src', 'Unknown'),
+            "version": str(attr.get('version', 1))
+        }
+
+    def _memory_edges(self, node, predicates, direction):
+        graph = self.kg.graph
+        if direction in ("out", "both"):
+            for neighbor, edges in graph.succ[node].items():
+                for attr in edges.values():
+                    if predicates is None or attr.get('predicate') in predicates:
+                        yield neighbor, self._edge_to_fact(node, neighbor, attr)
+        if direction in ("in", "both"):
+            for neighbor, edges in graph.pred[node].items():
+                for attr in edges.values():
+                    if predicates is None or attr.get('predicate') in predicates:
+                        yield neighbor, self._edge_to_fact(neighbor, node, attr)
+
+    def _store_edges(self, nodes, predicates, direction, fanout):
+        """Fetch edges of non-resident nodes from the storage backend in one batch, capped per node"""
+        if not nodes or not self.kg.store:
+            return {}
+        expanded = {name: [] for name in nodes}
+        try:
+            for node, edges in self.kg.store.neighbors(nodes, predicates, direction, fanout).items():
+                for neighbor, outgoing, rec in edges:
+                    if self.kg.purging(rec['created_at']):
+                        continue
+                    attr = {
+                        "id": rec['id'],
+                        "predicate": rec['predicate'],
+                        "created_at": rec['created_at'] or 'Unknown',
+                        "src": rec['src'] or 'Unknown',
+                        "version": rec['version'] or 1
+                    }
+                    if outgoing:
+                        fact = self._edge_to_fact(node, neighbor, attr)
+                    else:
+                        fact = self._edge_to_fact(neighbor, node, attr)
+                    expanded[node].append((neighbor, fact))
+        except Exception as e:
+            log.warning("%s neighbor expansion failed: %s", self.kg.store.name, e)
+        return expanded
+
+    def _expand(self, frontier, predicates, direction, fanout):
+        """Return {node: [(neighbor, fact), ...]} for every node in the frontier"""
+        expanded = {}
+        missing = []
+        with self.kg.graph_lock:  # jobs mutate the graph on other threads
+            for node in frontier:
+                if node in self.kg.graph:
+                    edges = []
+                    for item in self._memory_edges(node, predicates, direction):
+                        edges.append(item)
+                        if len(edges) >= fanout:
+                            break
+                    expanded[node] = edges
+                else:
+                    missing.append(node)
+        expanded.update(self._store_edges(missing, predicates, direction, fanout))
+        return expanded
+
+    # ---------------------------
+    # Public API
+    # ---------------------------
+    def neighborhood(self, entity, hops=1, predicates=None, direction="both", fanout=None):
+        """Breadth-first k-hop neighborhood of an entity"""
+        fanout = fanout or self.default_fanout
+        predicates = frozenset(predicates) if predicates else None
+        key = self._cache_key("neighborhood", entity, hops, predicates, direction, fanout)
+        cached = self._cache_get(key)
+        if cached is not _MISSING:
+            return cached
+
+        depth = {entity: 0}
+        facts = []
+        fact_keys = set()
+        frontier = [entity]
+        truncated = False
+        for hop in range(1, hops + 1):
+            if not frontier:
+                break
+            next_frontier = []
+            for node, edges in self._expand(frontier, predicates, direction, fanout).items():
+                for neighbor, fact in edges:
+                    triple = (fact['subject'], fact['predicate'], fact['object'])
+                    if triple not in fact_keys:
+                        fact_keys.add(triple)
+                        facts.append(fact)
+                    if neighbor not in depth:
+                        if len(depth) >= self.max_nodes:
+                            truncated = True
+                            continue
+                        depth[neighbor] = hop
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        result = {
+            "entity": entity,
+            "hops": hops,
+            "nodes": [{"id": name, "depth": d} for name, d in depth.items()],
+            "facts": facts,
+            "truncated": truncated
+        }
+        self._cache_put(key, result)
+        log.debug("Neighborhood of %s (%s hops): %s nodes, %s facts", entity, hops, len(depth), len(facts))
+        return result
+
+    def shortest_path(self, source, target, max_hops=6, predicates=None, directed=False, fanout=None):
+        """Bidirectional BFS; returns the facts along one shortest path or None"""
+        fanout = fanout or self.default_fanout
+        predicates = frozenset(predicates) if predicates else None
+        key = self._cache_key("path", source, target, max_hops, predicates, directed, fanout)
+        cached = self._cache_get(key)
+        if cached is not _MISSING:
+            return cached
+
+        if source == target:
+            result = {"from": source, "to": target, "length": 0, "nodes": [source], "facts": []}
+            self._cache_put(key, result)
+            return result
+
+        # parent maps: node -> (previous node, fact linking them)
+        forward = {source: None}
+        backward = {target: None}
+        forward_frontier = [source]
+        backward_frontier = [target]
+        meeting = None
+        hops = 0
+
+        while forward_frontier and backward_frontier and hops < max_hops and meeting is None:
+            # expand the smaller side first to keep the search balanced
+            if len(forward_frontier) <= len(backward_frontier):
+                direction = "out" if directed else "both"
+                frontier, visited, other = forward_frontier, forward, backward
+            else:
+                direction = "in" if directed else "both"
+                frontier, visited, other = backward_frontier, backward, forward
+            next_frontier = []
+            for node, edges in self._expand(frontier, predicates, direction, fanout).items():
+                for neighbor, fact in edges:
+                    if neighbor in visited:
+                        continue
+                    visited[neighbor] = (node, fact)
+                    if neighbor in other:
+                        meeting = neighbor
+                        break
+                    next_frontier.append(neighbor)
+                if meeting is not None or len(visited) >= self.max_nodes:
+                    break
+            if frontier is forward_frontier:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+            hops += 1
+
+        if meeting is None:
+            self._cache_put(key, None)
+            log.debug("No path found from %s to %s within %s hops", source, target, max_hops)
+            return None
+
+        nodes = [meeting]
+        facts = []
+        node = meeting
+        while forward[node] is not None:
+            node, fact = forward[node]
+            nodes.insert(0, node)
+            facts.insert(0, fact)
+        node = meeting
+        while backward[node] is not None:
+            node, fact = backward[node]
+            nodes.append(node)
+            facts.append(fact)
+
+        result = {"from": source, "to": target, "length": len(facts), "nodes": nodes, "facts": facts}
+        self._cache_put(key, result)
+        log.debug("Path from %s to %s: %s hops", source, target, len(facts))
+        return result
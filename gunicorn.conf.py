@@ -0,0 +1,24 @@
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+# Import the app once in the master so spaCy is loaded a single time and
+# shared copy-on-write by every worker.
+preload_app = True
+
+def when_ready(server):
+    import app
+    app.preload_components()
+    server.log.info("Preloaded shared components in master")
+
+def post_fork(server, worker):
+    # Neo4j drivers hold sockets and must not be shared across processes
+    import app
+    app.reset_after_fork()
+
+def child_exit(server, worker):
+    # drop the dead worker's samples from the Prometheus multiprocess files
+    import metrics
+    metrics.mark_process_dead(worker.pid)
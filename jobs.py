@@ -0,0 +1,226 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+TERMINAL_STATES = ("completed", "failed", "cancelled", "interrupted")
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when cancellation was requested"""
+
+
+class JobContext:
+    """Handed to a job function to report progress and check for cancellation"""
+
+    def __init__(self, manager, job_id, check_interval=0.5):
+        self.manager = manager
+        self.job_id = job_id
+        self.check_interval = check_interval
+        self._last_check = 0.0
+        self._cancelled = False
+
+    def progress(self, **fields):
+        self.manager.store.update(self.job_id, progress=fields)
+
+    def cancelled(self):
+        # the flag lives in the job table so any worker process can cancel
+        now = time.monotonic()
+        if not self._cancelled and now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._cancelled = self.manager.store.cancel_requested(self.job_id)
+        return self._cancelled
+
+    def check_cancelled(self):
+        if self.cancelled():
+            raise JobCancelled()
+
+
+class JobStore:
+    """Persistent job table in SQLite, shared by all worker processes"""
+
+    def __init__(self, path="jobs.db"):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    params TEXT,
+                    progress TEXT,
+                    result TEXT,
+                    error TEXT,
+                    owner_pid INTEGER,
+                    cancel_requested INTEGER DEFAULT 0,
+                    created_at TEXT,
+                    started_at TEXT,
+                    finished_at TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_type_created ON jobs (type, created_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_to_job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        for field in ("params", "progress", "result"):
+            job[field] = json.loads(job[field]) if job[field] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def create(self, job_type, params):
+        job_id = str(uuid.uuid4())
+        self._connect().execute(
+            "INSERT INTO jobs (id, type, state, params, owner_pid, created_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+            (job_id, job_type, json.dumps(params), os.getpid(), datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        )
+        return job_id
+
+    def update(self, job_id, **fields):
+        for field in ("params", "progress", "result"):
+            if field in fields:
+                fields[field] = json.dumps(fields[field], default=str)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        self._connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row)
+
+    def list(self, job_type=None, state=None, limit=50):
+        query = "SELECT * FROM jobs WHERE (? IS NULL OR type = ?) AND (? IS NULL OR state = ?) ORDER BY created_at DESC LIMIT ?"
+        rows = self._connect().execute(query, (job_type, job_type, state, state, limit)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def cancel_requested(self, job_id):
+        row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def request_cancel(self, job_id):
+        conn = self._connect()
+        # queued jobs are cancelled outright, running ones stop at their next check
+        conn.execute("UPDATE jobs SET state = 'cancelled', cancel_requested = 1, finished_at = ? WHERE id = ? AND state = 'queued'",
+                     (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), job_id))
+        cursor = conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state = 'running'", (job_id,))
+        return cursor.rowcount > 0 or (self.get(job_id) or {}).get("state") == "cancelled"
+
+    def mark_orphans(self):
+        """Jobs left queued/running by a process that no longer exists are marked interrupted; returns them"""
+        conn = self._connect()
+        rows = conn.execute("SELECT * FROM jobs WHERE state IN ('queued', 'running')").fetchall()
+        orphans = []
+        for row in rows:
+            try:
+                os.kill(row["owner_pid"], 0)
+            except (OSError, TypeError):
+                cursor = conn.execute("UPDATE jobs SET state = 'interrupted', finished_at = ? WHERE id = ? AND state = ?",
+                                      (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), row["id"], row["state"]))
+                # another worker starting at the same time may have marked it first
+                if cursor.rowcount:
+                    orphans.append(self._row_to_job(row))
+        return orphans
+
+
+class JobManager:
+    """Runs registered job types on per-type thread pools.
+
+    Each job type gets its own pool sized by its concurrency limit, so heavy
+    jobs queue behind each other instead of starving other job types or the
+    request threads serving interactive traffic.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.handlers = {}
+        self.executors = {}
+        self.internal = set()  # job types only the application submits, never clients
+        self.discards = {}
+        self._orphans = self.store.mark_orphans()
+
+    def register(self, job_type, handler, concurrency=1, internal=False, discard=None):
+        """handler(ctx, **params) -> JSON-serialisable result.
+
+        `discard(**params)` releases what a job holds (a spooled upload) when its
+        handler never gets to: cancelled while queued, or orphaned by a restart.
+        """
+        self.handlers[job_type] = handler
+        self.executors[job_type] = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"job-{job_type}")
+        if internal:
+            self.internal.add(job_type)
+        if discard:
+            self.discards[job_type] = discard
+            for job in self._orphans:
+                if job["type"] == job_type:
+                    self._discard(job["id"], job_type, job["params"] or {})
+
+    def submittable(self):
+        """Job types clients may submit"""
+        return sorted(set(self.handlers) - self.internal)
+
+    def _discard(self, job_id, job_type, params):
+        discard = self.discards.get(job_type)
+        if discard is None:
+            return
+        try:
+            discard(**params)
+        except Exception as e:
+            log.warning("Failed to release %s job %s: %s", job_type, job_id, e)
+
+    def submit(self, job_type, params=None):
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        params = params or {}
+        job_id = self.store.create(job_type, params)
+        self.executors[job_type].submit(self._run, job_id, job_type, params)
+        log.info("Submitted %s job %s", job_type, job_id)
+        return self.store.get(job_id)
+
+    def _run(self, job_id, job_type, params):
+        if self.store.cancel_requested(job_id):
+            self._discard(job_id, job_type, params)
+            return
+        self.store.update(job_id, state="running", started_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        ctx = JobContext(self, job_id)
+        try:
+            result = self.handlers[job_type](ctx, **params)
+            state = "cancelled" if ctx.cancelled() else "completed"
+            self.store.update(job_id, state=state, result=result, finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            log.info("%s job %s %s", job_type, job_id, state)
+        except JobCancelled:
+            self.store.update(job_id, state="cancelled", finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            log.info("%s job %s cancelled", job_type, job_id)
+        except Exception as e:
+            self.store.update(job_id, state="failed", error=str(e), finished_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            log.error("%s job %s failed: %s", job_type, job_id, e)
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def list(self, job_type=None, state=None, limit=50):
+        return self.store.list(job_type, state, limit)
+
+    def cancel(self, job_id):
+        return self.store.request_cancel(job_id)
+
+    def shutdown(self):
+        for executor in self.executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
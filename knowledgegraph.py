@@ -1,46 +1,84 @@
+import asyncio
 import networkx as nx
-from neo4j import GraphDatabase
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
-import json
 import difflib
 import pandas as pd
 from tqdm import tqdm 
 import os
+import json
+import threading
+import time
+from entities import EntityIndex, find_duplicates, normalize_name
+from graphstats import GraphStats
+from querycache import QueryCache
+from storage import MemoryBackend, create_backend
+from storage.base import message_id
+from utils.log import get_logger, sampled
+from utils.timestamps import canonical, to_datetime
+
+log = get_logger(__name__)
 
 class KnowledgeGraph:
-    def __init__(self, neo4j_uri="bolt://localhost:7687", user="neo4j", password="password"):
+    def __init__(self, neo4j_uri="bolt://localhost:7687", user="neo4j", password="password", store=None):
+        """`store` is any storage backend (see storage/); without one, Neo4j at `neo4j_uri` is used,
+        or a process-local MemoryBackend when `neo4j_uri` is None."""
         self.graph = nx.MultiDiGraph()
+        # held by every change to self.graph and by readers iterating it off the writing thread
+        self.graph_lock = threading.RLock()
         self.csv_loaded = False  # Flag to prevent re-import
+        self.version = 0  # bumped on every mutation, used to invalidate derived caches
+        self.listeners = []  # callables notified with (subject, predicate, object) on mutation
+        self.shared_version = None  # last store graph version this process knows to be consistent
+        self.version_check_interval = 1.0  # seconds between checks for writes by other workers
+        self._last_version_check = 0.0
+        self.query_cache = QueryCache()
+        self.add_listener(self.query_cache.invalidate)
+        self.entities = EntityIndex()  # normalized name -> canonical entity, applied to every write and lookup
+        self.stats = GraphStats()  # fact counts and degrees of the whole store, adjusted by every write
+        self.stats_refresh_interval = 60.0  # seconds between rebuilds of the stats after writes by other workers
+        self.purge_cutoff = None  # facts created up to this are being purged from the store: hidden from reads
 
         try:
-            self.driver = GraphDatabase.driver(neo4j_uri, auth=(user, password))
-            print("Connected to Neo4j database")
-            self.sync_from_neo4j()
-            #with self.driver.session() as session:
-            #    session.run("MATCH (n) DETACH DELETE n")  # Clear database (optional)
-            #    print("Neo4j database cleared")
+            if store is None:
+                store = MemoryBackend() if neo4j_uri is None else create_backend("neo4j", uri=neo4j_uri, user=user, password=password)
+            self.store = store
+            self.store.on_version = self._on_shared_version
+            self.store.ensure_indexes()
+            log.info("Using %s storage backend", self.store.name)
+            self.load_entities()
+            self.sync_from_store()
         except Exception as e:
-            print(f"Failed to connect to Neo4j: {str(e)}")
-            self.driver = None
+            log.error("Failed to open storage backend: %s", e)
+            if store is not None:
+                try:
+                    store.close()
+                except Exception:
+                    pass
+            self.store = None
 
     # ---------------------------
     # CSV Import (only once)
     # ---------------------------
-    def import_csv_once(self, csv_path):
-        
+    def import_csv_once(self, csv_path, max_rows=100, progress=None, should_stop=None):
+        """Import the Reddit CSV once; `progress(**counts)` and `should_stop()` let a job track and cancel it"""
         flag_file = "csv_imported.flag"
         if os.path.exists(flag_file):
-            print("CSV data already imported, skipping")
-            return
-        print(f"Importing CSV data from {csv_path} into Neo4j / KnowledgeGraph")
+            log.info("CSV data already imported, skipping")
+            return {"skipped": True, "rows": 0}
+        log.info("Importing CSV data from %s into Neo4j / KnowledgeGraph", csv_path)
         df = pd.read_csv(csv_path)
-        print(f"Total rows in CSV: {len(df)}")
-        max_rows = 100  # adjust for how much you want to show
+        log.info("Total rows in CSV: %s", len(df))
+        total = min(len(df), max_rows) if max_rows else len(df)  # adjust max_rows for how much you want to show
 
-        for i, (_, row) in enumerate(tqdm(df.iterrows(), total=len(df))):
-            if i >= max_rows:
-                break   
+        for i, (_, row) in enumerate(tqdm(df.iterrows(), total=total)):
+            if i >= total:
+                break
+            if should_stop and should_stop():
+                log.info("CSV import stopped after %s rows", i)
+                return {"skipped": False, "rows": i, "stopped": True}
+            if progress and i % 100 == 0:
+                progress(rows=i, total=total)
             post_id = str(row['id'])
             author = str(row['author'])
             parent_id = row['Parent']  
@@ -66,71 +104,177 @@ class KnowledgeGraph:
         with open(flag_file, "w") as f:
             f.write("done")
 
-        print("CSV import complete!")
+        log.info("CSV import complete!")
+        return {"skipped": False, "rows": total}
     
-    def get_facts_batch(self, skip=0, limit=100):
-        """Fetch a batch of facts from Neo4j."""
-        if not self.driver:
+    def get_facts_batch(self, skip=0, limit=100, since=None, until=None):
+        """Fetch a batch of facts from the store, newest first when `since`/`until` bound created_at."""
+        if not self.store:
             return []
+        return self.store.page(skip=skip, limit=limit, since=self._after_purge(since), until=until)
 
-        with self.driver.session() as session:
-            query = f"""
-                MATCH (s:Entity)-[r:REL]->(o:Entity)
-                RETURN s.name AS subject, o.name AS object, r.predicate AS predicate,
-                       r.created_at AS created_at, r.src AS src,
-                       r.original_message AS original_message, r.version AS version
-                SKIP {skip} LIMIT {limit}
-            """
-            results = session.run(query)
-            return [dict(record) for record in results]
-        
-    def sync_from_neo4j(self, batch_size=10, limit=100):
-        """Sync data from Neo4j to NetworkX graph in batches to avoid freezing"""
-        if not self.driver:
-            print("Neo4j driver unavailable, cannot sync")
+    def ensure_indexes(self):
+        """Create the indexes lookups and bulk writes rely on (no-op when they exist)"""
+        if self.store:
+            self.store.ensure_indexes()
+
+    def iter_facts(self, predicate=None, src=None, since=None, until=None, chunk_size=5000):
+        """Stream facts from the store in lists of up to `chunk_size`, without loading everything"""
+        if not self.store:
             return
+        yield from self.store.iter_facts(predicate=predicate, src=src, since=self._after_purge(since), until=until,
+                                         chunk_size=chunk_size)
+
+    def bulk_add_facts(self, chunks, progress=None, should_stop=None):
+        """Write chunks of fact dicts to the store, one transaction per chunk.
+        Triples that already exist are left untouched, so re-importing is idempotent."""
+        if not self.store:
+            log.warning("Storage backend unavailable, cannot import")
+            return {"rows": 0, "created": 0, "skipped": 0}
+        self.ensure_indexes()
+        counts = {"rows": 0, "created": 0, "skipped": 0}
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        try:
+            for chunk in chunks:
+                if should_stop and should_stop():
+                    log.info("Bulk import stopped after %s rows", counts['rows'])
+                    break
+                rows = [dict(row, subject=self.entities.canonical(row['subject']), object=self.entities.canonical(row['object']))
+                        for row in chunk if row.get('subject') and row.get('predicate') and row.get('object')]
+                counts['skipped'] += len(chunk) - len(rows)
+                if rows:
+                    counts['created'] += self.store.bulk_add(rows, now)
+                counts['rows'] += len(chunk)
+                if progress:
+                    progress(**counts)
+        finally:
+            # the in-memory graph does not hold bulk-imported facts; drop derived caches
+            self.bump_version()
+            self.load_stats()
+        self.log_operation("bulk_import", counts)
+        log.info("Bulk import finished: %s created from %s rows", counts['created'], counts['rows'])
+        return counts
+
+    def sync_from_store(self, batch_size=10, limit=100, progress=None, should_stop=None):
+        """Sync data from the store to NetworkX graph in batches to avoid freezing"""
+        if not self.store:
+            log.warning("Storage backend unavailable, cannot sync")
+            return 0
 
         skip = 0
         total_edges = 0
-        self.graph.clear()  # Clear existing graph once at the start
+        with self.graph_lock:
+            self.graph.clear()  # Clear existing graph once at the start
 
         try:
-            with self.driver.session() as session:
-                while True:
-                    query = f"""
-                        MATCH (s:Entity)-[r:REL]->(o:Entity)
-                        RETURN s.name AS subject, o.name AS object, r.predicate AS predicate,
-                            r.created_at AS created_at, r.src AS src,
-                            r.original_message AS original_message, r.version AS version
-                        SKIP {skip} LIMIT {batch_size}
-                    """
-                    result = session.run(query)
-                    records = list(result)
-
-                    if not records:
-                        break  # No more records
+            while True:
+                records = self.store.page(skip=skip, limit=batch_size)
 
+                if not records:
+                    break  # No more records
+
+                with self.graph_lock:
                     for rec in records:
+                        if self.purging(rec['created_at']):
+                            continue
                         self.graph.add_edge(
                             rec['subject'], 
                             rec['object'], 
                             predicate=rec['predicate'],
+                            id=rec['id'],
                             created_at=rec['created_at'] or 'Unknown',
                             src=rec['src'] or 'Unknown',
-                            original_message=rec['original_message'] or 'N/A',
+                            message_id=rec['message_id'],
                             version=rec['version'] or 1
                         )
 
-                    total_edges += len(records)
-                    skip += batch_size
+                total_edges += len(records)
+                skip += batch_size
+                if progress:
+                    progress(edges=total_edges, limit=limit)
 
-                    if limit and total_edges >= limit:
-                        break
+                if limit and total_edges >= limit:
+                    break
+                if should_stop and should_stop():
+                    log.info("Sync stopped after %s triples", total_edges)
+                    break
+
+            self.bump_version()
+            log.info("Synced %s triples to in-memory graph", total_edges)
+            self.load_stats()
 
-            print(f"Synced {total_edges} triples to in-memory graph")
+        except Exception as e:
+            log.error("Failed to sync from %s: %s", self.store.name, e)
+        return total_edges
+
+    def add_listener(self, listener):
+        """Register a callable(subject, predicate, object) run after every mutation.
+        All three arguments are None when the whole graph changed (sync, delete all)."""
+        self.listeners.append(listener)
+
+    def notify_listeners(self, subject=None, predicate=None, obj=None):
+        for listener in self.listeners:
+            try:
+                listener(subject, predicate, obj)
+            except Exception as e:
+                log.error("Graph change listener failed: %s", e)
+
+    def bump_version(self, subject=None, predicate=None, obj=None):
+        """Mark the in-memory graph as changed so version-keyed caches are invalidated"""
+        self.version += 1
+        self.notify_listeners(subject, predicate, obj)
+        return self.version
 
+    def _on_shared_version(self, version):
+        """Called by the store after each of our writes with the new shared version"""
+        # only a consecutive bump proves no other worker wrote in between
+        if self.shared_version is not None and version == self.shared_version + 1:
+            self.shared_version = version
+
+    def _check_foreign_writes(self):
+        """Clear the query cache if another process changed the graph since we last looked"""
+        now = time.monotonic()
+        if not self.store or not self.store.shared or now - self._last_version_check < self.version_check_interval:
+            return
+        self._last_version_check = now
+        self._on_version_checked(self.get_version())
+
+    async def _acheck_foreign_writes(self):
+        now = time.monotonic()
+        if not self.store or not self.store.shared or now - self._last_version_check < self.version_check_interval:
+            return
+        self._last_version_check = now
+        try:
+            current = await self.store.aget_version()
         except Exception as e:
-            print(f"Failed to sync from Neo4j: {str(e)}")
+            log.warning("Failed to read shared graph version: %s", e)
+            current = self.version
+        self._on_version_checked(current)
+
+    def _on_version_checked(self, current):
+        if current != self.shared_version:
+            self.query_cache.clear()
+            self.stats.stale = True
+            self.shared_version = current
+
+    def _cached_query(self, key):
+        self._check_foreign_writes()
+        return self.query_cache.get(key)
+
+    def cache_version(self):
+        """Version for caches of derived results: our own writes, and other workers' writes
+        as seen by the rate-limited shared version check"""
+        self._check_foreign_writes()
+        return self.version, self.shared_version
+
+    def get_version(self):
+        """Current graph version shared across processes, falling back to the local counter"""
+        if self.store and self.store.shared:
+            try:
+                return self.store.get_version()
+            except Exception as e:
+                log.warning("Failed to read shared graph version: %s", e)
+        return self.version
 
     def log_operation(self, operation_type, details):
         """Log operations (add, update, delete, delete_all) to operation_log.jsonl"""
@@ -143,12 +287,14 @@ class KnowledgeGraph:
             with open('operation_log.jsonl', 'a') as f:
                 json.dump(log_entry, f, ensure_ascii=False)
                 f.write('\n')
-            print(f"Logged {operation_type} operation: {details}")
+            log.debug("Logged %s operation: %s", operation_type, details, extra=sampled())
         except Exception as e:
-            print(f"Failed to log operation: {str(e)}")
+            log.error("Failed to log operation: %s", e)
+
 
-    
     def add_fact(self, subject, predicate, obj, src, original_message):
+        # "Alice", "alice" and "Alice " are one entity: store the spelling seen first
+        subject, obj = self.entities.canonical(subject), self.entities.canonical(obj)
         # generate unique ID
         fact_id = str(uuid.uuid4())
         created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -161,55 +307,46 @@ class KnowledgeGraph:
                     for edge_key, attr in edges.items():
                         if attr['predicate'] == predicate:
                             edge_exists = True
-                            print(f"Triple {subject} {predicate} {obj} already exists in memory graph, skipping")
+                            log.debug("Triple %s %s %s already exists in memory graph, skipping", subject, predicate, obj, extra=sampled())
                             return False
 
-        # check if triple exists in Neo4j
-        if self.driver and not edge_exists:
+        # check if triple exists in the store
+        if self.store and not edge_exists:
             try:
-                with self.driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:Entity {name: $subject})-[r:REL {predicate: $predicate}]->(o:Entity {name: $object})
-                        RETURN count(r) AS count
-                    """, subject=subject, predicate=predicate, object=obj)
-                    count = result.single()['count']
-                    if count > 0:
-                        print(f"Triple {subject} {predicate} {obj} already exists in Neo4j, skipping")
-                        return False
+                if self.store.exists(subject, predicate, obj):
+                    log.debug("Triple %s %s %s already exists in %s, skipping", subject, predicate, obj, self.store.name, extra=sampled())
+                    return False
             except Exception as e:
-                print(f"Neo4j check failed: {str(e)}")
+                log.warning("%s check failed: %s", self.store.name, e)
 
         # add to NetworkX graph if triple does not exist
         if src == 'Manual':
-            self.graph.add_edge(
-                subject, obj,
-                predicate=predicate,
-                id=fact_id,
-                created_at=created_at,
-                src=src,
-                original_message=original_message,  # <-- always
-                version=1
-            )
-
-        # add to Neo4j database
-        if self.driver:
-            try:
-                with self.driver.session() as session:
-                    session.run("""
-                        MERGE (s:Entity {name: $subject})
-                        MERGE (o:Entity {name: $object})
-                        CREATE (s)-[r:REL {id: $id, predicate: $predicate, created_at: $created_at, src: $src, original_message: $original_message, version: $version}]->(o)
-                    """,
-                    subject=subject,
-                    object=obj,
+            with self.graph_lock:
+                self.graph.add_edge(
+                    subject, obj,
                     predicate=predicate,
                     id=fact_id,
                     created_at=created_at,
                     src=src,
-                    original_message=original_message,
+                    message_id=message_id(original_message),  # body is kept once in the store
                     version=1
-                    )
-                print(f"Triple {subject} {predicate} {obj} (ID: {fact_id}) added to memory and Neo4j, created at: {created_at}, source: {src}, version: 1")
+                )
+
+        # add to the store
+        if self.store:
+            try:
+                self.store.add({
+                    "id": fact_id,
+                    "subject": subject,
+                    "predicate": predicate,
+                    "object": obj,
+                    "created_at": created_at,
+                    "src": src,
+                    "original_message": original_message,
+                    "version": 1
+                })
+                log.debug("Triple %s %s %s (ID: %s) added to memory and %s, created at: %s, source: %s, version: 1", subject, predicate, obj, fact_id, self.store.name, created_at, src, extra=sampled())
+                self.stats.added(subject, predicate, obj, src)
                 # log the add operation
                 self.log_operation("add", {
                     "subject": subject,
@@ -217,290 +354,200 @@ class KnowledgeGraph:
                     "object": obj
                 })
             except Exception as e:
-                print(f"Neo4j add failed: {str(e)}")
-                self.graph.remove_edge(subject, obj)
+                log.error("%s add failed: %s", self.store.name, e)
+                with self.graph_lock:
+                    if self.graph.has_edge(subject, obj):
+                        self.graph.remove_edge(subject, obj)
                 return False
         else:
-            print("Neo4j driver unavailable")
+            log.warning("Storage backend unavailable")
 
+        self.bump_version(subject, predicate, obj)
         return True
 
-    def query_by_entity(self, entity):
-        facts = []
-        fact_keys = set()
-        if self.driver:
+    @staticmethod
+    def _store_fact(rec):
+        return {
+            "id": rec['id'],  # add unique ID
+            "subject": rec['subject'],
+            "predicate": rec['predicate'],
+            "object": rec['object'],
+            "created_at": rec['created_at'] or 'Unknown',
+            "src": rec['src'] or 'Unknown',
+            "message_id": rec['message_id'],
+            "version": str(rec['version'] or 1)
+        }
+
+    @staticmethod
+    def _memory_fact(subject, obj, attr):
+        return {
+            "id": attr.get('id'),  # add unique ID
+            "subject": subject,
+            "predicate": attr['predicate'],
+            "object": obj,
+            "created_at": attr.get('created_at', 'Unknown'),
+            "src": attr.get('src', 'Unknown'),
+            "message_id": attr.get('message_id'),
+            "version": str(attr.get('version', 1))
+        }
+
+    def _merged_query(self, cache_key, tags, label, fetch, memory_edges):
+        """Facts from the store (`fetch()`) plus in-memory edges (`memory_edges()`), deduplicated by triple"""
+        cached = self._cached_query(cache_key)
+        if cached is not None:
+            return cached
+
+        records = []
+        cacheable = True  # partial results after a store failure are not cached
+        if self.store:
             try:
-                with self.driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:Entity {name: $entity})-[r:REL]->(o:Entity)
-                        RETURN s.name AS subject, r.predicate AS predicate, o.name AS object, r.id AS id, r.created_at AS created_at, r.src AS src, r.original_message AS original_message, r.version AS version
-                        ORDER BY r.version DESC
-                        LIMIT 50
-                    """, entity=entity)
-                    for rec in result:
-                        triple = (rec['subject'], rec['predicate'], rec['object'])
-                        if triple not in fact_keys:
-                            fact_keys.add(triple)
-                            original_message = rec['original_message'] if rec['original_message'] is not None else 'N/A'
-                            facts.append({
-                                "id": rec['id'],  # add unique ID
-                                "subject": rec['subject'],
-                                "predicate": rec['predicate'],
-                                "object": rec['object'],
-                                "created_at": rec['created_at'] or 'Unknown',
-                                "src": rec['src'] or 'Unknown',
-                                "original_message": original_message,
-                                "version": str(rec['version'] or 1)
-                            })
-                    print(f"Neo4j query for {entity} successful, found {len(facts)} records")
+                records = fetch()
             except Exception as e:
-                print(f"Neo4j query failed: {str(e)}")
-
-        if entity in self.graph:
-            for neighbor in self.graph[entity]:
-                for key, attr in self.graph[entity][neighbor].items():
-                    triple = (entity, attr['predicate'], neighbor)
-                    if triple not in fact_keys:
-                        fact_keys.add(triple)
-                        original_message = attr.get('original_message', 'N/A')
-                        facts.append({
-                            "id": attr.get('id'),  # add unique ID
-                            "subject": entity,
-                            "predicate": attr['predicate'],
-                            "object": neighbor,
-                            "created_at": attr.get('created_at', 'Unknown'),
-                            "src": attr.get('src', 'Unknown'),
-                            "original_message": original_message,
-                            "version": str(attr.get('version', 1))
-                        })
-
-        print(f"Found {len(facts)} unique records for entity {entity}")
-        return facts
+                log.warning("%s query failed: %s", self.store.name, e)
+                cacheable = False
+        return self._merge_facts(cache_key, tags, label, records, memory_edges, cacheable)
 
-    def query_by_predicate(self, predicate):
-        facts = []
-        fact_keys = set()
-        if self.driver:
+    async def _amerged_query(self, cache_key, tags, label, fetch, memory_edges):
+        """_merged_query with `fetch()` returning an awaitable"""
+        await self._acheck_foreign_writes()
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        records = []
+        cacheable = True
+        if self.store:
             try:
-                with self.driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:Entity)-[r:REL {predicate: $predicate}]->(o:Entity)
-                        RETURN s.name AS subject, r.predicate AS predicate, o.name AS object, r.id AS id, r.created_at AS created_at, r.src AS src, r.original_message AS original_message, r.version AS version
-                        ORDER BY r.version DESC
-                    """, predicate=predicate)
-                    for rec in result:
-                        triple = (rec['subject'], rec['predicate'], rec['object'])
-                        if triple not in fact_keys:
-                            fact_keys.add(triple)
-                            original_message = rec['original_message'] if rec['original_message'] is not None else 'N/A'
-                            facts.append({
-                                "id": rec['id'],  #add unique ID
-                                "subject": rec['subject'],
-                                "predicate": rec['predicate'],
-                                "object": rec['object'],
-                                "created_at": rec['created_at'] or 'Unknown',
-                                "src": rec['src'] or 'Unknown',
-                                "original_message": original_message,
-                                "version": str(rec['version'] or 1)
-                            })
-                    print(f"Neo4j query for predicate {predicate} successful, found {len(facts)} records")
+                records = await fetch()
             except Exception as e:
-                print(f"Neo4j query failed: {str(e)}")
+                log.warning("%s query failed: %s", self.store.name, e)
+                cacheable = False
+        return self._merge_facts(cache_key, tags, label, records, memory_edges, cacheable)
 
-        for subj, obj, attr in self.graph.edges(data=True):
-            if attr['predicate'] == predicate:
-                triple = (subj, predicate, obj)
-                if triple not in fact_keys:
-                    fact_keys.add(triple)
-                    original_message = attr.get('original_message', 'N/A')
-                    facts.append({
-                        "id": attr.get('id'),  # add unique ID
-                        "subject": subj,
-                        "predicate": attr['predicate'],
-                        "object": obj,
-                        "created_at": attr.get('created_at', 'Unknown'),
-                        "src": attr.get('src', 'Unknown'),
-                        "original_message": original_message,
-                        "version": str(attr.get('version', 1))
-                    })
+    def _merge_facts(self, cache_key, tags, label, records, memory_edges, cacheable):
+        facts = []
+        fact_keys = set()
+        for rec in records:
+            triple = (rec['subject'], rec['predicate'], rec['object'])
+            if triple not in fact_keys and not self.purging(rec['created_at']):
+                fact_keys.add(triple)
+                facts.append(self._store_fact(rec))
+        if self.store and cacheable:
+            log.debug("%s query for %s successful, found %s records", self.store.name, label, len(facts), extra=sampled())
 
-        print(f"Found {len(facts)} unique records for predicate {predicate}")
+        for subj, obj, attr in memory_edges():
+            triple = (subj, attr['predicate'], obj)
+            if triple not in fact_keys:
+                fact_keys.add(triple)
+                facts.append(self._memory_fact(subj, obj, attr))
+
+        log.debug("Found %s unique records for %s", len(facts), label, extra=sampled())
+        if cacheable:
+            self.query_cache.put(cache_key, facts, tags=tags)
         return facts
+
+    @staticmethod
+    def _in_window(attr, since, until):
+        """Whether an in-memory edge was created between `since` and `until` (canonical strings)"""
+        if since is None and until is None:
+            return True
+        created_at = canonical(attr.get('created_at'))
+        return created_at is not None and (since is None or created_at >= since) and (until is None or created_at <= until)
+
+    def query_by_entity(self, entity, since=None, until=None):
+        entity = self.entities.resolve(entity)
+        since, until = canonical(since), canonical(until)
+
+        def memory_edges():
+            if entity in self.graph:
+                for neighbor in self.graph[entity]:
+                    for attr in self.graph[entity][neighbor].values():
+                        if self._in_window(attr, since, until):
+                            yield entity, neighbor, attr
+
+        return self._merged_query(("entity", entity, since, until), [("subject", entity)], f"entity {entity}",
+                                  lambda: self.store.query(subject=entity, limit=50, since=since, until=until), memory_edges)
+
+    def query_by_predicate(self, predicate, since=None, until=None):
+        since, until = canonical(since), canonical(until)
+
+        def memory_edges():
+            return ((s, o, attr) for s, o, attr in self.graph.edges(data=True)
+                    if attr['predicate'] == predicate and self._in_window(attr, since, until))
+
+        return self._merged_query(("predicate", predicate, since, until), [("predicate", predicate)], f"predicate {predicate}",
+                                  lambda: self.store.query(predicate=predicate, since=since, until=until), memory_edges)
     
-    def query_by_object(self, object_name):
+    def query_by_object(self, object_name, since=None, until=None):
         """Query facts where the given name is the object of the triple"""
-        facts = []
-        fact_keys = set()
-        if self.driver:
-            try:
-                with self.driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:Entity)-[r:REL]->(o:Entity {name: $object})
-                        RETURN s.name AS subject, r.predicate AS predicate, o.name AS object, r.id AS id, r.created_at AS created_at, r.src AS src, r.original_message AS original_message, r.version AS version
-                        ORDER BY r.version DESC
-                    """, object=object_name)
-                    for rec in result:
-                        triple = (rec['subject'], rec['predicate'], rec['object'])
-                        if triple not in fact_keys:
-                            fact_keys.add(triple)
-                            original_message = rec['original_message'] if rec['original_message'] is not None else 'N/A'
-                            facts.append({
-                                "id": rec['id'],
-                                "subject": rec['subject'],
-                                "predicate": rec['predicate'],
-                                "object": rec['object'],
-                                "created_at": rec['created_at'] or 'Unknown',
-                                "src": rec['src'] or 'Unknown',
-                                "original_message": original_message,
-                                "version": str(rec['version'] or 1)
-                            })
-                    print(f"Neo4j query for object {object_name} successful, found {len(facts)} records")
-            except Exception as e:
-                print(f"Neo4j query failed: {str(e)}")
-
-        for subj in self.graph:
-            if object_name in self.graph[subj]:
-                for key, attr in self.graph[subj][object_name].items():
-                    triple = (subj, attr['predicate'], object_name)
-                    if triple not in fact_keys:
-                        fact_keys.add(triple)
-                        original_message = attr.get('original_message', 'N/A')
-                        facts.append({
-                            "id": attr.get('id'),
-                            "subject": subj,
-                            "predicate": attr['predicate'],
-                            "object": object_name,
-                            "created_at": attr.get('created_at', 'Unknown'),
-                            "src": attr.get('src', 'Unknown'),
-                            "original_message": original_message,
-                            "version": str(attr.get('version', 1))
-                        })
-
-        print(f"Found {len(facts)} unique records for object {object_name}")
-        return facts
+        object_name = self.entities.resolve(object_name)
+        since, until = canonical(since), canonical(until)
+
+        def memory_edges():
+            if object_name in self.graph:
+                for subj in self.graph.pred[object_name]:
+                    for attr in self.graph[subj][object_name].values():
+                        if self._in_window(attr, since, until):
+                            yield subj, object_name, attr
+
+        return self._merged_query(("object", object_name, since, until), [("object", object_name)], f"object {object_name}",
+                                  lambda: self.store.query(obj=object_name, since=since, until=until), memory_edges)
     
     def fuzzy_query_facts(self, keyword, threshold=0.8):
-        facts = []
-        fact_keys = set()
-        if self.driver:
-            try:
-                with self.driver.session() as session:
-                    # Fuzzy search using APOC for nodes and relationships
-                    result = session.run("""
-                        MATCH (s:Entity)-[r:REL]->(o:Entity)
-                        WHERE apoc.text.fuzzyMatch(s.name, $keyword) OR apoc.text.fuzzyMatch(o.name, $keyword) OR apoc.text.fuzzyMatch(r.predicate, $keyword)
-                        RETURN s.name AS subject, r.predicate AS predicate, o.name AS object, r.id AS id, r.created_at AS created_at, r.src AS src, r.original_message AS original_message, r.version AS version
-                        ORDER BY r.version DESC
-                    """, keyword=keyword)
-                    for rec in result:
-                        triple = (rec['subject'], rec['predicate'], rec['object'])
-                        if triple not in fact_keys:
-                            fact_keys.add(triple)
-                            original_message = rec['original_message'] if rec['original_message'] is not None else 'N/A'
-                            facts.append({
-                                "id": rec['id'],
-                                "subject": rec['subject'],
-                                "predicate": rec['predicate'],
-                                "object": rec['object'],
-                                "created_at": rec['created_at'] or 'Unknown',
-                                "src": rec['src'] or 'Unknown',
-                                "original_message": original_message,
-                                "version": str(rec['version'] or 1)
-                            })
-                    print(f"Neo4j fuzzy query for {keyword} successful, found {len(facts)} records")
-            except Exception as e:
-                print(f"Neo4j fuzzy query failed: {str(e)}")
-
         # Fuzzy search in NetworkX using difflib
+        def memory_edges():
+            for subj, obj, attr in self.graph.edges(data=True):
+                if (
+                    difflib.SequenceMatcher(None, subj.lower(), keyword.lower()).ratio() >= threshold or
+                    difflib.SequenceMatcher(None, obj.lower(), keyword.lower()).ratio() >= threshold or
+                    difflib.SequenceMatcher(None, attr['predicate'].lower(), keyword.lower()).ratio() >= threshold
+                ):
+                    yield subj, obj, attr
 
-        for subj, obj, attr in self.graph.edges(data=True):
-            if (
-                difflib.SequenceMatcher(None, subj.lower(), keyword.lower()).ratio() >= threshold or
-                difflib.SequenceMatcher(None, obj.lower(), keyword.lower()).ratio() >= threshold or
-                difflib.SequenceMatcher(None, attr['predicate'].lower(), keyword.lower()).ratio() >= threshold
-            ):
-                triple = (subj, attr['predicate'], obj)
-                if triple not in fact_keys:
-                    fact_keys.add(triple)
-                    original_message = attr.get('original_message', 'N/A')
-                    facts.append({
-                        "id": attr.get('id'),
-                        "subject": subj,
-                        "predicate": attr['predicate'],
-                        "object": obj,
-                        "created_at": attr.get('created_at', 'Unknown'),
-                        "src": attr.get('src', 'Unknown'),
-                        "original_message": original_message,
-                        "version": str(attr.get('version', 1))
-                    })
-
-        print(f"Found {len(facts)} unique fuzzy records for {keyword}")
-        return facts
+        return self._merged_query(("fuzzy", keyword, threshold), [QueryCache.ANY], f"fuzzy {keyword}",
+                                  lambda: self.store.fuzzy_query(keyword, threshold), memory_edges)
 
+    def messages(self, ids):
+        """{message_id: body} of the given ids, fetched from the store in one round trip"""
+        ids = {key for key in ids if key}
+        if not ids or not self.store:
+            return {}
+        try:
+            return self.store.messages(ids)
+        except Exception as e:
+            log.warning("Failed to fetch messages from %s: %s", self.store.name, e)
+            return {}
 
+    def message(self, key):
+        """Body of one message, 'N/A' when there is none"""
+        return self.messages([key]).get(key, 'N/A')
 
+    def with_messages(self, facts, missing='N/A'):
+        """Copies of `facts` with original_message filled in from their message_id"""
+        bodies = self.messages(fact.get('message_id') for fact in facts)
+        return [dict(fact, original_message=bodies.get(fact.get('message_id'), missing)) for fact in facts]
 
     def get_all_facts(self):
-        facts = []
-        fact_keys = set()
-        if self.driver:
-            try:
-                with self.driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:Entity)-[r:REL]->(o:Entity)
-                        RETURN s.name AS subject, r.predicate AS predicate, o.name AS object, r.id AS id, r.created_at AS created_at, r.src AS src, r.original_message AS original_message, r.version AS version
-                        ORDER BY r.version DESC
-                    """)
-                    for rec in result:
-                        triple = (rec["subject"], rec["predicate"], rec["object"])
-                        if triple not in fact_keys:
-                            fact_keys.add(triple)
-                            original_message = rec["original_message"] if rec["original_message"] is not None else "N/A"
-                            facts.append({
-                                "id": rec["id"],  # add unique ID
-                                "subject": rec["subject"],
-                                "predicate": rec["predicate"],
-                                "object": rec["object"],
-                                "created_at": rec["created_at"] or "Unknown",
-                                "src": rec["src"] or "Unknown",
-                                "original_message": original_message,
-                                "version": str(rec["version"] or 1)
-                            })
-                    print(f"Neo4j query for all facts successful, found {len(facts)} records")
-            except Exception as e:
-                print(f"Neo4j query failed: {str(e)}")
+        return self._merged_query(("all",), [QueryCache.ANY], "all facts",
+                                  lambda: self.store.query(), lambda: self.graph.edges(data=True))
 
-        for subj, obj, attr in self.graph.edges(data=True):
-            triple = (subj, attr['predicate'], obj)
-            if triple not in fact_keys:
-                fact_keys.add(triple)
-                original_message = attr.get('original_message', 'N/A')
-                facts.append({
-                    "id": attr.get('id'),  # add unique ID
-                    "subject": subj,
-                    "predicate": attr['predicate'],
-                    "object": obj,
-                    "created_at": attr.get('created_at', 'Unknown'),
-                    "src": attr.get('src', 'Unknown'),
-                    "original_message": original_message,
-                    "version": str(attr.get('version', 1))
-                })
-
-        print(f"Found {len(facts)} unique records")
-        return facts
+    async def aget_all_facts(self):
+        return await self._amerged_query(("all",), [QueryCache.ANY], "all facts",
+                                         lambda: self.store.aquery(), lambda: self.graph.edges(data=True))
 
     def update_fact(self, subject, old_predicate, object, new_predicate, new_src, new_original_message):
             current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            subject, object = self.entities.resolve(subject), self.entities.resolve(object)
             
             # check if new predicate is same as old
             if new_predicate == old_predicate:
-                print(f"New predicate {new_predicate} is same as old predicate {old_predicate}, skipping update")
+                log.debug("New predicate %s is same as old predicate %s, skipping update", new_predicate, old_predicate)
                 return False
             
             try:
                 # check if subject and edge exist in NetworkX graph
                 if subject not in self.graph:
-                    print(f"Node {subject} does not exist in memory graph")
+                    log.debug("Node %s does not exist in memory graph", subject)
                     return False
                 edge_exists = False
                 edge_key = None
@@ -512,7 +559,7 @@ class KnowledgeGraph:
                         old_attributes = attr
                         break
                 if not edge_exists:
-                    print(f"Triple {subject} {old_predicate} {object} does not exist in memory graph")
+                    log.debug("Triple %s %s %s does not exist in memory graph", subject, old_predicate, object)
                     return False
 
                 # Save old triple info to JSON file
@@ -523,7 +570,7 @@ class KnowledgeGraph:
                     "id": old_attributes.get('id'),
                     "old_created_at": old_attributes.get('created_at', 'Unknown'),
                     "old_src": old_attributes.get('src', 'Unknown'),
-                    "old_original_message": old_attributes.get('original_message', 'N/A'),
+                    "old_original_message": self.message(old_attributes.get('message_id')),
                     "old_version": old_attributes.get('version', 1),
                     "updated_to": {
                         "new_predicate": new_predicate,
@@ -536,25 +583,27 @@ class KnowledgeGraph:
                     },
                     "timestamp": current_time
                 }
-                try:
-                    with open('update_history.jsonl', 'a') as f:
-                        json.dump(old_fact, f, ensure_ascii=False)
-                        f.write('\n')
-                except Exception as e:
-                    print(f"Failed to save update history: {str(e)}")
+                if self.store:
+                    try:
+                        self.store.append_history([old_fact])
+                    except Exception as e:
+                        log.error("Failed to save update history: %s", e)
 
                 # update NetworkX graph, inherit original ID
-                self.graph.remove_edge(subject, object, edge_key)
-                self.graph.add_edge(
-                    subject, object,
-                    predicate=new_predicate,
-                    id=old_attributes.get('id'),
-                    created_at=current_time,
-                    src=new_src,
-                    original_message=new_original_message,
-                    version=old_attributes.get('version', 1) + 1
-                )
-                print(f"Updated {subject} {old_predicate} {object} (ID: {old_attributes.get('id')}) to {subject} {new_predicate} {object} (version: {self.graph[subject][object][0]['version']}) in memory graph")
+                with self.graph_lock:
+                    self.graph.remove_edge(subject, object, edge_key)
+                    self.graph.add_edge(
+                        subject, object,
+                        predicate=new_predicate,
+                        id=old_attributes.get('id'),
+                        created_at=current_time,
+                        src=new_src,
+                        message_id=message_id(new_original_message),
+                        version=old_attributes.get('version', 1) + 1
+                    )
+                self.bump_version(subject, old_predicate, object)
+                self.notify_listeners(subject, new_predicate, object)
+                log.debug("Updated %s %s %s (ID: %s) to %s %s %s (version: %s) in memory graph", subject, old_predicate, object, old_attributes.get('id'), subject, new_predicate, object, self.graph[subject][object][0]['version'])
                 # log the update operation
                 self.log_operation("update", {
                     "subject": subject,
@@ -564,69 +613,58 @@ class KnowledgeGraph:
                     "id": old_attributes.get('id')
                 })
             except Exception as e:
-                print(f"Memory graph update failed: {str(e)}")
+                log.error("Memory graph update failed: %s", e)
                 return False
 
-            # update Neo4j database
-            if self.driver:
+            # update the store
+            if self.store:
                 try:
-                    with self.driver.session() as session:
-                        result = session.run("""
-                            MATCH (s:Entity {name: $subject})-[r:REL {predicate: $old_predicate, id: $id}]->(o:Entity {name: $object})
-                            DELETE r
-                            WITH s, o
-                            CREATE (s)-[new_r:REL {id: $id, predicate: $new_predicate, created_at: $current_time, src: $new_src, original_message: $new_original_message, version: $new_version}]->(o)
-                            RETURN count(new_r) as count
-                        """, 
-                        subject=subject, 
-                        old_predicate=old_predicate, 
-                        object=object, 
-                        id=old_attributes.get('id'),
-                        new_predicate=new_predicate, 
-                        current_time=current_time, 
-                        new_src=new_src, 
-                        new_original_message=new_original_message,
-                        new_version=old_attributes.get('version', 1) + 1
-                        )
-                        count = result.single()['count']
-                        if count == 0:
-                            print(f"Triple {subject} {old_predicate} {object} (ID: {old_attributes.get('id')}) not found in Neo4j")
-                            return False
-                        print(f"Updated {subject} {old_predicate} {object} (ID: {old_attributes.get('id')}) to {subject} {new_predicate} {object} (version: {old_attributes.get('version', 1) + 1}) in Neo4j")
-                        # log operation already handled above
-                        return True
+                    updated = self.store.update(
+                        subject, old_predicate, object, old_attributes.get('id'),
+                        new_predicate=new_predicate,
+                        created_at=current_time,
+                        src=new_src,
+                        original_message=new_original_message,
+                        version=old_attributes.get('version', 1) + 1
+                    )
+                    if not updated:
+                        log.debug("Triple %s %s %s (ID: %s) not found in %s", subject, old_predicate, object, old_attributes.get('id'), self.store.name)
+                        return False
+                    log.debug("Updated %s %s %s (ID: %s) to %s %s %s (version: %s) in %s", subject, old_predicate, object, old_attributes.get('id'), subject, new_predicate, object, old_attributes.get('version', 1) + 1, self.store.name)
+                    self.stats.updated(subject, old_predicate, object, old_attributes.get('src'), new_predicate, new_src)
+                    # evict again: a reader may have cached the pre-write store rows
+                    self.query_cache.invalidate(subject, old_predicate, object)
+                    self.query_cache.invalidate(subject, new_predicate, object)
+                    # log operation already handled above
+                    return True
                 except Exception as e:
-                    print(f"Neo4j update failed: {str(e)}")
+                    log.error("%s update failed: %s", self.store.name, e)
                     return False
+            self.stats.updated(subject, old_predicate, object, old_attributes.get('src'), new_predicate, new_src)
             return True
 
 
     def get_update_timeline(self, subject, object, id):
         if not id:
-            print(f"Missing ID parameter, cannot query timeline for {subject} * {object}")
+            log.debug("Missing ID parameter, cannot query timeline for %s * %s", subject, object)
             return []
+        subject, object = self.entities.resolve(subject), self.entities.resolve(object)
         
         timeline = []
-        try:
-            with open('update_history.jsonl', 'r') as f:
-                for line in f:
-                    if line.strip():
-                        entry = json.loads(line.strip())
-                        # match id, subject, and object
-                        if entry['id'] == id and entry['subject'] == subject and entry['object'] == object:
-                            timeline.append({
-                                "timestamp": entry['timestamp'],
-                                "old_predicate": entry['old_predicate'],
-                                "new_predicate": entry['updated_to']['new_predicate'],
-                                "id": entry['id'],
-                                "version": entry['old_version'],
-                                "src": entry['updated_to']['new_src'] or 'Unknown',
-                                "original_message": entry['updated_to']['new_original_message'] or 'N/A'
-                            })
-        except FileNotFoundError:
-            print("update_history.jsonl not found, skipping history")
-        except Exception as e:
-            print(f"Failed to query history: {str(e)}")
+        if self.store:
+            try:
+                for entry in self.store.history(subject, object, id):
+                    timeline.append({
+                        "timestamp": entry['timestamp'],
+                        "old_predicate": entry['old_predicate'],
+                        "new_predicate": entry['updated_to']['new_predicate'],
+                        "id": entry['id'],
+                        "version": entry['old_version'],
+                        "src": entry['updated_to']['new_src'] or 'Unknown',
+                        "original_message": entry['updated_to']['new_original_message'] or 'N/A'
+                    })
+            except Exception as e:
+                log.warning("Failed to query history: %s", e)
 
         current_entry = None
         if subject in self.graph and object in self.graph[object]:
@@ -639,57 +677,57 @@ class KnowledgeGraph:
                         "id": attr.get('id'),
                         "version": attr.get('version', 1),
                         "src": attr.get('src', 'Unknown'),
-                        "original_message": attr.get('original_message', 'N/A')
+                        "original_message": self.message(attr.get('message_id'))
                     }
                     break  # take first matching edge
-        elif self.driver:
+        elif self.store:
             try:
-                with self.driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:Entity {name: $subject})-[r:REL {id: $id}]->(o:Entity {name: $object})
-                        RETURN r.predicate AS predicate, r.id AS id, r.created_at AS created_at, r.src AS src, r.original_message AS original_message, r.version AS version
-                        LIMIT 1
-                    """, subject=subject, object=object, id=id)
-                    record = result.single()
-                    if record:
-                        current_entry = {
-                            "timestamp": record['created_at'] or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                            "old_predicate": record['predicate'],
-                            "new_predicate": record['predicate'],
-                            "id": record['id'],
-                            "version": record['version'] or 1,
-                            "src": record['src'] or 'Unknown',
-                            "original_message": record['original_message'] or 'N/A'
-                        }
+                record = self.store.get_fact(subject, object, id)
+                if record:
+                    current_entry = {
+                        "timestamp": record['created_at'] or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        "old_predicate": record['predicate'],
+                        "new_predicate": record['predicate'],
+                        "id": record['id'],
+                        "version": record['version'] or 1,
+                        "src": record['src'] or 'Unknown',
+                        "original_message": self.message(record['message_id'])
+                    }
             except Exception as e:
-                print(f"Neo4j query for current triple failed: {str(e)}")
+                log.warning("%s query for current triple failed: %s", self.store.name, e)
 
         if current_entry:
             timeline.append(current_entry)
 
-        timeline.sort(key=lambda x: x['timestamp'])
-        print(f"Timeline query successful, found {len(timeline)} records for {subject} * {object}")
+        # chronological, not lexicographic; unparseable timestamps sort first
+        timeline.sort(key=lambda x: to_datetime(x['timestamp']) or datetime.min)
+        log.debug("Timeline query successful, found %s records for %s * %s", len(timeline), subject, object)
         return timeline
 
     def delete_fact(self, subject, predicate, object):
+        subject, object = self.entities.resolve(subject), self.entities.resolve(object)
         # Check if subject exists
         if subject not in self.graph:
-            print(f"Node {subject} does not exist in memory graph")
+            log.debug("Node %s does not exist in memory graph", subject)
             return False
 
         edge_exists = False
         edge_key = None
+        edge_src = None
         for key, attr in self.graph[subject].get(object, {}).items():
             if attr['predicate'] == predicate:
                 edge_exists = True
                 edge_key = key
+                edge_src = attr.get('src')
                 break
         if not edge_exists:
-            print(f"Triple {subject} {predicate} {object} does not exist in memory graph")
+            log.debug("Triple %s %s %s does not exist in memory graph", subject, predicate, object)
             return False
         try:
-            self.graph.remove_edge(subject, object, edge_key)
-            print(f"Triple {subject} {predicate} {object} deleted from memory graph")
+            with self.graph_lock:
+                self.graph.remove_edge(subject, object, edge_key)
+            self.bump_version(subject, predicate, object)
+            log.debug("Triple %s %s %s deleted from memory graph", subject, predicate, object)
             # Log the delete operation
             self.log_operation("delete", {
                 "subject": subject,
@@ -697,64 +735,621 @@ class KnowledgeGraph:
                 "object": object
             })
         except Exception as e:
-            print(f"Memory graph deletion failed: {str(e)}")
+            log.error("Memory graph deletion failed: %s", e)
             return False
 
-        if self.driver:
+        if self.store:
             try:
-                with self.driver.session() as session:
-                    result = session.run("""
-                        MATCH (s:Entity {name: $subject})-[r:REL {predicate: $predicate}]->(o:Entity {name: $object})
-                        DELETE r
-                        RETURN count(r) as count
-                    """, subject=subject, predicate=predicate, object=object)
-                    count = result.single()['count']
-                    if count == 0:
-                        print(f"Triple {subject} {predicate} {object} not found in Neo4j")
-                        return False
-                    print(f"Triple {subject} {predicate} {object} deleted from Neo4j")
-                    # Log operation already handled above
-                    return True
+                count = self.store.delete(subject, predicate, object)
+                if count == 0:
+                    log.debug("Triple %s %s %s not found in %s", subject, predicate, object, self.store.name)
+                    return False
+                log.debug("Triple %s %s %s deleted from %s", subject, predicate, object, self.store.name)
+                self.stats.deleted(subject, predicate, object, edge_src, count)
+                # evict again: a reader may have cached the pre-write store rows
+                self.query_cache.invalidate(subject, predicate, object)
+                # Log operation already handled above
+                return True
             except Exception as e:
-                print(f"Neo4j deletion failed: {str(e)}")
+                log.error("%s deletion failed: %s", self.store.name, e)
                 return False
+        self.stats.deleted(subject, predicate, object, edge_src)
         return True
+    # ---------------------------
+    # Batch mutations
+    # ---------------------------
+    def _index_edges_by_id(self, ids):
+        """One pass over the in-memory graph mapping the requested fact IDs to edges"""
+        wanted = set(ids)
+        index = {}
+        if not wanted:
+            return index
+        for subj, obj, key, attr in self.graph.edges(keys=True, data=True):
+            if attr.get('id') in wanted:
+                index[attr['id']] = (subj, obj, key)
+        return index
+
+    def _find_memory_edge(self, subject, obj, predicate=None, fact_id=None, id_index=None):
+        if fact_id and id_index is not None and fact_id in id_index:
+            return id_index[fact_id]
+        if subject in self.graph:
+            for key, attr in self.graph[subject].get(obj, {}).items():
+                if attr['predicate'] == predicate:
+                    return (subject, obj, key)
+        return None
+
+    def _plan_updates(self, updates):
+        """Validate update items: (results pre-filled for invalid/unchanged items, by_id, by_triple)"""
+        results = [None] * len(updates)
+        by_id, by_triple = [], []
+        for idx, item in enumerate(updates):
+            item = item if isinstance(item, dict) else {}
+            new_predicate = item.get('new_predicate')
+            old_predicate = item.get('old_predicate')
+            obj = item.get('object') or item.get('old_object')
+            if item.get('id') and new_predicate:
+                by_id.append({"idx": idx, "id": item['id'], "new_predicate": new_predicate, "old_predicate": old_predicate})
+            elif all([item.get('subject'), old_predicate, obj, new_predicate]):
+                if old_predicate == new_predicate:
+                    results[idx] = {"index": idx, "status": "unchanged"}
+                    continue
+                by_triple.append({"idx": idx, "subject": self.entities.resolve(item['subject']), "old_predicate": old_predicate,
+                                  "object": self.entities.resolve(obj), "new_predicate": new_predicate})
+            else:
+                results[idx] = {"index": idx, "status": "invalid", "error": "Missing required fields"}
+        return results, by_id, by_triple
+
+    def _memory_update_rows(self, by_id, by_triple):
+        """Changes update items would make to the in-memory graph, when there is no store"""
+        changed = []
+        id_index = self._index_edges_by_id(item['id'] for item in by_id)
+        for item in by_id + by_triple:
+            edge = self._find_memory_edge(item.get('subject'), item.get('object'), item.get('old_predicate'),
+                                          item.get('id'), id_index if 'id' in item else None)
+            if not edge:
+                continue
+            attr = self.graph.edges[edge]
+            if attr['predicate'] == item['new_predicate']:
+                continue
+            changed.append({"idx": item['idx'], "id": attr.get('id'), "subject": edge[0], "object": edge[1],
+                            "old_predicate": attr['predicate'], "old_created_at": attr.get('created_at', 'Unknown'),
+                            "old_src": attr.get('src', 'Unknown'), "old_message_id": attr.get('message_id'),
+                            "old_version": attr.get('version', 1)})
+        return changed
+
+    def _apply_updates(self, results, by_id, by_triple, changed, current_time, new_src, new_original_message):
+        """Single in-memory pass over updates applied by the store; records history and fills `results`"""
+        id_index = self._index_edges_by_id(row['id'] for row in changed if row['id'])
+        old_messages = self.messages(row['old_message_id'] for row in changed)
+        history = []
+        new_predicates = {item['idx']: item['new_predicate'] for item in by_id + by_triple}
+        for row in changed:
+            new_predicate = new_predicates[row['idx']]
+            new_version = (row['old_version'] or 1) + 1
+            edge = self._find_memory_edge(row['subject'], row['object'], row['old_predicate'], row['id'], id_index if row['id'] else None)
+            if edge:
+                self.graph.edges[edge].update(
+                    predicate=new_predicate,
+                    created_at=current_time,
+                    src=new_src,
+                    message_id=message_id(new_original_message),
+                    version=new_version
+                )
+            self.stats.updated(row['subject'], row['old_predicate'], row['object'], row['old_src'], new_predicate, new_src)
+            self.bump_version(row['subject'], row['old_predicate'], row['object'])
+            self.notify_listeners(row['subject'], new_predicate, row['object'])
+            history.append({
+                "subject": row['subject'],
+                "old_predicate": row['old_predicate'],
+                "object": row['object'],
+                "id": row['id'],
+                "old_created_at": row['old_created_at'] or 'Unknown',
+                "old_src": row['old_src'] or 'Unknown',
+                "old_original_message": old_messages.get(row['old_message_id'], 'N/A'),
+                "old_version": row['old_version'] or 1,
+                "updated_to": {
+                    "new_predicate": new_predicate,
+                    "new_object": row['object'],
+                    "id": row['id'],
+                    "new_created_at": current_time,
+                    "new_src": new_src,
+                    "new_original_message": new_original_message,
+                    "new_version": new_version
+                },
+                "timestamp": current_time
+            })
+            results[row['idx']] = {"index": row['idx'], "status": "updated", "id": row['id'],
+                                   "subject": row['subject'], "old_predicate": row['old_predicate'],
+                                   "object": row['object'], "new_predicate": new_predicate, "version": new_version}
+
+        for item in by_id + by_triple:
+            if results[item['idx']] is None:
+                results[item['idx']] = {"index": item['idx'], "status": "not_found"}
+
+        if history:
+            if self.store:
+                try:
+                    self.store.append_history(history)
+                except Exception as e:
+                    log.error("Failed to save update history: %s", e)
+            self.log_operation("batch_update", {
+                "count": len(history),
+                "ids": [entry['id'] for entry in history]
+            })
+        return len(history)
+
+    def update_facts(self, updates, new_src, new_original_message=None):
+        """Apply many predicate updates in one store transaction and one in-memory pass.
+
+        Each update is {"id", "new_predicate"} or {"subject", "old_predicate", "object", "new_predicate"}.
+        Returns one result dict per input item, in order.
+        """
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        results, by_id, by_triple = self._plan_updates(updates)
+
+        # rows describing each applied change: idx, id, subject, object, old props
+        if self.store:
+            try:
+                changed = self.store.batch_update(by_id, by_triple, current_time, new_src, new_original_message)
+            except Exception as e:
+                log.error("%s batch update failed: %s", self.store.name, e)
+                return self._fail(results, by_id + by_triple, e)
+        else:
+            changed = self._memory_update_rows(by_id, by_triple)
+
+        applied = self._apply_updates(results, by_id, by_triple, changed, current_time, new_src, new_original_message)
+        log.debug("Batch update applied %s of %s updates", applied, len(updates))
+        return results
+
+    def _plan_deletes(self, items):
+        """Validate delete items: (results pre-filled for invalid items, by_id, by_triple)"""
+        results = [None] * len(items)
+        by_id, by_triple = [], []
+        for idx, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            if item.get('id'):
+                by_id.append({"idx": idx, "id": item['id']})
+            elif all([item.get('subject'), item.get('predicate'), item.get('object')]):
+                by_triple.append({"idx": idx, "subject": self.entities.resolve(item['subject']), "predicate": item['predicate'],
+                                  "object": self.entities.resolve(item['object'])})
+            else:
+                results[idx] = {"index": idx, "status": "invalid", "error": "Missing required fields"}
+        return results, by_id, by_triple
+
+    def _memory_delete_rows(self, by_id, by_triple):
+        deleted = []
+        id_index = self._index_edges_by_id(item['id'] for item in by_id)
+        for item in by_id + by_triple:
+            edge = self._find_memory_edge(item.get('subject'), item.get('object'), item.get('predicate'),
+                                          item.get('id'), id_index if 'id' in item else None)
+            if edge:
+                attr = self.graph.edges[edge]
+                deleted.append({"idx": item['idx'], "id": attr.get('id'), "subject": edge[0],
+                                "predicate": attr['predicate'], "object": edge[1], "src": attr.get('src')})
+        return deleted
+
+    def _apply_deletes(self, results, by_id, by_triple, deleted):
+        """Single in-memory pass over facts deleted by the store; fills `results`"""
+        id_index = self._index_edges_by_id(row['id'] for row in deleted if row['id'])
+        for row in deleted:
+            edge = self._find_memory_edge(row['subject'], row['object'], row['predicate'], row['id'], id_index if row['id'] else None)
+            with self.graph_lock:
+                if edge and self.graph.has_edge(*edge):
+                    self.graph.remove_edge(*edge)
+            self.stats.deleted(row['subject'], row['predicate'], row['object'], row.get('src'))
+            self.bump_version(row['subject'], row['predicate'], row['object'])
+            results[row['idx']] = {"index": row['idx'], "status": "deleted", "id": row['id'], "subject": row['subject'],
+                                   "predicate": row['predicate'], "object": row['object']}
+
+        for item in by_id + by_triple:
+            if results[item['idx']] is None:
+                results[item['idx']] = {"index": item['idx'], "status": "not_found"}
+
+        if deleted:
+            self.log_operation("batch_delete", {
+                "count": len(deleted),
+                "facts": [[row['subject'], row['predicate'], row['object']] for row in deleted]
+            })
+
+    def delete_facts(self, items):
+        """Delete many facts in one store transaction and one in-memory pass.
+
+        Each item is {"id"} or {"subject", "predicate", "object"}.
+        Returns one result dict per input item, in order.
+        """
+        results, by_id, by_triple = self._plan_deletes(items)
+
+        if self.store:
+            try:
+                deleted = self.store.batch_delete(by_id, by_triple)
+            except Exception as e:
+                log.error("%s batch delete failed: %s", self.store.name, e)
+                return self._fail(results, by_id + by_triple, e)
+        else:
+            deleted = self._memory_delete_rows(by_id, by_triple)
+
+        self._apply_deletes(results, by_id, by_triple, deleted)
+        log.debug("Batch delete removed %s facts for %s requests", len(deleted), len(items))
+        return results
+
+    def _plan_adds(self, facts, src, original_message, created_at):
+        """Validate new facts: (results pre-filled for invalid/existing items, store rows).
+        Triples already in the in-memory graph or repeated within the batch are reported as existing."""
+        results = [None] * len(facts)
+        rows = []
+        seen = set()
+        for idx, item in enumerate(facts):
+            item = item if isinstance(item, dict) else {}
+            subject, predicate, obj = item.get('subject'), item.get('predicate'), item.get('object')
+            if not all([subject, predicate, obj]):
+                results[idx] = {"index": idx, "status": "invalid", "error": "Missing required fields"}
+                continue
+            subject, obj = self.entities.canonical(subject), self.entities.canonical(obj)
+            if (subject, predicate, obj) in seen or self._find_memory_edge(subject, obj, predicate):
+                results[idx] = {"index": idx, "status": "exists", "subject": subject, "predicate": predicate, "object": obj}
+                continue
+            seen.add((subject, predicate, obj))
+            rows.append({"idx": idx, "id": str(uuid.uuid4()), "subject": subject, "predicate": predicate, "object": obj,
+                         "created_at": created_at, "src": src, "original_message": original_message, "version": 1})
+        return results, rows
+
+    def _apply_adds(self, results, rows, added):
+        """In-memory pass over facts created by the store; fills `results`"""
+        created = {row['idx'] for row in added}
+        for row in rows:
+            fact = {"subject": row['subject'], "predicate": row['predicate'], "object": row['object']}
+            if row['idx'] not in created:
+                results[row['idx']] = {"index": row['idx'], "status": "exists", **fact}
+                continue
+            # like add_fact, only manual entries go straight into the in-memory graph
+            if row['src'] == 'Manual':
+                with self.graph_lock:
+                    self.graph.add_edge(row['subject'], row['object'], predicate=row['predicate'], id=row['id'],
+                                        created_at=row['created_at'], src=row['src'],
+                                        message_id=message_id(row['original_message']), version=1)
+            self.stats.added(row['subject'], row['predicate'], row['object'], row['src'])
+            self.bump_version(row['subject'], row['predicate'], row['object'])
+            results[row['idx']] = {"index": row['idx'], "status": "added", "id": row['id'], **fact}
+
+        if created:
+            self.log_operation("batch_add", {
+                "count": len(created),
+                "facts": [[row['subject'], row['predicate'], row['object']] for row in rows if row['idx'] in created]
+            })
 
+    def add_facts(self, facts, src, original_message=None):
+        """Add many facts in one store transaction, skipping triples that already exist.
+
+        Each fact is {"subject", "predicate", "object"}. Returns one result dict per input item, in order.
+        """
+        created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        results, rows = self._plan_adds(facts, src, original_message, created_at)
+        if not self.store:
+            log.warning("Storage backend unavailable")
+            return self._fail(results, rows, "Storage backend unavailable")
+        try:
+            added = self.store.batch_add(rows) if rows else []
+        except Exception as e:
+            log.error("%s batch add failed: %s", self.store.name, e)
+            return self._fail(results, rows, e)
+
+        self._apply_adds(results, rows, added)
+        log.debug("Batch add created %s of %s facts", len(added), len(facts))
+        return results
+
+    def apply_operations(self, adds=(), updates=(), deletes=(), src="Chat", original_message=None):
+        """Apply deletes, updates and adds together in one store transaction.
+
+        Items use the formats of delete_facts, update_facts and add_facts. Returns
+        {"add": [...], "update": [...], "delete": [...]} with one result per item, in order.
+        """
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        add_results, add_rows = self._plan_adds(list(adds), src, original_message, current_time)
+        update_results, update_by_id, update_by_triple = self._plan_updates(list(updates))
+        delete_results, delete_by_id, delete_by_triple = self._plan_deletes(list(deletes))
+        outcome = {"add": add_results, "update": update_results, "delete": delete_results}
+
+        if not self.store:
+            log.warning("Storage backend unavailable")
+            self._fail(add_results, add_rows, "Storage backend unavailable")
+            self._fail(update_results, update_by_id + update_by_triple, "Storage backend unavailable")
+            self._fail(delete_results, delete_by_id + delete_by_triple, "Storage backend unavailable")
+            return outcome
+        try:
+            applied = self.store.apply_batch(add_rows, update_by_id, update_by_triple, delete_by_id, delete_by_triple,
+                                             current_time, src, original_message)
+        except Exception as e:
+            log.error("%s batch apply failed: %s", self.store.name, e)
+            self._fail(add_results, add_rows, e)
+            self._fail(update_results, update_by_id + update_by_triple, e)
+            self._fail(delete_results, delete_by_id + delete_by_triple, e)
+            return outcome
+
+        self._finish_operations(outcome, applied, add_rows, update_by_id, update_by_triple,
+                                delete_by_id, delete_by_triple, current_time, src, original_message)
+        return outcome
+
+    def _finish_operations(self, outcome, applied, add_rows, update_by_id, update_by_triple,
+                           delete_by_id, delete_by_triple, current_time, src, original_message):
+        """In-memory pass over the rows the store changed in apply_batch"""
+        self._apply_deletes(outcome["delete"], delete_by_id, delete_by_triple, applied['deleted'])
+        self._apply_updates(outcome["update"], update_by_id, update_by_triple, applied['updated'],
+                            current_time, src, original_message)
+        self._apply_adds(outcome["add"], add_rows, applied['added'])
+        log.debug("Applied %s deletes, %s updates and %s adds in one batch",
+                  len(applied['deleted']), len(applied['updated']), len(applied['added']))
+
+    async def aadd_facts(self, facts, src, original_message=None):
+        """add_facts through the store's async interface"""
+        created_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        results, rows = self._plan_adds(facts, src, original_message, created_at)
+        if not self.store:
+            log.warning("Storage backend unavailable")
+            return self._fail(results, rows, "Storage backend unavailable")
+        try:
+            added = await self.store.abatch_add(rows) if rows else []
+        except Exception as e:
+            log.error("%s batch add failed: %s", self.store.name, e)
+            return self._fail(results, rows, e)
+
+        # the in-memory pass writes the operation log; keep that file I/O off the event loop
+        await asyncio.to_thread(self._apply_adds, results, rows, added)
+        log.debug("Batch add created %s of %s facts", len(added), len(facts))
+        return results
+
+    async def aapply_operations(self, adds=(), updates=(), deletes=(), src="Chat", original_message=None):
+        """apply_operations through the store's async interface"""
+        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        add_results, add_rows = self._plan_adds(list(adds), src, original_message, current_time)
+        update_results, update_by_id, update_by_triple = self._plan_updates(list(updates))
+        delete_results, delete_by_id, delete_by_triple = self._plan_deletes(list(deletes))
+        outcome = {"add": add_results, "update": update_results, "delete": delete_results}
+
+        if not self.store:
+            log.warning("Storage backend unavailable")
+            self._fail(add_results, add_rows, "Storage backend unavailable")
+            self._fail(update_results, update_by_id + update_by_triple, "Storage backend unavailable")
+            self._fail(delete_results, delete_by_id + delete_by_triple, "Storage backend unavailable")
+            return outcome
+        try:
+            applied = await self.store.aapply_batch(add_rows, update_by_id, update_by_triple, delete_by_id,
+                                                    delete_by_triple, current_time, src, original_message)
+        except Exception as e:
+            log.error("%s batch apply failed: %s", self.store.name, e)
+            self._fail(add_results, add_rows, e)
+            self._fail(update_results, update_by_id + update_by_triple, e)
+            self._fail(delete_results, delete_by_id + delete_by_triple, e)
+            return outcome
+
+        # updates read message bodies and append to the store's history, and every kind writes
+        # the operation log: blocking calls, so they run off the event loop
+        await asyncio.to_thread(self._finish_operations, outcome, applied, add_rows, update_by_id, update_by_triple,
+                                delete_by_id, delete_by_triple, current_time, src, original_message)
+        return outcome
+
+    @staticmethod
+    def _fail(results, items, error):
+        for item in items:
+            results[item['idx']] = {"index": item['idx'], "status": "error", "error": str(error)}
+        return results
     
-    def delete_all_facts(self):
+    def clear_local_state(self):
+        """Clear the in-memory graph and update history at once.
+        Returns the cutoff timestamp to pass to purge_store, or None on failure.
+        Until that purge ends, the facts it deletes are hidden from store reads."""
+        cutoff = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         try:
             # Clear NetworkX graph
-            self.graph.clear()
-            print("Memory graph cleared")
+            with self.graph_lock:
+                self.graph.clear()
+            if self.store:
+                self.purge_cutoff = cutoff
+                self.stats.clear()
+            self.bump_version()
+            log.info("Memory graph cleared")
             # Log the delete_all operation
             self.log_operation("delete_all", {"description": "All facts deleted from the knowledge graph"})
         except Exception as e:
-            print(f"Memory graph clear failed: {str(e)}")
-            return False
+            log.error("Memory graph clear failed: %s", e)
+            return None
 
-        # Clear Neo4j database
-        if self.driver:
+        # Clear update history
+        if self.store:
             try:
-                with self.driver.session() as session:
-                    session.run("MATCH (n) DETACH DELETE n")
-                    print("Neo4j database cleared")
-                    # Log operation already handled above
+                self.store.clear_history()
+                log.info("Update history log cleared")
             except Exception as e:
-                print(f"Neo4j clear failed: {str(e)}")
+                log.error("Failed to clear update history log: %s", e)
+                return None
+        return cutoff
+
+    def delete_all_facts(self, batch_size=10000):
+        """Delete every fact, purging the store in chunks on the calling thread"""
+        cutoff = self.clear_local_state()
+        if cutoff is None:
+            return False
+        if self.store:
+            try:
+                self.purge_store(cutoff, batch_size)
+            except Exception as e:
+                log.error("%s clear failed: %s", self.store.name, e)
                 return False
+        return True
 
-        # Clear update_history.jsonl
+    def purge_store(self, cutoff, batch_size=10000, progress=None, should_stop=None):
+        """Delete facts created up to `cutoff`, then orphaned entities, one chunk per transaction.
+
+        Facts written after the cutoff survive, so the purge can run in the background.
+        `progress(**counts)` is called after every chunk and `should_stop()` is checked
+        between chunks.
+        """
+        finished = False
         try:
-            with open('update_history.jsonl', 'w') as f:
-                f.truncate(0)
-            print("Update history log cleared")
-        except Exception as e:
-            print(f"Failed to clear update history log: {str(e)}")
+            counts = self.store.purge(cutoff, batch_size=batch_size, progress=progress, should_stop=should_stop)
+            finished = not (should_stop and should_stop())
+            log.info("%s purge finished: %s facts, %s entities, %s messages deleted", self.store.name,
+                     counts['deleted_facts'], counts['deleted_entities'], counts.get('deleted_messages', 0))
+        finally:
+            if not self.end_purge(cutoff, restore=not finished):
+                # readers may have cached rows that were still in the store during the purge
+                self.bump_version()
+                self.load_stats()
+        return counts
+
+    def purging(self, created_at):
+        """Whether a stored fact created at `created_at` is being deleted by the active purge"""
+        cutoff = self.purge_cutoff
+        if cutoff is None:
             return False
+        created_at = canonical(created_at)
+        return created_at is None or created_at <= cutoff
+
+    def _after_purge(self, since):
+        """`since` raised past the active purge's cutoff, so store reads skip the facts it deletes"""
+        cutoff = self.purge_cutoff
+        if cutoff is None:
+            return since
+        bound = canonical(to_datetime(cutoff) + timedelta(seconds=1))
+        return bound if since is None or canonical(since) < bound else since
 
+    def end_purge(self, cutoff, restore=False):
+        """Stop hiding the facts of the purge up to `cutoff`; False when it is not the active one.
+        With `restore` the purge did not finish, so what it left in the store is synced back
+        into the in-memory graph."""
+        if cutoff is None or self.purge_cutoff != cutoff:
+            return False
+        self.purge_cutoff = None
+        if restore:
+            log.info("Purge up to %s did not finish, restoring the remaining facts", cutoff)
+            self.sync_from_store()
+        self.bump_version()
+        self.load_stats()
         return True
 
+    def migrate_timestamps(self, batch_size=10000, progress=None, should_stop=None):
+        """Convert created_at values the store kept in an older form (strings in Neo4j,
+        non-canonical text in SQLite) to its native timestamps, one chunk per transaction."""
+        try:
+            counts = self.store.migrate_timestamps(batch_size=batch_size, progress=progress, should_stop=should_stop)
+            log.info("%s timestamp migration finished: %s converted, %s invalid",
+                     self.store.name, counts['converted'], counts['invalid'])
+        finally:
+            self.bump_version()
+        return counts
+
+    def migrate_messages(self, batch_size=10000, progress=None, should_stop=None):
+        """Move message bodies stored inline on facts into the content-addressed message
+        store, one chunk per transaction. Until then those facts show no original_message."""
+        try:
+            counts = self.store.migrate_messages(batch_size=batch_size, progress=progress, should_stop=should_stop)
+            log.info("%s message migration finished: %s moved", self.store.name, counts['moved'])
+        finally:
+            self.bump_version()
+        return counts
+
+    # ---------------------------
+    # Entity canonicalization
+    # ---------------------------
+    def load_entities(self):
+        """Rebuild the entity index from the store's entity names and recorded aliases"""
+        try:
+            self.entities.load(self.store.entity_names(), self.store.aliases())
+            log.info("Loaded %s entities into the canonicalization index", len(self.entities))
+        except Exception as e:
+            log.warning("Failed to load entity names from %s: %s", self.store.name, e)
+
+    def _merge_memory_entity(self, alias, target):
+        """Move the in-memory edges of `alias` onto `target`, dropping triples `target` already has"""
+        with self.graph_lock:
+            if alias not in self.graph:
+                return
+            edges = [(target if s == alias else s, target if o == alias else o, attr)
+                     for s, o, attr in list(self.graph.out_edges(alias, data=True)) + list(self.graph.in_edges(alias, data=True))]
+            self.graph.remove_node(alias)
+            for s, o, attr in edges:
+                if not self._find_memory_edge(s, o, attr['predicate']):
+                    self.graph.add_edge(s, o, **attr)
+
+    def merge_duplicate_entities(self, threshold=90, batch_size=500, dry_run=False, progress=None, should_stop=None):
+        """Merge entities whose names are the same up to case, spacing and Unicode form,
+        or within `threshold` (RapidFuzz ratio, None for exact keys only) of each other.
+
+        Clusters are found with prefix blocking (see entities.find_duplicates) and
+        merged into their best connected name, `batch_size` aliases per store
+        transaction. With `dry_run` the clusters are only reported.
+        """
+        if not self.store:
+            log.warning("Storage backend unavailable, cannot merge entities")
+            return {"clusters": 0, "aliases": 0, "merged": 0, "moved": 0, "dropped": 0}
+        clusters = find_duplicates(self.store.entity_degrees(), threshold=threshold)
+        pairs = [{"alias": alias, "key": normalize_name(alias), "canonical": cluster['canonical']}
+                 for cluster in clusters for alias in cluster['aliases']]
+        counts = {"clusters": len(clusters), "aliases": len(pairs), "merged": 0, "moved": 0, "dropped": 0}
+        if dry_run:
+            counts['preview'] = clusters[:100]
+            return counts
+        try:
+            for start in range(0, len(pairs), batch_size):
+                if should_stop and should_stop():
+                    log.info("Entity merge stopped after %s aliases", counts['merged'])
+                    break
+                batch = pairs[start:start + batch_size]
+                merged = self.store.merge_entities(batch)
+                for key in ("merged", "moved", "dropped"):
+                    counts[key] += merged[key]
+                self.entities.add_aliases(batch)
+                for pair in batch:
+                    self._merge_memory_entity(pair['alias'], pair['canonical'])
+                if progress:
+                    progress(**counts)
+        finally:
+            # cached lookups of the merged names are stale
+            self.bump_version()
+            self.load_stats()
+        self.log_operation("merge_entities", {key: counts[key] for key in ("clusters", "merged", "moved", "dropped")})
+        log.info("Entity merge finished: %s aliases merged, %s facts moved, %s duplicates dropped",
+                 counts['merged'], counts['moved'], counts['dropped'])
+        return counts
+
+    # ---------------------------
+    # Statistics
+    # ---------------------------
+    def load_stats(self):
+        """Rebuild the statistics counters from the store's aggregates"""
+        if not self.store:
+            return
+        try:
+            self.stats.load(self.store.fact_counts(self.stats.label_predicates), self.store.entity_degrees())
+        except Exception as e:
+            log.warning("Failed to load graph statistics from %s: %s", self.store.name, e)
+
+    def get_stats(self, top=10):
+        """Fact counts per predicate, source and label value, and the `top` best connected entities.
+
+        Served from counters every write keeps current; they are rebuilt from the
+        store only once other workers have written, at most every stats_refresh_interval.
+        """
+        self._check_foreign_writes()
+        # during a purge the store still counts the facts being deleted
+        if self.purge_cutoff is None and self.stats.stale and (self.stats.loaded_at is None
+                                 or time.monotonic() - self.stats.loaded_at >= self.stats_refresh_interval):
+            self.load_stats()
+        return self.stats.snapshot(top)
+
+    def entity_metrics(self, names=None, community=None, component=None, limit=100):
+        """Analytics properties stored by the last analytics run (see graphanalytics.py), highest PageRank first"""
+        if not self.store:
+            return []
+        if names is not None:
+            names = [self.entities.resolve(name) for name in names]
+        return self.store.entity_metrics(names=names, community=community, component=component, limit=limit)
+
     def close(self):
-        if self.driver:
-            self.driver.close()
-            print("Neo4j connection closed")
\ No newline at end of file
+        if self.store:
+            self.store.close()
+            log.info("%s connection closed", self.store.name)
+
+    async def aclose(self):
+        """Close the store's async connections; the sync ones are left to close()"""
+        if self.store:
+            await self.store.aclose()
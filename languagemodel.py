@@ -1,88 +1,159 @@
+import asyncio
 import ollama
 import spacy
 import re
+import os
 from typing import Dict, Optional
 import json
-from utils.utils import debug_print
+import metrics
+import llmclient
+from utils.log import get_logger
+
+log = get_logger(__name__)
 
 class LocalLLM:
     def __init__(self, model_name="deepseek-r1:7b"):
         self.model_name = model_name
+        self.ollama_timeout = float(os.getenv("OLLAMA_TIMEOUT", "30"))
+        self._ollama = None  # (pid, client); created per process, see _ollama_client
+        self._ollama_async = None  # (pid, AsyncClient) for the ASGI app
         try:
             self.nlp = spacy.load("en_core_web_sm")  # English model; use "zh_core_web_sm" for Chinese
-            debug_print(f"Using local model: {self.model_name} and spaCy model")
+            log.info("Using local model: %s and spaCy model", self.model_name)
         except Exception as e:
-            debug_print(f"Failed to load spaCy model: {str(e)}")
+            log.error("Failed to load spaCy model: %s", e)
             raise Exception("spaCy model loading failed, please ensure the model is installed")
 
+    def _ollama_client(self):
+        # LocalLLM is preloaded in the gunicorn master; each worker needs its own HTTP connections
+        if self._ollama is None or self._ollama[0] != os.getpid():
+            self._ollama = (os.getpid(), ollama.Client(timeout=self.ollama_timeout))
+        return self._ollama[1]
+
+    def _ollama_async_client(self):
+        if self._ollama_async is None or self._ollama_async[0] != os.getpid():
+            self._ollama_async = (os.getpid(), ollama.AsyncClient(timeout=self.ollama_timeout))
+        return self._ollama_async[1]
+
     def chat(self, prompt):
         try:
-            response = ollama.chat(
-                model=self.model_name,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with metrics.track_llm("ollama", "chat"):
+                response = self._ollama_client().chat(
+                    model=self.model_name,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+            metrics.record_llm_tokens("ollama", "chat", response.get('prompt_eval_count'), response.get('eval_count'))
+            return response['message']['content'].strip()
+        except Exception as e:
+            log.error("LLM call failed: %s", e)
+            return None
+
+    async def chat_async(self, prompt):
+        """chat on ollama.AsyncClient"""
+        try:
+            with metrics.track_llm("ollama", "chat"):
+                response = await self._ollama_async_client().chat(
+                    model=self.model_name,
+                    messages=[{"role": "user", "content": prompt}]
+                )
+            metrics.record_llm_tokens("ollama", "chat", response.get('prompt_eval_count'), response.get('eval_count'))
             return response['message']['content'].strip()
         except Exception as e:
-            print(f"LLM call failed: {str(e)}")
+            log.error("LLM call failed: %s", e)
             return None
         
 
     def analyze_intent_with_gpt(self, user_input: str, id: Optional[str] = None) -> Dict:
         """
         analyze intent using OpenAI GPT and return structured data.
+        add, update and delete are lists, so one message can carry several operations.
         """
-        result = {
-            "add": None,
-            "update": None,
-            "delete": None,
-            "query": None
-        }
+        try:
+            response = llmclient.get_openai().complete(
+                "intent",
+                model="gpt-4o",
+                messages=[{"role": "system", "content": self._intent_prompt(user_input)}],
+                response_format={"type": "json_object"}
+            )
+            return self._parse_intent(response.choices[0].message.content)
+        except llmclient.LLMUnavailable as e:
+            log.warning("%s, using local intent analysis", e)
+            return self.analyze_intent_locally(user_input, id)
+        except Exception as e:
+            log.error("OpenAI error: %s", e)
+            return self.analyze_intent_locally(user_input, id)
 
-        prompt = f"""
-        To implement a better LLM long-term memory management system, analyze the input to determine whether to add, update, delete memory triples, or query information. Extract accurate memory triples (subject, predicate, object), return JSON. For add, update, or delete intents, ensure all fields (subject, predicate, object for add/delete; subject, old_predicate, object, new_predicate for update) are non-empty if the intent is not null. For query, extract multiple keywords from the sentence, such as pronouns (I, he, she, etc.), names, titles (teacher, my Dad), predicates.
+    async def analyze_intent_async(self, user_input: str, id: Optional[str] = None) -> Dict:
+        """analyze_intent_with_gpt on the async OpenAI client; spaCy fallback runs in a worker thread"""
+        try:
+            response = await llmclient.get_async_openai().complete(
+                "intent",
+                model="gpt-4o",
+                messages=[{"role": "system", "content": self._intent_prompt(user_input)}],
+                response_format={"type": "json_object"}
+            )
+            return self._parse_intent(response.choices[0].message.content)
+        except llmclient.LLMUnavailable as e:
+            log.warning("%s, using local intent analysis", e)
+        except Exception as e:
+            log.error("OpenAI error: %s", e)
+        return await asyncio.to_thread(self.analyze_intent_locally, user_input, id)
+
+    @staticmethod
+    def _intent_prompt(user_input):
+        return f"""
+        To implement a better LLM long-term memory management system, analyze the input to determine whether to add, update, delete memory triples, or query information. Extract accurate memory triples (subject, predicate, object), return JSON. A message may state several facts: return every triple, as one list entry each. For add, update, or delete entries, ensure all fields (subject, predicate, object for add/delete; subject, old_predicate, object, new_predicate for update) are non-empty. For query, extract multiple keywords from the sentence, such as pronouns (I, he, she, etc.), names, titles (teacher, my Dad), predicates.
 
         Input: "{user_input}"
 
         Output:
         {{
-            "add": null or {{"subject": str, "predicate": str, "object": str}},
-            "update": null or {{"subject": str, "old_predicate": str, "object": str, "new_predicate": str}},
-            "delete": null or {{"subject": str, "predicate": str, "object": str}},
+            "add": [{{"subject": str, "predicate": str, "object": str}}, ...],
+            "update": [{{"subject": str, "old_predicate": str, "object": str, "new_predicate": str}}, ...],
+            "delete": [{{"subject": str, "predicate": str, "object": str}}, ...],
             "query": null or {{"keywords": [str]}}
         }}
 
         Examples:
         Input: "Pizza is my favorite food."
-        Output: {{"add": {{"subject": "Pizza", "predicate": "is", "object": "my favorite food"}}, "update": null, "delete": null, "query": null}}
+        Output: {{"add": [{{"subject": "Pizza", "predicate": "is", "object": "my favorite food"}}], "update": [], "delete": [], "query": null}}
+
+        Input: "Alice lives in Paris, works at Acme and has a dog named Rex."
+        Output: {{"add": [{{"subject": "Alice", "predicate": "lives in", "object": "Paris"}}, {{"subject": "Alice", "predicate": "works at", "object": "Acme"}}, {{"subject": "Alice", "predicate": "has a dog named", "object": "Rex"}}], "update": [], "delete": [], "query": null}}
 
         Input: "Alice is no longer friends with Bob, now she is married to him."
-        Output: {{"add": null, "update": {{"subject": "Alice", "old_predicate": "friends with", "object": "Bob", "new_predicate": "married to"}}, "delete": null, "query": null}}
+        Output: {{"add": [], "update": [{{"subject": "Alice", "old_predicate": "friends with", "object": "Bob", "new_predicate": "married to"}}], "delete": [], "query": null}}
 
         Input: "Forget that Alice is friends with Bob."
-        Output: {{"add": null, "update": null, "delete": {{"subject": "Alice", "predicate": "friends with", "object": "Bob"}}, "query": null}}
+        Output: {{"add": [], "update": [], "delete": [{{"subject": "Alice", "predicate": "friends with", "object": "Bob"}}], "query": null}}
 
         Input: "What is the relationship between Alice and Bob?"
-        Output: {{"add": null, "update": null, "delete": null, "query": {{"keywords": ["Alice", "Bob", "relationship"]}}}}
+        Output: {{"add": [], "update": [], "delete": [], "query": {{"keywords": ["Alice", "Bob", "relationship"]}}}}
         """
 
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "system", "content": prompt}],
-                response_format={"type": "json_object"}
-            )
-            result_str = response.choices[0].message.content
-            debug_print(f"GPT response: {result_str}")
-
-            # Parse JSON
-            parsed = json.loads(result_str)
-            if all(key in parsed for key in ["add", "update", "delete", "query"]):
-                return parsed
-            debug_print("Invalid GPT response format")
-            return result
-        except Exception as e:
-            debug_print(f"OpenAI error: {str(e)}")
-            return result
+    @staticmethod
+    def _parse_intent(result_str):
+        """Intent dict from the model's JSON; raises on malformed JSON"""
+        log.debug("GPT response: %s", result_str)
+        parsed = json.loads(result_str)
+        if all(key in parsed for key in ["add", "update", "delete", "query"]):
+            for key in ("add", "update", "delete"):
+                # tolerate the single-object form
+                value = parsed[key]
+                parsed[key] = [value] if isinstance(value, dict) else [op for op in value or [] if isinstance(op, dict)]
+            return parsed
+        log.warning("Invalid GPT response format")
+        return {"add": [], "update": [], "delete": [], "query": None}
+
+    def analyze_intent_locally(self, user_input, id=None):
+        """spaCy fallback for analyze_intent_with_gpt, in its list format"""
+        extracted = self.analyze_intent_and_extract(user_input, id)
+        result = {key: [extracted[key]] if extracted[key] else [] for key in ("add", "update", "delete")}
+        for item in result["update"]:
+            item.setdefault("object", item.get("old_object"))
+        query = extracted["query"]
+        result["query"] = {"keywords": [query]} if isinstance(query, str) else query
+        return result
 
     def classify_intent(self, user_input):
         """Classify user intent: add, update, delete, or query"""
@@ -142,14 +213,14 @@ class LocalLLM:
             if len(entities) > 3:
                 entities = entities[:3]
 
-            debug_print(f"Extracted subject: {subject}, objects: {objects}, predicate: {predicate}")
+            log.debug("Extracted subject: %s, objects: %s, predicate: %s", subject, objects, predicate)
             return {
                 "subject": subject,
                 "objects": objects,
                 "predicate": predicate
             }
         except Exception as e:
-            debug_print(f"Error in extract_entities_and_predicate: {str(e)}")
+            log.warning("Error in extract_entities_and_predicate: %s", e)
             return {"subject": None, "objects": [], "predicate": None}
 
     def extract_new_predicate(self, user_input):
@@ -170,7 +241,7 @@ class LocalLLM:
                     return match.group(2)
             return None
         except Exception as e:
-            debug_print(f"Error in extract_new_predicate: {str(e)}")
+            log.warning("Error in extract_new_predicate: %s", e)
             return None
 
     def analyze_intent_and_extract(self, user_input, id=None):
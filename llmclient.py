@@ -0,0 +1,272 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+import openai
+from openai import AsyncOpenAI, OpenAI
+
+import metrics
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+# LLM_TIMEOUT            seconds one call may take in total, retries included (default 20)
+# LLM_MAX_RETRIES        retries after the first attempt (default 2)
+# LLM_MAX_CONCURRENCY    calls in flight per process (default 8)
+# LLM_ASYNC_MAX_CONCURRENCY  the same for the ASGI app's async client (default 64)
+# LLM_BREAKER_FAILURES   consecutive failures that open the circuit breaker (default 5)
+# LLM_BREAKER_RESET      seconds the breaker stays open before one trial call (default 30)
+# OPENAI_BASE_URL        e.g. http://localhost:8001/v1 for utils/mock_openai.py
+
+# transient failures; anything else (bad request, auth) is not retried
+RETRYABLE = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+
+class LLMUnavailable(Exception):
+    """The provider cannot answer within the deadline: breaker open, saturated or failing"""
+
+
+class CircuitBreaker:
+    """Stops calling a failing provider for `reset_timeout` seconds after
+    `failure_threshold` consecutive failures, then lets one trial call through.
+
+    The caller that gets the trial (allow() returns TRIAL) must call end_trial()
+    however the call ends, so an inconclusive trial (a bad request, no free slot)
+    lets the next call try again instead of keeping the breaker shut.
+    """
+
+    TRIAL = "trial"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        """False while open, TRIAL for the one call let through while half open, else True"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self._trial:
+                return False
+            self._trial = True  # only one trial call while half open
+            return self.TRIAL
+
+    def end_trial(self):
+        """Release the trial slot; a no-op once record_success/record_failure settled it"""
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    log.warning("LLM circuit breaker opened after %s failures", self.failures)
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+
+class LLMClient:
+    """OpenAI-compatible chat completions with a deadline, jittered retries,
+    a concurrency cap and a circuit breaker.
+
+    `complete` either returns the completion or raises LLMUnavailable before the
+    deadline passes, so callers can fall back to a local model.
+    """
+
+    client_class = OpenAI
+
+    def __init__(self, provider="openai", api_key=None, base_url=None, timeout=20.0, max_retries=2,
+                 max_concurrency=8, breaker=None, backoff_base=0.25, backoff_cap=4.0):
+        self.provider = provider
+        # retries and timeouts are ours; the SDK's own would stack on top of the deadline
+        self.client = self.client_class(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = self._new_slots(max_concurrency)
+
+    @staticmethod
+    def _new_slots(count):
+        return threading.BoundedSemaphore(count)
+
+    def _backoff(self, attempt):
+        # full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    def complete(self, call, timeout=None, **request):
+        """chat.completions.create(**request) labelled `call` on /metrics"""
+        deadline = time.monotonic() + (timeout or self.timeout)
+        allowed = self.breaker.allow()
+        if not allowed:
+            raise LLMUnavailable(f"{self.provider} circuit breaker is open")
+        try:
+            if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                raise LLMUnavailable(f"{self.provider} concurrency limit reached")
+            try:
+                return self._attempts(call, deadline, request)
+            finally:
+                self._slots.release()
+        finally:
+            if allowed is CircuitBreaker.TRIAL:
+                self.breaker.end_trial()
+
+    def _attempts(self, call, deadline, request):
+        """Call until success, a non-retryable error, the retry limit or the deadline"""
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.breaker.record_failure()
+                raise LLMUnavailable(f"{self.provider} {call} call exceeded its deadline")
+            try:
+                with metrics.track_llm(self.provider, call):
+                    response = self.client.chat.completions.create(timeout=remaining, **request)
+            except RETRYABLE as e:
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self.breaker.record_failure()
+                    raise LLMUnavailable(f"{self.provider} {call} call failed: {e}") from e
+                log.warning("%s %s call failed (attempt %s), retrying in %.2fs: %s",
+                            self.provider, call, attempt + 1, delay, e)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            if response.usage:
+                metrics.record_llm_tokens(self.provider, call, response.usage.prompt_tokens,
+                                          response.usage.completion_tokens)
+            return response
+
+
+class AsyncLLMClient(LLMClient):
+    """LLMClient on AsyncOpenAI for the ASGI app: `complete` is a coroutine and
+    waiting (backoff, a free slot) yields to the event loop instead of a thread."""
+
+    client_class = AsyncOpenAI
+
+    @staticmethod
+    def _new_slots(count):
+        return asyncio.Semaphore(count)
+
+    async def complete(self, call, timeout=None, **request):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        allowed = self.breaker.allow()
+        if not allowed:
+            raise LLMUnavailable(f"{self.provider} circuit breaker is open")
+        try:
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                raise LLMUnavailable(f"{self.provider} concurrency limit reached") from None
+            try:
+                return await self._attempts(call, deadline, request)
+            finally:
+                self._slots.release()
+        finally:
+            if allowed is CircuitBreaker.TRIAL:
+                self.breaker.end_trial()
+
+    async def _attempts(self, call, deadline, request):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.breaker.record_failure()
+                raise LLMUnavailable(f"{self.provider} {call} call exceeded its deadline")
+            try:
+                with metrics.track_llm(self.provider, call):
+                    response = await self.client.chat.completions.create(timeout=remaining, **request)
+            except RETRYABLE as e:
+                delay = self._backoff(attempt)
+                if attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    self.breaker.record_failure()
+                    raise LLMUnavailable(f"{self.provider} {call} call failed: {e}") from e
+                log.warning("%s %s call failed (attempt %s), retrying in %.2fs: %s",
+                            self.provider, call, attempt + 1, delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            if response.usage:
+                metrics.record_llm_tokens(self.provider, call, response.usage.prompt_tokens,
+                                          response.usage.completion_tokens)
+            return response
+
+
+_openai = None
+_async_openai = None
+_openai_lock = threading.Lock()
+
+
+def _options():
+    return {
+        "provider": "openai",
+        "api_key": os.getenv("OPENAI_API_KEY"),
+        "base_url": os.getenv("OPENAI_BASE_URL") or None,
+        "timeout": float(os.getenv("LLM_TIMEOUT", "20")),
+        "max_retries": int(os.getenv("LLM_MAX_RETRIES", "2"))
+    }
+
+
+_breaker = None
+
+
+def _shared_breaker():
+    # the sync and async clients talk to the same provider, so they trip together
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker(int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                                  float(os.getenv("LLM_BREAKER_RESET", "30")))
+    return _breaker
+
+
+def get_openai():
+    """The process-wide OpenAI client, configured from the environment"""
+    global _openai
+    if _openai is None:
+        with _openai_lock:
+            if _openai is None:
+                _openai = LLMClient(max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                                    breaker=_shared_breaker(), **_options())
+    return _openai
+
+
+def get_async_openai():
+    """The process-wide AsyncOpenAI client of the ASGI app; create it inside the serving event loop"""
+    global _async_openai
+    if _async_openai is None:
+        with _openai_lock:
+            if _async_openai is None:
+                _async_openai = AsyncLLMClient(max_concurrency=int(os.getenv("LLM_ASYNC_MAX_CONCURRENCY", "64")),
+                                               breaker=_shared_breaker(), **_options())
+    return _async_openai
+
+
+def reset_after_fork():
+    """HTTP connection pools must not be shared with the master process"""
+    global _openai, _async_openai, _breaker
+    _openai = None
+    _async_openai = None
+    _breaker = None
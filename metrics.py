@@ -0,0 +1,231 @@
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Under gunicorn set PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) before
+# start-up so every worker's samples are aggregated on /metrics.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+REQUEST_LATENCY = Histogram(
+    "kg_http_request_duration_seconds", "HTTP request latency by Flask route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+STORE_LATENCY = Histogram(
+    "kg_store_operation_duration_seconds", "Storage backend call latency by logical operation",
+    ["backend", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+STORE_ERRORS = Counter(
+    "kg_store_operation_errors_total", "Storage backend calls that raised",
+    ["backend", "operation"]
+)
+LLM_LATENCY = Histogram(
+    "kg_llm_request_duration_seconds", "LLM call latency",
+    ["provider", "call", "status"],
+    buckets=(0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+)
+LLM_TOKENS = Counter(
+    "kg_llm_tokens_total", "Tokens used by LLM calls",
+    ["provider", "call", "kind"]
+)
+
+# storage backend method -> logical operation label
+STORE_OPERATIONS = {
+    "exists": "check",
+    "add": "add",
+    "update": "update",
+    "delete": "delete",
+    "batch_update": "batch_update",
+    "batch_delete": "batch_delete",
+    "batch_add": "batch_add",
+    "apply_batch": "apply_batch",
+    "bulk_add": "bulk_add",
+    "purge": "purge",
+    "migrate_timestamps": "migrate_timestamps",
+    "migrate_messages": "migrate_messages",
+    "merge_entities": "merge_entities",
+    "query": "query",
+    "fuzzy_query": "fuzzy_query",
+    "get_fact": "get_fact",
+    "page": "page",
+    "iter_facts": "iter_facts",
+    "neighbors": "neighbors",
+    "messages": "messages",
+    "entity_names": "entity_names",
+    "entity_degrees": "entity_degrees",
+    "fact_counts": "fact_counts",
+    "set_entity_metrics": "set_entity_metrics",
+    "entity_metrics": "entity_metrics",
+    "get_version": "version",
+    "append_history": "history_write",
+    "history": "history_read"
+}
+
+# coroutines of backends with an async driver; the StorageBackend defaults run the
+# sync method in a thread and are already timed through it
+ASYNC_STORE_OPERATIONS = {
+    "aget_version": "version",
+    "aquery": "query",
+    "abatch_add": "batch_add",
+    "aapply_batch": "apply_batch"
+}
+
+
+# ---------------------------
+# Storage backend
+# ---------------------------
+def _timed_call(method, backend, operation):
+    latency = STORE_LATENCY.labels(backend, operation)
+    errors = STORE_ERRORS.labels(backend, operation)
+
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def generator(*args, **kwargs):
+            # time the whole stream, including the consumer's pace
+            start = time.perf_counter()
+            try:
+                yield from method(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start)
+        return generator
+
+    if inspect.iscoroutinefunction(method):
+        @functools.wraps(method)
+        async def coroutine(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(*args, **kwargs)
+            except Exception:
+                errors.inc()
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start)
+        return coroutine
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - start)
+    return wrapper
+
+
+def instrument_store(store):
+    """Time every storage call of this backend instance, labelled by logical operation"""
+    if store is None or getattr(store, "_instrumented", False):
+        return store
+    for name, operation in STORE_OPERATIONS.items():
+        method = getattr(store, name, None)
+        if method is not None:
+            setattr(store, name, _timed_call(method, store.name, operation))
+    for name, operation in ASYNC_STORE_OPERATIONS.items():
+        if name in vars(type(store)):
+            setattr(store, name, _timed_call(getattr(store, name), store.name, operation))
+    store._instrumented = True
+    return store
+
+
+# ---------------------------
+# LLM calls
+# ---------------------------
+@contextmanager
+def track_llm(provider, call):
+    """Time an LLM call; the status label is "error" when the block raises"""
+    start = time.perf_counter()
+    status = "error"
+    try:
+        yield
+        status = "ok"
+    finally:
+        LLM_LATENCY.labels(provider, call, status).observe(time.perf_counter() - start)
+
+
+def record_llm_tokens(provider, call, prompt_tokens=None, completion_tokens=None):
+    if prompt_tokens:
+        LLM_TOKENS.labels(provider, call, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        LLM_TOKENS.labels(provider, call, "completion").inc(completion_tokens)
+
+
+# ---------------------------
+# Graph and cache state (read at scrape time)
+# ---------------------------
+class GraphCollector:
+    """Exports query cache statistics and in-memory graph size of this process.
+
+    `get_kg` returns the current KnowledgeGraph or None; a scrape never
+    initialises the graph.
+    """
+
+    def __init__(self, get_kg):
+        self.get_kg = get_kg
+
+    def collect(self):
+        kg = self.get_kg()
+        if kg is None:
+            return
+        nodes = GaugeMetricFamily("kg_graph_nodes", "Nodes in the in-memory graph")
+        nodes.add_metric([], kg.graph.number_of_nodes())
+        yield nodes
+        edges = GaugeMetricFamily("kg_graph_edges", "Edges in the in-memory graph")
+        edges.add_metric([], kg.graph.number_of_edges())
+        yield edges
+        version = GaugeMetricFamily("kg_graph_local_version", "Local graph mutation counter")
+        version.add_metric([], kg.version)
+        yield version
+
+        stats = kg.query_cache.stats()
+        for field in ("hits", "misses", "evictions", "invalidations"):
+            counter = CounterMetricFamily(f"kg_query_cache_{field}", f"Query cache {field}")
+            counter.add_metric([], stats[field])
+            yield counter
+        for field, help_text in (("entries", "Entries in the query cache"),
+                                 ("bytes", "Estimated query cache size in bytes"),
+                                 ("hit_rate", "Query cache hit rate since start")):
+            gauge = GaugeMetricFamily(f"kg_query_cache_{field}", help_text)
+            gauge.add_metric([], stats[field])
+            yield gauge
+
+
+_graph_collector = None
+
+
+def register_graph_collector(get_kg):
+    global _graph_collector
+    if _graph_collector is None:
+        _graph_collector = GraphCollector(get_kg)
+        REGISTRY.register(_graph_collector)
+
+
+def render():
+    """(body, content type) for the /metrics endpoint"""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        if _graph_collector is not None:
+            # graph and cache state of the worker serving the scrape
+            registry.register(_graph_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drop a dead gunicorn worker's live gauges from the multiprocess files"""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(pid)
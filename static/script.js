@@ -2,7 +2,8 @@ let cy = cytoscape({
     container: document.getElementById('cy'),
     style: [
         { selector: 'node', style: { 'label': 'data(id)', 'background-color': '#0074D9', 'color': '#0f0' } },
-        { selector: 'edge', style: { 'label': 'data(predicate)', 'curve-style': 'bezier', 'target-arrow-shape': 'triangle' } }
+        { selector: 'edge', style: { 'label': 'data(predicate)', 'curve-style': 'bezier', 'target-arrow-shape': 'triangle' } },
+        { selector: 'node[?cluster]', style: { 'label': 'data(label)', 'background-color': '#AAAAAA', 'shape': 'round-rectangle' } }
     ],
     layout: { name: 'cose' }
 });
@@ -46,7 +47,7 @@ function renderFactsPage(page) {
         <li ondblclick="showUpdateModal('${escapeString(f.subject)}', '${escapeString(f.predicate)}', '${escapeString(f.object)}', '${escapeString(f.id)}')">
             <span class="triple">${f.subject} ${f.predicate} ${f.object}</span>
             <span class="fact-buttons">
-                <button class="details" onclick="showDetailsModal('${escapeString(f.subject)}', '${escapeString(f.predicate)}', '${escapeString(f.object)}', '${escapeString(f.created_at)}', '${escapeString(f.src)}', '${escapeString(f.original_message)}', '${escapeString(f.version)}', '${escapeString(f.id)}')">Details</button>
+                <button class="details" onclick="showDetailsModal('${escapeString(f.subject)}', '${escapeString(f.predicate)}', '${escapeString(f.object)}', '${escapeString(f.created_at)}', '${escapeString(f.src)}', '${escapeString(f.message_id)}', '${escapeString(f.version)}', '${escapeString(f.id)}')">Details</button>
                 <button class="update" onclick="showUpdateModal('${escapeString(f.subject)}', '${escapeString(f.predicate)}', '${escapeString(f.object)}', '${escapeString(f.id)}')">Update</button>
                 <button class="delete" onclick="deleteTriple('${escapeString(f.subject)}', '${escapeString(f.predicate)}', '${escapeString(f.object)}', '${escapeString(f.id)}')">Delete</button>
             </span>
@@ -94,12 +95,12 @@ function fetchFacts() {
                     object: String(fact.object || ''),
                     created_at: String(fact.created_at || 'Unknown'),
                     src: String(fact.src || 'Unknown'),
-                    original_message: String(fact.original_message || 'N/A'),
+                    message_id: String(fact.message_id || ''),
                     version: String(fact.version || '1')
                 }));
             currentPage = 1;
             renderFactsPage(currentPage);
-            updateCytoscape(allFactsData);
+            fetchSubgraph();
         })
         .catch(error => {
             console.error('Fetch facts error:', error);
@@ -251,12 +252,90 @@ function updateCytoscape(data) {
     cy.layout({ name: 'breadthfirst', animate: true }).run();
 }
 
-function showDetailsModal(subject, predicate, object, createdAt, source, originalMessage, version, id) {
+// Fetch a server-side, budgeted subgraph (ego-graph around focus if given)
+function fetchSubgraph(focus = null) {
+    const maxEdgesInputEl = document.getElementById('node-limit');
+    const maxEdges = maxEdgesInputEl ? (parseInt(maxEdgesInputEl.value, 10) || 100) : 100;
+    const params = new URLSearchParams({ max_edges: maxEdges, max_nodes: maxEdges });
+    if (focus) params.set('focus', focus);
+
+    fetch(`http://localhost:5000/api/subgraph?${params.toString()}`)
+        .then(res => res.ok ? res.json() : res.text().then(text => Promise.reject(`HTTP ${res.status}: ${text}`)))
+        .then(data => renderSubgraph(data))
+        .catch(err => {
+            console.error('Fetch subgraph error:', err);
+            updateCytoscape(allFactsData);
+        });
+}
+
+function renderSubgraph(data) {
+    cy.elements().remove();
+    const elements = [];
+    data.nodes.forEach(node => {
+        const element = { data: { id: node.id, label: node.label, cluster: node.cluster, count: node.count || 0 } };
+        if (node.position) element.position = node.position;
+        elements.push(element);
+    });
+    const hasPositions = data.nodes.length > 0 && data.nodes.every(node => node.position);
+    data.edges.forEach(edge => {
+        elements.push({
+            data: {
+                source: edge.source,
+                target: edge.target,
+                predicate: edge.count > 1 ? `${edge.predicate} (${edge.count})` : edge.predicate
+            }
+        });
+    });
+
+    const warningEl = document.getElementById('graph-warning');
+    if (warningEl) {
+        warningEl.textContent = data.truncated
+            ? `Showing ${data.nodes.length} of ${data.total_nodes} nodes; grey nodes group low-degree neighbours.`
+            : '';
+    }
+
+    cy.add(elements);
+    // server-computed coordinates: no client-side layout pass needed
+    if (hasPositions) {
+        cy.layout({ name: 'preset', fit: true }).run();
+    } else {
+        cy.layout({ name: 'breadthfirst', animate: true }).run();
+    }
+}
+
+// Click a node to re-centre the view on its ego-graph
+cy.on('tap', 'node', evt => {
+    const node = evt.target;
+    if (!node.data('cluster')) {
+        fetchSubgraph(node.id());
+    }
+});
+
+// Facts carry only a message id; the body is fetched when the details are opened
+function showOriginalMessage(messageId) {
+    const target = document.getElementById('details-original-message');
+    if (!messageId) {
+        target.textContent = 'N/A';
+        return;
+    }
+    target.textContent = 'Loading...';
+    fetch(`http://localhost:5000/api/messages?ids=${encodeURIComponent(messageId)}`)
+        .then(response => response.ok ? response.json() : {})
+        .then(messages => {
+            target.textContent = messages[messageId] || 'N/A';
+        })
+        .catch(error => {
+            console.error('Fetch message error:', error);
+            target.textContent = 'N/A';
+        });
+}
+
+function showDetailsModal(subject, predicate, object, createdAt, source, messageId, version, id) {
     document.getElementById('details-created-at').innerHTML = createdAt && createdAt !== 'Unknown' 
         ? `<span class="time-display">🕒 ${formatDateTime(createdAt)}</span>` 
         : 'Unknown';
     document.getElementById('details-source').textContent = source || 'Unknown';
-    document.getElementById('details-original-message').textContent = originalMessage || 'N/A';
+    showOriginalMessage(messageId);
     document.getElementById('details-version').textContent = version || '1';
     
     fetch(`http://localhost:5000/api/update_timeline?subject=${encodeURIComponent(subject)}&object=${encodeURIComponent(object)}&id=${encodeURIComponent(id)}`)
@@ -553,7 +632,7 @@ function handleQueryResults(data) {
             object: String(f.object).trim(),
             created_at: f.created_at ?? 'Unknown',
             src: f.src ?? 'Unknown',
-            original_message: f.original_message ?? 'N/A',
+            message_id: f.message_id ?? '',
             version: String(f.version ?? '1')
         }));
 
@@ -569,6 +648,16 @@ function fetchFactsWithLimit() {
     fetchFacts(limit);
 }
 
+// Identifies this browser's conversation to the server-side chat memory
+function getChatSessionId() {
+    let sessionId = localStorage.getItem('chat-session-id');
+    if (!sessionId) {
+        sessionId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Date.now()) + Math.random().toString(16).slice(2);
+        localStorage.setItem('chat-session-id', sessionId);
+    }
+    return sessionId;
+}
+
 function sendChat() {
     let userInput = document.getElementById('chat-input').value.trim();
     if (!userInput) return;
@@ -583,7 +672,7 @@ function sendChat() {
     fetch('http://localhost:5000/api/chat', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: userInput })
+        body: JSON.stringify({ message: userInput, session_id: getChatSessionId() })
     })
     .then(response => {
         if (!response.ok) {
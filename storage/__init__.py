@@ -0,0 +1,26 @@
+from storage.base import StorageBackend
+from storage.memory_backend import MemoryBackend
+from storage.sqlite_backend import SQLiteBackend
+
+BACKENDS = ("neo4j", "sqlite", "memory")
+
+
+def create_backend(name, **options):
+    """Build a storage backend by name.
+
+    neo4j:  uri, user, password
+    sqlite: path
+    memory: no options
+    """
+    if name == "neo4j":
+        # imported lazily so the embedded backends work without the driver installed
+        from storage.neo4j_backend import Neo4jBackend
+        return Neo4jBackend(**options)
+    if name == "sqlite":
+        return SQLiteBackend(**options)
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"Unknown storage backend: {name} (expected one of {', '.join(BACKENDS)})")
+
+
+__all__ = ["BACKENDS", "MemoryBackend", "SQLiteBackend", "StorageBackend", "create_backend"]
@@ -0,0 +1,313 @@
+import asyncio
+import hashlib
+import json
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+def message_id(text):
+    """Content address of a message body: facts citing the same text share one stored copy"""
+    if text is None:
+        return None
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def message_rows(texts):
+    """[{"id", "text"}] of the distinct message bodies among `texts`"""
+    bodies = {message_id(text): text for text in texts if text is not None}
+    return [{"id": key, "text": text} for key, text in bodies.items()]
+
+
+def count_groups(groups, labels):
+    """fact_counts() result from (predicate, src, count) and (predicate, object, count) rows"""
+    counts = {"facts": 0, "predicates": {}, "sources": {}, "labels": {}}
+    for predicate, src, count in groups:
+        counts['facts'] += count
+        counts['predicates'][predicate] = counts['predicates'].get(predicate, 0) + count
+        counts['sources'][src] = counts['sources'].get(src, 0) + count
+    for predicate, obj, count in labels:
+        counts['labels'].setdefault(predicate, {})[obj] = count
+    return counts
+
+
+class StorageBackend:
+    """Persistent fact store behind a KnowledgeGraph.
+
+    Facts are triples (subject, predicate, object) carrying id, created_at, src,
+    original_message and version. Each distinct message body is stored once,
+    keyed by message_id() of its content, and facts reference it: read methods
+    return plain fact dicts with message_id in place of original_message (values
+    may be None) and `messages` fetches the bodies. Timestamps cross this interface as
+    '%Y-%m-%d %H:%M:%S' strings and are stored natively (see utils/timestamps.py). Every write bumps the shared graph version and
+    reports it through `on_version`, so the KnowledgeGraph can tell its own writes
+    from those of other processes sharing the same store.
+
+    Update history defaults to the update_history.jsonl file; backends with a
+    natural place for it (a table, a list) override the history methods.
+
+    The a* coroutines serve the ASGI app (asgi.py). By default they run the sync
+    method in a worker thread; backends with an async driver override them.
+    """
+
+    name = "storage"
+    shared = False  # True when other processes can write to the same store
+
+    def __init__(self, history_path='update_history.jsonl'):
+        self.history_path = history_path
+        self.on_version = None  # callable(version) run after every version bump
+
+    def _bumped(self, version):
+        if self.on_version and version is not None:
+            self.on_version(version)
+        return version
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+    def ensure_indexes(self):
+        """Create the indexes lookups rely on (no-op when they exist)"""
+
+    def ping(self):
+        """Raise if the store cannot serve requests"""
+
+    def close(self):
+        pass
+
+    # ---------------------------
+    # Diagnostics
+    # ---------------------------
+    def statements(self):
+        """Canonical names of the statements `explain` accepts"""
+        return []
+
+    def query_stats(self):
+        """Per-statement timings and recent slow queries, or None if not recorded"""
+        return None
+
+    def explain(self, statement, params=None, profile=False):
+        """Execution plan of a canonical statement; PROFILE runs it and rolls back"""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Version
+    # ---------------------------
+    def get_version(self):
+        raise NotImplementedError
+
+    # ---------------------------
+    # Single-fact writes
+    # ---------------------------
+    def exists(self, subject, predicate, obj):
+        raise NotImplementedError
+
+    def add(self, fact):
+        """Store a new fact dict (id, subject, predicate, object, created_at, src, original_message, version)"""
+        raise NotImplementedError
+
+    def update(self, subject, old_predicate, obj, fact_id, new_predicate, created_at, src, original_message, version):
+        """Replace the predicate and provenance of one fact. Returns True if it was found."""
+        raise NotImplementedError
+
+    def delete(self, subject, predicate, obj):
+        """Delete the facts matching a triple. Returns how many were deleted."""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Batch writes
+    # ---------------------------
+    def batch_update(self, by_id, by_triple, current_time, new_src, new_original_message):
+        """Apply predicate updates in one transaction.
+
+        `by_id` items are {"idx", "id", "new_predicate"}, `by_triple` items
+        {"idx", "subject", "old_predicate", "object", "new_predicate"}. Returns one row
+        per changed fact: idx, id, subject, object, old_predicate, old_created_at,
+        old_src, old_message_id, old_version.
+        """
+        raise NotImplementedError
+
+    def batch_delete(self, by_id, by_triple):
+        """Delete facts in one transaction.
+
+        `by_id` items are {"idx", "id"}, `by_triple` items {"idx", "subject",
+        "predicate", "object"}. Returns one row per deleted fact: idx, id, subject,
+        predicate, object, src.
+        """
+        raise NotImplementedError
+
+    def batch_add(self, rows):
+        """Insert new facts in one transaction, skipping triples that already exist.
+
+        `rows` are complete fact dicts plus "idx". Returns {"idx", "id"} per created fact.
+        """
+        raise NotImplementedError
+
+    def apply_batch(self, adds, update_by_id, update_by_triple, delete_by_id, delete_by_triple,
+                    current_time, new_src, new_original_message):
+        """Deletes, then updates, then adds (see the batch_* methods), ideally in one transaction.
+        Returns {"deleted", "updated", "added"} with the rows of each.
+
+        This default runs three transactions; backends override it to use one.
+        """
+        return {
+            "deleted": self.batch_delete(delete_by_id, delete_by_triple) if delete_by_id or delete_by_triple else [],
+            "updated": (self.batch_update(update_by_id, update_by_triple, current_time, new_src, new_original_message)
+                        if update_by_id or update_by_triple else []),
+            "added": self.batch_add(adds) if adds else []
+        }
+
+    def bulk_add(self, rows, now):
+        """Insert fact dicts in one transaction, leaving existing triples untouched.
+        Returns how many were created."""
+        raise NotImplementedError
+
+    def purge(self, cutoff, batch_size=10000, progress=None, should_stop=None):
+        """Delete facts created up to `cutoff` (and orphaned entities and messages) in chunks.
+        Returns {"total", "deleted_facts", "deleted_entities", "deleted_messages"}."""
+        raise NotImplementedError
+
+    def migrate_timestamps(self, batch_size=10000, progress=None, should_stop=None):
+        """Convert created_at values stored in an older form to the native one, in chunks.
+        Returns {"total", "converted", "invalid"}; a no-op where nothing needs converting."""
+        return {"total": 0, "converted": 0, "invalid": 0}
+
+    def migrate_messages(self, batch_size=10000, progress=None, should_stop=None):
+        """Move message bodies stored inline on facts (before messages were content-addressed)
+        into the message store, in chunks. Returns {"total", "moved"}."""
+        return {"total": 0, "moved": 0}
+
+    # ---------------------------
+    # Entities
+    # ---------------------------
+    def entity_names(self):
+        """Name of every entity that takes part in a fact"""
+        return list(self.entity_degrees())
+
+    def entity_degrees(self):
+        """{entity name: number of facts it takes part in}"""
+        raise NotImplementedError
+
+    def merge_entities(self, pairs):
+        """Merge each {"alias", "key", "canonical"} entity into its canonical one in one transaction.
+
+        Facts of the alias are moved over; a moved fact whose triple the canonical
+        entity already has is dropped (the copy with the highest version is kept).
+        The alias key is recorded, and aliases pointing at a merged-away name are
+        retargeted. Returns {"merged", "moved", "dropped"}.
+        """
+        raise NotImplementedError
+
+    def aliases(self):
+        """{normalized alias key: canonical entity name} recorded by merge_entities"""
+        return {}
+
+    # ---------------------------
+    # Statistics
+    # ---------------------------
+    def fact_counts(self, label_predicates=()):
+        """{"facts", "predicates", "sources", "labels"}: the number of facts, per predicate,
+        per src and, for each of `label_predicates`, per object.
+
+        This default scans every fact; backends override it with an aggregate query.
+        """
+        groups, labels = {}, {}
+        wanted = set(label_predicates)
+        for chunk in self.iter_facts():
+            for fact in chunk:
+                key = (fact['predicate'], fact['src'])
+                groups[key] = groups.get(key, 0) + 1
+                if fact['predicate'] in wanted:
+                    key = (fact['predicate'], fact['object'])
+                    labels[key] = labels.get(key, 0) + 1
+        return count_groups([(*key, n) for key, n in groups.items()], [(*key, n) for key, n in labels.items()])
+
+    # ---------------------------
+    # Graph analytics
+    # ---------------------------
+    def set_entity_metrics(self, rows, run, batch_size=10000, progress=None, should_stop=None):
+        """Store analytics properties on entities, one chunk per transaction.
+
+        `rows` are {"name", "pagerank", "component", "community"}, tagged with `run`.
+        Once all are written, the properties of earlier runs are removed; until
+        then readers see the previous values. Returns how many rows were written.
+        """
+        raise NotImplementedError
+
+    def entity_metrics(self, names=None, community=None, component=None, limit=100):
+        """Stored analytics properties ({"name", "pagerank", "component", "community"}) of the
+        entities matching every given filter, highest PageRank first"""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    def query(self, subject=None, predicate=None, obj=None, limit=None, since=None, until=None):
+        """Facts matching every given field, highest version first; with a time window
+        (created_at between `since` and `until`, both inclusive) newest first"""
+        raise NotImplementedError
+
+    def fuzzy_query(self, keyword, threshold=0.8):
+        raise NotImplementedError
+
+    def get_fact(self, subject, obj, fact_id):
+        raise NotImplementedError
+
+    def page(self, skip=0, limit=100, since=None, until=None):
+        """A page of facts in storage order; with a time window newest first"""
+        raise NotImplementedError
+
+    def iter_facts(self, predicate=None, src=None, since=None, until=None, chunk_size=5000):
+        """Yield lists of up to `chunk_size` facts without loading everything"""
+        raise NotImplementedError
+
+    def neighbors(self, nodes, predicates=None, direction="both", fanout=50):
+        """Edges of `nodes`, capped per node: {node: [(neighbor, outgoing, fact), ...]}"""
+        raise NotImplementedError
+
+    def messages(self, ids):
+        """{message_id: body} of the given ids; unknown ids are left out"""
+        raise NotImplementedError
+
+    # ---------------------------
+    # Async access
+    # ---------------------------
+    async def aget_version(self):
+        return await asyncio.to_thread(self.get_version)
+
+    async def aquery(self, subject=None, predicate=None, obj=None, limit=None, since=None, until=None):
+        return await asyncio.to_thread(self.query, subject, predicate, obj, limit, since, until)
+
+    async def abatch_add(self, rows):
+        return await asyncio.to_thread(self.batch_add, rows)
+
+    async def aapply_batch(self, adds, update_by_id, update_by_triple, delete_by_id, delete_by_triple,
+                           current_time, new_src, new_original_message):
+        return await asyncio.to_thread(self.apply_batch, adds, update_by_id, update_by_triple, delete_by_id,
+                                       delete_by_triple, current_time, new_src, new_original_message)
+
+    async def aclose(self):
+        pass
+
+    # ---------------------------
+    # Update history
+    # ---------------------------
+    def append_history(self, entries):
+        with open(self.history_path, 'a') as f:
+            f.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+
+    def history(self, subject, obj, fact_id):
+        entries = []
+        try:
+            with open(self.history_path, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line.strip())
+                        if entry['id'] == fact_id and entry['subject'] == subject and entry['object'] == obj:
+                            entries.append(entry)
+        except FileNotFoundError:
+            log.debug("%s not found, skipping history", self.history_path)
+        return entries
+
+    def clear_history(self):
+        with open(self.history_path, 'w') as f:
+            f.truncate(0)
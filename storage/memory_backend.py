@@ -0,0 +1,429 @@
+import difflib
+import itertools
+import threading
+import uuid
+
+from storage.base import StorageBackend, message_id
+from utils.timestamps import canonical
+
+
+class MemoryBackend(StorageBackend):
+    """Process-local fact store for tests, benchmarks and running without a database.
+
+    Facts are kept in a dict with subject, object, predicate and id indexes, and
+    message bodies in a dict by message_id; nothing survives a restart and other
+    processes do not see the data.
+    """
+
+    name = "memory"
+    shared = False
+
+    def __init__(self):
+        super().__init__()
+        self._facts = {}  # seq -> fact dict
+        self._seq = itertools.count(1)
+        self._indexes = {"subject": {}, "predicate": {}, "object": {}, "id": {}}  # field -> value -> set of seqs
+        self._messages = {}  # message_id -> body
+        self._history = []
+        self._aliases = {}  # alias key -> canonical entity name
+        self._entity_metrics = {}  # entity name -> analytics properties and run
+        self._version = 0
+        self._lock = threading.RLock()
+
+    def _insert(self, fact):
+        seq = next(self._seq)
+        self._facts[seq] = fact
+        for field, index in self._indexes.items():
+            index.setdefault(fact[field], set()).add(seq)
+        return seq
+
+    def _remove(self, seq):
+        fact = self._facts.pop(seq)
+        for field, index in self._indexes.items():
+            seqs = index.get(fact[field])
+            if seqs is not None:
+                seqs.discard(seq)
+                if not seqs:
+                    del index[fact[field]]
+        return fact
+
+    def _message(self, text):
+        """Store a message body once and return its message_id"""
+        key = message_id(text)
+        if key is not None:
+            self._messages.setdefault(key, text)
+        return key
+
+    def _lean(self, fact):
+        """A fact dict as stored: message_id instead of the body"""
+        stored = {field: fact.get(field) for field in ("id", "subject", "predicate", "object", "created_at", "src", "version")}
+        stored['message_id'] = self._message(fact.get('original_message'))
+        return stored
+
+    def _reindex(self, seq, field, value):
+        fact = self._facts[seq]
+        index = self._indexes[field]
+        index[fact[field]].discard(seq)
+        if not index[fact[field]]:
+            del index[fact[field]]
+        fact[field] = value
+        index.setdefault(value, set()).add(seq)
+
+    def _match(self, subject=None, predicate=None, obj=None, fact_id=None):
+        """Seqs of facts matching every given field, using the smallest index"""
+        wanted = [(field, value) for field, value in
+                  (("subject", subject), ("predicate", predicate), ("object", obj), ("id", fact_id)) if value is not None]
+        if not wanted:
+            return list(self._facts)
+        candidates = min((self._indexes[field].get(value, set()) for field, value in wanted), key=len)
+        return [seq for seq in candidates if all(self._facts[seq][field] == value for field, value in wanted)]
+
+    def _bump(self):
+        self._version += 1
+        return self._version
+
+    @staticmethod
+    def _sorted(facts):
+        return sorted(facts, key=lambda fact: -(fact['version'] or 1))
+
+    # ---------------------------
+    # Version
+    # ---------------------------
+    def get_version(self):
+        return self._version
+
+    # ---------------------------
+    # Single-fact writes
+    # ---------------------------
+    def exists(self, subject, predicate, obj):
+        with self._lock:
+            return bool(self._match(subject, predicate, obj))
+
+    def add(self, fact):
+        with self._lock:
+            self._insert(self._lean(fact))
+            version = self._bump()
+        self._bumped(version)
+
+    def update(self, subject, old_predicate, obj, fact_id, new_predicate, created_at, src, original_message, version):
+        with self._lock:
+            seqs = self._match(subject, old_predicate, obj, fact_id)
+            if not seqs:
+                return False
+            for seq in seqs:
+                self._reindex(seq, "predicate", new_predicate)
+                self._facts[seq].update(created_at=created_at, src=src, message_id=self._message(original_message), version=version)
+            shared_version = self._bump()
+        self._bumped(shared_version)
+        return True
+
+    def delete(self, subject, predicate, obj):
+        with self._lock:
+            seqs = self._match(subject, predicate, obj)
+            for seq in seqs:
+                self._remove(seq)
+            version = self._bump() if seqs else None
+        self._bumped(version)
+        return len(seqs)
+
+    # ---------------------------
+    # Batch writes
+    # ---------------------------
+    def _update_rows(self, by_id, by_triple, current_time, new_src, new_original_message):
+        changed = []
+        lookups = [(item, self._match(fact_id=item['id'])) for item in by_id]
+        lookups += [(item, self._match(item['subject'], item['old_predicate'], item['object'])) for item in by_triple]
+        for item, seqs in lookups:
+            for seq in seqs:
+                fact = self._facts[seq]
+                if fact['predicate'] == item['new_predicate']:
+                    continue
+                old = dict(fact)
+                old_version = old['version'] or 1
+                self._reindex(seq, "predicate", item['new_predicate'])
+                fact.update(created_at=current_time, src=new_src, message_id=self._message(new_original_message),
+                            version=old_version + 1)
+                changed.append({"idx": item['idx'], "id": old['id'], "subject": old['subject'], "object": old['object'],
+                                "old_predicate": old['predicate'], "old_created_at": old['created_at'],
+                                "old_src": old['src'], "old_message_id": old['message_id'],
+                                "old_version": old_version})
+        return changed
+
+    def _delete_rows(self, by_id, by_triple):
+        deleted = []
+        lookups = [(item, self._match(fact_id=item['id'])) for item in by_id]
+        lookups += [(item, self._match(item['subject'], item['predicate'], item['object'])) for item in by_triple]
+        for item, seqs in lookups:
+            for seq in seqs:
+                if seq not in self._facts:
+                    continue
+                fact = self._remove(seq)
+                deleted.append({"idx": item['idx'], "id": fact['id'], "subject": fact['subject'],
+                                "predicate": fact['predicate'], "object": fact['object'], "src": fact['src']})
+        return deleted
+
+    def _add_rows(self, rows):
+        added = []
+        for row in rows:
+            if self._match(row['subject'], row['predicate'], row['object']):
+                continue
+            self._insert(self._lean(row))
+            added.append({"idx": row['idx'], "id": row['id']})
+        return added
+
+    def batch_update(self, by_id, by_triple, current_time, new_src, new_original_message):
+        with self._lock:
+            changed = self._update_rows(by_id, by_triple, current_time, new_src, new_original_message)
+            version = self._bump() if changed else None
+        self._bumped(version)
+        return changed
+
+    def batch_delete(self, by_id, by_triple):
+        with self._lock:
+            deleted = self._delete_rows(by_id, by_triple)
+            version = self._bump() if deleted else None
+        self._bumped(version)
+        return deleted
+
+    def batch_add(self, rows):
+        with self._lock:
+            added = self._add_rows(rows)
+            version = self._bump() if added else None
+        self._bumped(version)
+        return added
+
+    def apply_batch(self, adds, update_by_id, update_by_triple, delete_by_id, delete_by_triple,
+                    current_time, new_src, new_original_message):
+        with self._lock:
+            applied = {
+                "deleted": self._delete_rows(delete_by_id, delete_by_triple),
+                "updated": self._update_rows(update_by_id, update_by_triple, current_time, new_src, new_original_message),
+                "added": self._add_rows(adds)
+            }
+            version = self._bump() if any(applied.values()) else None
+        self._bumped(version)
+        return applied
+
+    def bulk_add(self, rows, now):
+        created = 0
+        with self._lock:
+            for row in rows:
+                if self._match(row['subject'], row['predicate'], row['object']):
+                    continue
+                self._insert({
+                    "id": row.get('id') or str(uuid.uuid4()),
+                    "subject": row['subject'],
+                    "predicate": row['predicate'],
+                    "object": row['object'],
+                    "created_at": canonical(row.get('created_at')) or now,
+                    "src": row.get('src') or 'Bulk Import',
+                    "message_id": self._message(row.get('original_message')),
+                    "version": int(row['version']) if row.get('version') else 1
+                })
+                created += 1
+            version = self._bump()
+        self._bumped(version)
+        return created
+
+    def purge(self, cutoff, batch_size=10000, progress=None, should_stop=None):
+        counts = {"total": len(self._facts), "deleted_facts": 0, "deleted_entities": 0, "deleted_messages": 0}
+        should_stop = should_stop or (lambda: False)
+        cutoff = canonical(cutoff)
+        while not should_stop():
+            with self._lock:
+                expired = [seq for seq, fact in self._facts.items()
+                           if fact['created_at'] is None or fact['created_at'] <= cutoff][:batch_size]
+                for seq in expired:
+                    self._remove(seq)
+            counts['deleted_facts'] += len(expired)
+            if progress:
+                progress(**counts)
+            if len(expired) < batch_size:
+                break
+        with self._lock:
+            referenced = {fact['message_id'] for fact in self._facts.values()}
+            for key in [key for key in self._messages if key not in referenced]:
+                del self._messages[key]
+                counts['deleted_messages'] += 1
+            version = self._bump()
+        self._bumped(version)
+        return counts
+
+    def migrate_timestamps(self, batch_size=10000, progress=None, should_stop=None):
+        counts = {"total": 0, "converted": 0, "invalid": 0}
+        with self._lock:
+            for fact in self._facts.values():
+                value = fact['created_at']
+                if value is not None and canonical(value) != value:
+                    fact['created_at'] = canonical(value)
+                    counts['converted' if fact['created_at'] else 'invalid'] += 1
+            counts['total'] = counts['converted'] + counts['invalid']
+            version = self._bump() if counts['total'] else None
+        self._bumped(version)
+        if progress:
+            progress(**counts)
+        return counts
+
+    # ---------------------------
+    # Entities
+    # ---------------------------
+    def entity_degrees(self):
+        with self._lock:
+            degrees = {name: len(seqs) for name, seqs in self._indexes['subject'].items()}
+            for name, seqs in self._indexes['object'].items():
+                # a self-loop counts once
+                degrees[name] = degrees.get(name, 0) + sum(1 for seq in seqs if self._facts[seq]['subject'] != name)
+        return degrees
+
+    def merge_entities(self, pairs):
+        counts = {"merged": 0, "moved": 0, "dropped": 0}
+        with self._lock:
+            for pair in pairs:
+                alias, target = pair['alias'], pair['canonical']
+                seqs = self._indexes['subject'].get(alias, set()) | self._indexes['object'].get(alias, set())
+                for seq in seqs:
+                    fact = self._facts[seq]
+                    subject = target if fact['subject'] == alias else fact['subject']
+                    obj = target if fact['object'] == alias else fact['object']
+                    existing = [other for other in self._match(subject, fact['predicate'], obj) if other != seq]
+                    if existing:
+                        counts['dropped'] += 1
+                        if (self._facts[existing[0]]['version'] or 1) >= (fact['version'] or 1):
+                            self._remove(seq)
+                            continue
+                        self._remove(existing[0])
+                    self._reindex(seq, "subject", subject)
+                    self._reindex(seq, "object", obj)
+                    counts['moved'] += 1
+                for key, name in self._aliases.items():
+                    if name == alias:
+                        self._aliases[key] = target
+                self._aliases[pair['key']] = target
+                counts['merged'] += 1
+            version = self._bump() if pairs else None
+        self._bumped(version)
+        return counts
+
+    def aliases(self):
+        with self._lock:
+            return dict(self._aliases)
+
+    # ---------------------------
+    # Graph analytics
+    # ---------------------------
+    def set_entity_metrics(self, rows, run, batch_size=10000, progress=None, should_stop=None):
+        written = 0
+        for start in range(0, len(rows), batch_size):
+            if should_stop and should_stop():
+                return written
+            with self._lock:
+                for row in rows[start:start + batch_size]:
+                    self._entity_metrics[row['name']] = dict(row, run=run)
+            written += len(rows[start:start + batch_size])
+            if progress:
+                progress(stage="writing", written=written, total=len(rows))
+        with self._lock:
+            self._entity_metrics = {name: row for name, row in self._entity_metrics.items() if row['run'] == run}
+        return written
+
+    def entity_metrics(self, names=None, community=None, component=None, limit=100):
+        with self._lock:
+            candidates = ([self._entity_metrics[name] for name in names if name in self._entity_metrics]
+                          if names is not None else list(self._entity_metrics.values()))
+        rows = [{key: row[key] for key in ("name", "pagerank", "component", "community")} for row in candidates
+                if (community is None or row['community'] == community)
+                and (component is None or row['component'] == component)]
+        rows.sort(key=lambda row: -row['pagerank'])
+        return rows[:limit]
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    @staticmethod
+    def _in_window(fact, since, until):
+        created_at = fact['created_at'] or ''
+        return (since is None or created_at >= since) and (until is None or created_at <= until)
+
+    def query(self, subject=None, predicate=None, obj=None, limit=None, since=None, until=None):
+        with self._lock:
+            facts = [dict(self._facts[seq]) for seq in self._match(subject, predicate, obj)]
+        if since is None and until is None:
+            facts = self._sorted(facts)
+        else:
+            since, until = canonical(since), canonical(until)
+            facts = sorted((fact for fact in facts if self._in_window(fact, since, until)),
+                           key=lambda fact: fact['created_at'], reverse=True)
+        return facts[:limit] if limit else facts
+
+    def fuzzy_query(self, keyword, threshold=0.8):
+        keyword = keyword.lower()
+
+        def close(value):
+            return difflib.SequenceMatcher(None, value.lower(), keyword).ratio() >= threshold
+
+        with self._lock:
+            facts = [dict(fact) for fact in self._facts.values()
+                     if close(fact['subject']) or close(fact['object']) or close(fact['predicate'])]
+        return self._sorted(facts)
+
+    def get_fact(self, subject, obj, fact_id):
+        with self._lock:
+            seqs = self._match(subject, None, obj, fact_id)
+            return dict(self._facts[seqs[0]]) if seqs else None
+
+    def page(self, skip=0, limit=100, since=None, until=None):
+        if since is not None or until is not None:
+            return self.query(since=since, until=until)[skip:skip + limit]
+        with self._lock:
+            return [dict(fact) for fact in itertools.islice(self._facts.values(), skip, skip + limit)]
+
+    def iter_facts(self, predicate=None, src=None, since=None, until=None, chunk_size=5000):
+        since, until = canonical(since), canonical(until)
+        with self._lock:
+            facts = [dict(fact) for fact in self._facts.values()
+                     if (predicate is None or fact['predicate'] == predicate)
+                     and (src is None or fact['src'] == src)
+                     and self._in_window(fact, since, until)]
+        for start in range(0, len(facts), chunk_size):
+            yield facts[start:start + chunk_size]
+
+    def neighbors(self, nodes, predicates=None, direction="both", fanout=50):
+        sides = []
+        if direction in ("out", "both"):
+            sides.append(("subject", "object", True))
+        if direction in ("in", "both"):
+            sides.append(("object", "subject", False))
+        expanded = {}
+        with self._lock:
+            for node in nodes:
+                edges = []
+                for field, other, outgoing in sides:
+                    for seq in self._indexes[field].get(node, ()):
+                        fact = self._facts[seq]
+                        if predicates and fact['predicate'] not in predicates:
+                            continue
+                        if len(edges) >= fanout:
+                            break
+                        edges.append((fact[other], outgoing, {key: fact[key] for key in ("id", "predicate", "created_at", "src", "version")}))
+                expanded[node] = edges
+        return expanded
+
+    def messages(self, ids):
+        with self._lock:
+            return {key: self._messages[key] for key in ids if key in self._messages}
+
+    # ---------------------------
+    # Update history
+    # ---------------------------
+    def append_history(self, entries):
+        with self._lock:
+            self._history.extend(entries)
+
+    def history(self, subject, obj, fact_id):
+        with self._lock:
+            return [entry for entry in self._history
+                    if entry['id'] == fact_id and entry['subject'] == subject and entry['object'] == obj]
+
+    def clear_history(self):
+        with self._lock:
+            self._history = []
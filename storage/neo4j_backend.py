@@ -0,0 +1,876 @@
+from datetime import datetime
+
+from neo4j import AsyncGraphDatabase, GraphDatabase
+
+from storage.base import StorageBackend, count_groups, message_id, message_rows
+from storage.querylog import QueryLog
+from utils.log import get_logger
+from utils.timestamps import format_time, to_datetime
+
+log = get_logger(__name__)
+
+FACT_FIELDS = """s.name AS subject, r.predicate AS predicate, o.name AS object, r.id AS id, r.created_at AS created_at,
+                 r.src AS src, r.message_id AS message_id, r.version AS version"""
+
+_BATCH_UPDATE_RETURN = """
+    WITH item, s, r, o, r.predicate AS old_predicate, r.created_at AS old_created_at,
+         r.src AS old_src, r.message_id AS old_message_id, coalesce(r.version, 1) AS old_version
+    WHERE old_predicate <> item.new_predicate
+    SET r.predicate = item.new_predicate, r.created_at = $current_time, r.src = $new_src,
+        r.message_id = $new_message_id, r.version = old_version + 1
+    RETURN item.idx AS idx, r.id AS id, s.name AS subject, o.name AS object, old_predicate,
+           old_created_at, old_src, old_message_id, old_version
+"""
+
+_BATCH_DELETE_RETURN = """
+    WITH item, s, r, o, r.predicate AS predicate, r.id AS id, r.src AS src
+    DELETE r
+    RETURN item.idx AS idx, id, s.name AS subject, predicate, o.name AS object, src
+"""
+
+_QUERY = f"""
+    MATCH (s:Entity)-[r:REL]->(o:Entity)
+    WHERE ($subject IS NULL OR s.name = $subject)
+      AND ($predicate IS NULL OR r.predicate = $predicate)
+      AND ($object IS NULL OR o.name = $object)
+    RETURN {FACT_FIELDS}
+    ORDER BY r.version DESC
+"""
+
+# created_at is a LocalDateTime with a range index: time windows are index range
+# scans, so they get their own statements instead of "$since IS NULL OR ..." filters
+_IN_RANGE = "r.created_at >= $since AND r.created_at <= $until"
+
+_QUERY_RANGE = f"""
+    MATCH (s:Entity)-[r:REL]->(o:Entity)
+    WHERE {_IN_RANGE}
+      AND ($subject IS NULL OR s.name = $subject)
+      AND ($predicate IS NULL OR r.predicate = $predicate)
+      AND ($object IS NULL OR o.name = $object)
+    RETURN {FACT_FIELDS}
+    ORDER BY r.created_at DESC
+"""
+
+# open ends of a time window
+_EARLIEST = datetime(1, 1, 1)
+_LATEST = datetime(9999, 12, 31, 23, 59, 59)
+
+_NEIGHBORS = """
+    UNWIND $names AS name
+    CALL {{
+        WITH name
+        MATCH {pattern}
+        WHERE n.name = name AND ($predicates IS NULL OR r.predicate IN $predicates)
+        RETURN n, r, m LIMIT $fanout
+    }}
+    RETURN n.name AS node, m.name AS neighbor, startNode(r) = n AS outgoing,
+           r.predicate AS predicate, r.id AS id, r.created_at AS created_at,
+           r.src AS src, r.version AS version
+"""
+
+# Every Cypher statement the backend runs, by canonical name. Timings are recorded
+# per name and /api/admin/explain can EXPLAIN or PROFILE any of them.
+STATEMENTS = {
+    "bump_version": """
+        MERGE (m:GraphMeta {name: 'graph'})
+        SET m.version = coalesce(m.version, 0) + 1
+        RETURN m.version AS version
+    """,
+    "get_version": "MATCH (m:GraphMeta {name: 'graph'}) RETURN m.version AS version",
+    "exists": """
+        MATCH (s:Entity {name: $subject})-[r:REL {predicate: $predicate}]->(o:Entity {name: $object})
+        RETURN count(r) AS count
+    """,
+    "add": """
+        MERGE (s:Entity {name: $subject})
+        MERGE (o:Entity {name: $object})
+        CREATE (s)-[r:REL {id: $id, predicate: $predicate, created_at: $created_at, src: $src, message_id: $message_id, version: $version}]->(o)
+    """,
+    "update": """
+        MATCH (s:Entity {name: $subject})-[r:REL {predicate: $old_predicate, id: $id}]->(o:Entity {name: $object})
+        DELETE r
+        WITH s, o
+        CREATE (s)-[new_r:REL {id: $id, predicate: $new_predicate, created_at: $current_time, src: $new_src, message_id: $new_message_id, version: $new_version}]->(o)
+        RETURN count(new_r) as count
+    """,
+    "delete": """
+        MATCH (s:Entity {name: $subject})-[r:REL {predicate: $predicate}]->(o:Entity {name: $object})
+        DELETE r
+        RETURN count(r) as count
+    """,
+    "batch_update_by_id": """
+        UNWIND $items AS item
+        MATCH (s:Entity)-[r:REL {id: item.id}]->(o:Entity)
+    """ + _BATCH_UPDATE_RETURN,
+    "batch_update_by_triple": """
+        UNWIND $items AS item
+        MATCH (s:Entity {name: item.subject})-[r:REL {predicate: item.old_predicate}]->(o:Entity {name: item.object})
+    """ + _BATCH_UPDATE_RETURN,
+    "batch_delete_by_id": """
+        UNWIND $items AS item
+        MATCH (s:Entity)-[r:REL {id: item.id}]->(o:Entity)
+    """ + _BATCH_DELETE_RETURN,
+    "batch_delete_by_triple": """
+        UNWIND $items AS item
+        MATCH (s:Entity {name: item.subject})-[r:REL {predicate: item.predicate}]->(o:Entity {name: item.object})
+    """ + _BATCH_DELETE_RETURN,
+    # rows are deduplicated by the caller; existing triples are left untouched
+    "batch_add": """
+        UNWIND $rows AS row
+        OPTIONAL MATCH (:Entity {name: row.subject})-[existing:REL {predicate: row.predicate}]->(:Entity {name: row.object})
+        WITH row, count(existing) AS found
+        WHERE found = 0
+        MERGE (s:Entity {name: row.subject})
+        MERGE (o:Entity {name: row.object})
+        CREATE (s)-[r:REL {id: row.id, predicate: row.predicate, created_at: row.created_at, src: row.src, message_id: row.message_id, version: row.version}]->(o)
+        RETURN row.idx AS idx, r.id AS id
+    """,
+    "bulk_add": """
+        UNWIND $rows AS row
+        MERGE (s:Entity {name: row.subject})
+        MERGE (o:Entity {name: row.object})
+        MERGE (s)-[r:REL {predicate: row.predicate}]->(o)
+        ON CREATE SET r.id = coalesce(row.id, randomUUID()),
+                      r.created_at = coalesce(row.created_at, $now),
+                      r.src = coalesce(row.src, 'Bulk Import'),
+                      r.message_id = row.message_id,
+                      r.version = coalesce(toInteger(row.version), 1),
+                      r.imported = true
+        WITH r, coalesce(r.imported, false) AS created
+        REMOVE r.imported
+        RETURN sum(CASE WHEN created THEN 1 ELSE 0 END) AS created
+    """,
+    "count_facts": "MATCH ()-[r:REL]->() RETURN count(r) AS count",
+    # message bodies are nodes keyed by content hash; facts hold the key in r.message_id
+    "store_messages": """
+        UNWIND $messages AS message
+        MERGE (m:Message {id: message.id})
+        ON CREATE SET m.text = message.text
+    """,
+    "messages": """
+        UNWIND $ids AS id
+        MATCH (m:Message {id: id})
+        RETURN m.id AS id, m.text AS text
+    """,
+    # inner CALL ... IN TRANSACTIONS keeps each commit small even for large chunks
+    # $cutoff_text catches string timestamps not yet converted by migrate_timestamps
+    "purge_facts": """
+        MATCH ()-[r:REL]->()
+        WHERE r.created_at IS NULL OR r.created_at <= $cutoff OR r.created_at <= $cutoff_text
+        WITH r LIMIT $batch_size
+        CALL { WITH r DELETE r } IN TRANSACTIONS OF 1000 ROWS
+        RETURN count(*) AS count
+    """,
+    "purge_entities": """
+        MATCH (n:Entity) WHERE NOT (n)--()
+        WITH n LIMIT $batch_size
+        CALL { WITH n DELETE n } IN TRANSACTIONS OF 1000 ROWS
+        RETURN count(*) AS count
+    """,
+    "purge_messages": """
+        MATCH (m:Message) WHERE NOT EXISTS { MATCH ()-[r:REL]->() WHERE r.message_id = m.id }
+        WITH m LIMIT $batch_size
+        CALL { WITH m DELETE m } IN TRANSACTIONS OF 1000 ROWS
+        RETURN count(*) AS count
+    """,
+    "query": _QUERY,
+    "query_limit": _QUERY + "LIMIT $limit",
+    "query_range": _QUERY_RANGE,
+    "query_range_limit": _QUERY_RANGE + "LIMIT $limit",
+    # Fuzzy search using APOC for nodes and relationships
+    "fuzzy_query": f"""
+        MATCH (s:Entity)-[r:REL]->(o:Entity)
+        WHERE apoc.text.fuzzyMatch(s.name, $keyword) OR apoc.text.fuzzyMatch(o.name, $keyword) OR apoc.text.fuzzyMatch(r.predicate, $keyword)
+        RETURN {FACT_FIELDS}
+        ORDER BY r.version DESC
+    """,
+    "get_fact": f"""
+        MATCH (s:Entity {{name: $subject}})-[r:REL {{id: $id}}]->(o:Entity {{name: $object}})
+        RETURN {FACT_FIELDS}
+        LIMIT 1
+    """,
+    "page": f"""
+        MATCH (s:Entity)-[r:REL]->(o:Entity)
+        RETURN {FACT_FIELDS}
+        SKIP $skip LIMIT $limit
+    """,
+    "page_range": f"""
+        MATCH (s:Entity)-[r:REL]->(o:Entity)
+        WHERE {_IN_RANGE}
+        RETURN {FACT_FIELDS}
+        ORDER BY r.created_at DESC
+        SKIP $skip LIMIT $limit
+    """,
+    "iter_facts": f"""
+        MATCH (s:Entity)-[r:REL]->(o:Entity)
+        WHERE ($predicate IS NULL OR r.predicate = $predicate)
+          AND ($src IS NULL OR r.src = $src)
+        RETURN {FACT_FIELDS}
+    """,
+    "iter_facts_range": f"""
+        MATCH (s:Entity)-[r:REL]->(o:Entity)
+        WHERE {_IN_RANGE}
+          AND ($predicate IS NULL OR r.predicate = $predicate)
+          AND ($src IS NULL OR r.src = $src)
+        RETURN {FACT_FIELDS}
+    """,
+    # created_at strings written before timestamps were native
+    "string_timestamps": """
+        MATCH ()-[r:REL]->()
+        WHERE r.created_at IS :: STRING NOT NULL
+        RETURN elementId(r) AS rid, r.created_at AS created_at
+        LIMIT $batch_size
+    """,
+    "set_timestamps": """
+        UNWIND $rows AS row
+        MATCH ()-[r:REL]->()
+        WHERE elementId(r) = row.rid
+        SET r.created_at = row.created_at
+    """,
+    # bodies stored on the relationship before messages were content-addressed
+    "inline_messages": """
+        MATCH ()-[r:REL]->()
+        WHERE r.original_message IS NOT NULL
+        RETURN elementId(r) AS rid, r.original_message AS text
+        LIMIT $batch_size
+    """,
+    "set_message_ids": """
+        UNWIND $rows AS row
+        MATCH ()-[r:REL]->()
+        WHERE elementId(r) = row.rid
+        SET r.message_id = row.message_id
+        REMOVE r.original_message
+    """,
+    "count_inline_messages": "MATCH ()-[r:REL]->() WHERE r.original_message IS NOT NULL RETURN count(r) AS count",
+    "count_string_timestamps": "MATCH ()-[r:REL]->() WHERE r.created_at IS :: STRING NOT NULL RETURN count(r) AS count",
+    "entity_names": "MATCH (n:Entity) WHERE (n)--() RETURN n.name AS name",
+    "entity_degrees": "MATCH (n:Entity) WITH n, COUNT { (n)-[:REL]-() } AS degree WHERE degree > 0 RETURN n.name AS name, degree",
+    # relationships cannot change endpoints: each fact of an alias is recreated on
+    # the canonical node with all its properties, then the original is deleted
+    "merge_out": """
+        UNWIND $pairs AS pair
+        MATCH (a:Entity {name: pair.alias})-[r:REL]->(o:Entity)
+        MATCH (c:Entity {name: pair.canonical})
+        WITH r, c, CASE WHEN o = a THEN c ELSE o END AS target
+        CREATE (c)-[moved:REL]->(target)
+        SET moved = properties(r)
+        DELETE r
+        RETURN count(moved) AS moved
+    """,
+    "merge_in": """
+        UNWIND $pairs AS pair
+        MATCH (s:Entity)-[r:REL]->(a:Entity {name: pair.alias})
+        MATCH (c:Entity {name: pair.canonical})
+        CREATE (s)-[moved:REL]->(c)
+        SET moved = properties(r)
+        DELETE r
+        RETURN count(moved) AS moved
+    """,
+    # triples a canonical entity now holds twice: keep the highest version
+    "merge_dedupe": """
+        UNWIND $names AS name
+        MATCH (c:Entity {name: name})-[r:REL]-()
+        WITH DISTINCT r
+        ORDER BY coalesce(r.version, 1) DESC
+        WITH startNode(r) AS s, endNode(r) AS o, r.predicate AS predicate, collect(r) AS rels
+        WHERE size(rels) > 1
+        UNWIND tail(rels) AS extra
+        DELETE extra
+        RETURN count(extra) AS dropped
+    """,
+    "merge_aliases": """
+        UNWIND $pairs AS pair
+        OPTIONAL MATCH (a:Entity {name: pair.alias})
+        WHERE NOT (a)--()
+        DELETE a
+        WITH pair
+        OPTIONAL MATCH (previous:EntityAlias {canonical: pair.alias})
+        SET previous.canonical = pair.canonical
+        WITH DISTINCT pair
+        MERGE (x:EntityAlias {key: pair.key})
+        SET x.canonical = pair.canonical
+    """,
+    "aliases": "MATCH (x:EntityAlias) RETURN x.key AS key, x.canonical AS canonical",
+    "fact_counts": "MATCH ()-[r:REL]->() RETURN r.predicate AS predicate, r.src AS src, count(*) AS count",
+    "set_entity_metrics": """
+        UNWIND $rows AS row
+        MATCH (n:Entity {name: row.name})
+        SET n.pagerank = row.pagerank, n.component = row.component, n.community = row.community, n.analytics_run = $run
+    """,
+    "clear_entity_metrics": """
+        MATCH (n:Entity) WHERE n.analytics_run IS NOT NULL AND n.analytics_run <> $run
+        WITH n LIMIT $batch_size
+        REMOVE n.pagerank, n.component, n.community, n.analytics_run
+        RETURN count(*) AS count
+    """,
+    "entity_metrics": """
+        MATCH (n:Entity) WHERE n.pagerank IS NOT NULL
+          AND ($names IS NULL OR n.name IN $names)
+          AND ($community IS NULL OR n.community = $community)
+          AND ($component IS NULL OR n.component = $component)
+        RETURN n.name AS name, n.pagerank AS pagerank, n.component AS component, n.community AS community
+        ORDER BY n.pagerank DESC LIMIT $limit
+    """,
+    "label_counts": """
+        MATCH ()-[r:REL]->(o:Entity) WHERE r.predicate IN $predicates
+        RETURN r.predicate AS predicate, o.name AS object, count(*) AS count
+    """,
+    "neighbors": _NEIGHBORS.format(pattern="(n:Entity)-[r:REL]-(m:Entity)"),
+    "neighbors_out": _NEIGHBORS.format(pattern="(n:Entity)-[r:REL]->(m:Entity)"),
+    "neighbors_in": _NEIGHBORS.format(pattern="(n:Entity)<-[r:REL]-(m:Entity)"),
+}
+
+# CALL ... IN TRANSACTIONS cannot run inside the rolled-back transaction PROFILE uses
+_EXPLAIN_ONLY = ("purge_facts", "purge_entities", "purge_messages")
+
+
+class Neo4jBackend(StorageBackend):
+    """Facts as (:Entity {name})-[:REL {id, predicate, ...}]->(:Entity) in Neo4j"""
+
+    name = "neo4j"
+    shared = True
+
+    def __init__(self, uri="bolt://localhost:7687", user="neo4j", password="password", history_path='update_history.jsonl',
+                 slow_query_ms=None):
+        super().__init__(history_path)
+        self.uri = uri
+        self._auth = (user, password)
+        self.driver = GraphDatabase.driver(uri, auth=self._auth)
+        self._async_driver = None
+        self.driver.verify_connectivity()
+        self.query_log = QueryLog(slow_query_ms)
+        log.info("Connected to Neo4j database")
+
+    def ensure_indexes(self):
+        try:
+            with self.driver.session() as session:
+                session.run("CREATE INDEX entity_name IF NOT EXISTS FOR (n:Entity) ON (n.name)")
+                session.run("CREATE INDEX rel_predicate IF NOT EXISTS FOR ()-[r:REL]-() ON (r.predicate)")
+                session.run("CREATE INDEX rel_id IF NOT EXISTS FOR ()-[r:REL]-() ON (r.id)")
+                session.run("CREATE INDEX rel_message_id IF NOT EXISTS FOR ()-[r:REL]-() ON (r.message_id)")
+                session.run("CREATE CONSTRAINT message_id IF NOT EXISTS FOR (m:Message) REQUIRE m.id IS UNIQUE")
+                session.run("CREATE INDEX entity_alias_key IF NOT EXISTS FOR (x:EntityAlias) ON (x.key)")
+                session.run("CREATE INDEX entity_alias_canonical IF NOT EXISTS FOR (x:EntityAlias) ON (x.canonical)")
+                session.run("CREATE RANGE INDEX rel_created_at IF NOT EXISTS FOR ()-[r:REL]-() ON (r.created_at)")
+                session.run("CREATE INDEX entity_pagerank IF NOT EXISTS FOR (n:Entity) ON (n.pagerank)")
+                session.run("CREATE INDEX entity_community IF NOT EXISTS FOR (n:Entity) ON (n.community)")
+            log.info("Neo4j indexes ensured")
+        except Exception as e:
+            log.warning("Failed to create Neo4j indexes: %s", e)
+
+    def ping(self):
+        self.driver.verify_connectivity()
+
+    def close(self):
+        self.driver.close()
+
+    # ---------------------------
+    # Statement execution
+    # ---------------------------
+    def _run(self, runner, statement, **params):
+        """Run a canonical statement on a session or transaction and return its records.
+        The server timings from the result summary go to the query log."""
+        result = runner.run(STATEMENTS[statement], **params)
+        records = list(result)
+        self._record(statement, params, result.consume(), len(records))
+        return records
+
+    @staticmethod
+    def _plain(record):
+        """Record as a dict, timestamps as strings (see utils/timestamps.py)"""
+        row = dict(record)
+        for key in ("created_at", "old_created_at"):
+            if key in row:
+                row[key] = format_time(row[key])
+        return row
+
+    @staticmethod
+    def _window(since, until):
+        return {"since": to_datetime(since) or _EARLIEST, "until": to_datetime(until) or _LATEST}
+
+    async def _arun(self, runner, statement, **params):
+        """_run on an async session or transaction"""
+        result = await runner.run(STATEMENTS[statement], **params)
+        records = [record async for record in result]
+        self._record(statement, params, await result.consume(), len(records))
+        return records
+
+    def _record(self, statement, params, summary, rows):
+        self.query_log.record(statement, params, summary.result_available_after,
+                              summary.result_consumed_after, rows)
+
+    def statements(self):
+        return sorted(STATEMENTS)
+
+    def query_stats(self):
+        return self.query_log.stats()
+
+    def explain(self, statement, params=None, profile=False):
+        if statement not in STATEMENTS:
+            raise KeyError(statement)
+        params = params or {}
+        with self.driver.session() as session:
+            if not profile:
+                # EXPLAIN plans without executing; missing parameters only produce a notification
+                summary = session.run("EXPLAIN " + STATEMENTS[statement], **params).consume()
+                plan = summary.plan
+            else:
+                if statement in _EXPLAIN_ONLY:
+                    raise ValueError(f"{statement} can only be explained, not profiled")
+                # PROFILE executes the statement; roll back so writes leave no trace
+                tx = session.begin_transaction()
+                try:
+                    summary = tx.run("PROFILE " + STATEMENTS[statement], **params).consume()
+                    plan = summary.profile
+                finally:
+                    tx.rollback()
+        return {
+            "statement": statement,
+            "mode": "profile" if profile else "explain",
+            "cypher": " ".join(STATEMENTS[statement].split()),
+            "plan": plan,
+            "notifications": summary.notifications or [],
+            "available_ms": summary.result_available_after,
+            "consumed_ms": summary.result_consumed_after
+        }
+
+    # ---------------------------
+    # Version
+    # ---------------------------
+    def _bump(self, session):
+        """Bump the graph version kept in Neo4j, inside the session or transaction that wrote.
+        Called after the write so readers never pair a new version with old data."""
+        try:
+            record = self._run(session, "bump_version")[0]
+            return self._bumped(record['version'])
+        except Exception as e:
+            log.error("Failed to bump shared graph version: %s", e)
+
+    def get_version(self):
+        with self.driver.session() as session:
+            records = self._run(session, "get_version")
+            return records[0]['version'] if records else 0
+
+    # ---------------------------
+    # Single-fact writes
+    # ---------------------------
+    def exists(self, subject, predicate, obj):
+        with self.driver.session() as session:
+            return self._run(session, "exists", subject=subject, predicate=predicate, object=obj)[0]['count'] > 0
+
+    def add(self, fact):
+        with self.driver.session() as session:
+            self._run(session, "store_messages", messages=message_rows([fact.get('original_message')]))
+            self._run(session, "add", **dict(fact, created_at=to_datetime(fact.get('created_at')),
+                                             message_id=message_id(fact.get('original_message'))))
+            self._bump(session)
+
+    def update(self, subject, old_predicate, obj, fact_id, new_predicate, created_at, src, original_message, version):
+        with self.driver.session() as session:
+            self._run(session, "store_messages", messages=message_rows([original_message]))
+            records = self._run(session, "update",
+                                subject=subject,
+                                old_predicate=old_predicate,
+                                object=obj,
+                                id=fact_id,
+                                new_predicate=new_predicate,
+                                current_time=to_datetime(created_at),
+                                new_src=src,
+                                new_message_id=message_id(original_message),
+                                new_version=version)
+            if records[0]['count'] == 0:
+                return False
+            self._bump(session)
+            return True
+
+    def delete(self, subject, predicate, obj):
+        with self.driver.session() as session:
+            count = self._run(session, "delete", subject=subject, predicate=predicate, object=obj)[0]['count']
+            if count:
+                self._bump(session)
+            return count
+
+    # ---------------------------
+    # Batch writes
+    # ---------------------------
+    @staticmethod
+    def _update_steps(by_id, by_triple, current_time, new_src, new_original_message):
+        params = {"current_time": to_datetime(current_time), "new_src": new_src,
+                  "new_message_id": message_id(new_original_message)}
+        steps = []
+        if (by_id or by_triple) and new_original_message is not None:
+            steps.append(("store_messages", {"messages": message_rows([new_original_message])}))
+        if by_id:
+            steps.append(("batch_update_by_id", dict(params, items=by_id)))
+        if by_triple:
+            steps.append(("batch_update_by_triple", dict(params, items=by_triple)))
+        return steps
+
+    @staticmethod
+    def _delete_steps(by_id, by_triple):
+        steps = []
+        if by_id:
+            steps.append(("batch_delete_by_id", {"items": by_id}))
+        if by_triple:
+            steps.append(("batch_delete_by_triple", {"items": by_triple}))
+        return steps
+
+    @staticmethod
+    def _add_steps(rows):
+        if not rows:
+            return []
+        messages = message_rows(row['original_message'] for row in rows)
+        rows = [dict(row, created_at=to_datetime(row['created_at']), message_id=message_id(row['original_message']))
+                for row in rows]
+        return [("store_messages", {"messages": messages}), ("batch_add", {"rows": rows})]
+
+    def _run_steps(self, tx, steps):
+        rows = []
+        for statement, params in steps:
+            rows += self._run(tx, statement, **params)
+        return [self._plain(row) for row in rows]
+
+    def _update_rows(self, tx, by_id, by_triple, current_time, new_src, new_original_message):
+        return self._run_steps(tx, self._update_steps(by_id, by_triple, current_time, new_src, new_original_message))
+
+    def _delete_rows(self, tx, by_id, by_triple):
+        return self._run_steps(tx, self._delete_steps(by_id, by_triple))
+
+    def _add_rows(self, tx, rows):
+        return self._run_steps(tx, self._add_steps(rows))
+
+    def batch_update(self, by_id, by_triple, current_time, new_src, new_original_message):
+        def apply(tx):
+            changed = self._update_rows(tx, by_id, by_triple, current_time, new_src, new_original_message)
+            if changed:
+                self._bump(tx)
+            return changed
+
+        with self.driver.session() as session:
+            return session.execute_write(apply)
+
+    def batch_delete(self, by_id, by_triple):
+        def apply(tx):
+            deleted = self._delete_rows(tx, by_id, by_triple)
+            if deleted:
+                self._bump(tx)
+            return deleted
+
+        with self.driver.session() as session:
+            return session.execute_write(apply)
+
+    def batch_add(self, rows):
+        def apply(tx):
+            added = self._add_rows(tx, rows)
+            if added:
+                self._bump(tx)
+            return added
+
+        with self.driver.session() as session:
+            return session.execute_write(apply)
+
+    def apply_batch(self, adds, update_by_id, update_by_triple, delete_by_id, delete_by_triple,
+                    current_time, new_src, new_original_message):
+        def apply(tx):
+            applied = {
+                "deleted": self._delete_rows(tx, delete_by_id, delete_by_triple),
+                "updated": self._update_rows(tx, update_by_id, update_by_triple, current_time, new_src, new_original_message),
+                "added": self._add_rows(tx, adds)
+            }
+            if any(applied.values()):
+                self._bump(tx)
+            return applied
+
+        with self.driver.session() as session:
+            return session.execute_write(apply)
+
+    def bulk_add(self, rows, now):
+        def apply(tx):
+            # imported timestamps that do not parse get the import time, like missing ones
+            native = [dict(row, created_at=to_datetime(row.get('created_at')), message_id=message_id(row.get('original_message')))
+                      for row in rows]
+            self._run(tx, "store_messages", messages=message_rows(row.get('original_message') for row in rows))
+            created = self._run(tx, "bulk_add", rows=native, now=to_datetime(now))[0]['created']
+            self._bump(tx)
+            return created
+
+        with self.driver.session() as session:
+            return session.execute_write(apply)
+
+    def purge(self, cutoff, batch_size=10000, progress=None, should_stop=None):
+        counts = {"total": None, "deleted_facts": 0, "deleted_entities": 0, "deleted_messages": 0}
+        should_stop = should_stop or (lambda: False)
+        with self.driver.session() as session:
+            counts['total'] = self._run(session, "count_facts")[0]['count']
+            while not should_stop():
+                deleted = self._run(session, "purge_facts", cutoff=to_datetime(cutoff), cutoff_text=format_time(cutoff),
+                                    batch_size=batch_size)[0]['count']
+                counts['deleted_facts'] += deleted
+                if progress:
+                    progress(**counts)
+                if deleted < batch_size:
+                    break
+            while not should_stop():
+                deleted = self._run(session, "purge_entities", batch_size=batch_size)[0]['count']
+                counts['deleted_entities'] += deleted
+                if progress:
+                    progress(**counts)
+                if deleted < batch_size:
+                    break
+            while not should_stop():
+                deleted = self._run(session, "purge_messages", batch_size=batch_size)[0]['count']
+                counts['deleted_messages'] += deleted
+                if progress:
+                    progress(**counts)
+                if deleted < batch_size:
+                    break
+            self._bump(session)
+        return counts
+
+    def migrate_timestamps(self, batch_size=10000, progress=None, should_stop=None):
+        counts = {"total": None, "converted": 0, "invalid": 0}
+        should_stop = should_stop or (lambda: False)
+        with self.driver.session() as session:
+            counts['total'] = self._run(session, "count_string_timestamps")[0]['count']
+            while not should_stop():
+                records = self._run(session, "string_timestamps", batch_size=batch_size)
+                # strings that are not timestamps become NULL, shown as 'Unknown' like missing ones
+                rows = [{"rid": rec['rid'], "created_at": to_datetime(rec['created_at'])} for rec in records]
+                session.execute_write(lambda tx: self._run(tx, "set_timestamps", rows=rows))
+                counts['converted'] += sum(1 for row in rows if row['created_at'] is not None)
+                counts['invalid'] += sum(1 for row in rows if row['created_at'] is None)
+                if progress:
+                    progress(**counts)
+                if len(rows) < batch_size:
+                    break
+            if counts['converted'] or counts['invalid']:
+                self._bump(session)
+        return counts
+
+    def migrate_messages(self, batch_size=10000, progress=None, should_stop=None):
+        counts = {"total": None, "moved": 0}
+        should_stop = should_stop or (lambda: False)
+
+        def move(tx, records):
+            self._run(tx, "store_messages", messages=message_rows(rec['text'] for rec in records))
+            self._run(tx, "set_message_ids", rows=[{"rid": rec['rid'], "message_id": message_id(rec['text'])}
+                                                   for rec in records])
+
+        with self.driver.session() as session:
+            counts['total'] = self._run(session, "count_inline_messages")[0]['count']
+            while not should_stop():
+                records = self._run(session, "inline_messages", batch_size=batch_size)
+                if records:
+                    session.execute_write(move, records)
+                counts['moved'] += len(records)
+                if progress:
+                    progress(**counts)
+                if len(records) < batch_size:
+                    break
+            if counts['moved']:
+                self._bump(session)
+        return counts
+
+    # ---------------------------
+    # Entities
+    # ---------------------------
+    def entity_names(self):
+        with self.driver.session() as session:
+            return [rec['name'] for rec in self._run(session, "entity_names")]
+
+    def entity_degrees(self):
+        with self.driver.session() as session:
+            return {rec['name']: rec['degree'] for rec in self._run(session, "entity_degrees")}
+
+    def merge_entities(self, pairs):
+        def apply(tx):
+            moved = self._run(tx, "merge_out", pairs=pairs)[0]['moved']
+            moved += self._run(tx, "merge_in", pairs=pairs)[0]['moved']
+            names = sorted({pair['canonical'] for pair in pairs})
+            dropped = self._run(tx, "merge_dedupe", names=names)[0]['dropped']
+            self._run(tx, "merge_aliases", pairs=pairs)
+            self._bump(tx)
+            return {"merged": len(pairs), "moved": moved - dropped, "dropped": dropped}
+
+        if not pairs:
+            return {"merged": 0, "moved": 0, "dropped": 0}
+        with self.driver.session() as session:
+            return session.execute_write(apply)
+
+    def aliases(self):
+        with self.driver.session() as session:
+            return {rec['key']: rec['canonical'] for rec in self._run(session, "aliases")}
+
+    # ---------------------------
+    # Statistics
+    # ---------------------------
+    def fact_counts(self, label_predicates=()):
+        with self.driver.session() as session:
+            groups = [(rec['predicate'], rec['src'], rec['count']) for rec in self._run(session, "fact_counts")]
+            labels = [(rec['predicate'], rec['object'], rec['count'])
+                      for rec in self._run(session, "label_counts", predicates=list(label_predicates))]
+        return count_groups(groups, labels)
+
+    # ---------------------------
+    # Graph analytics
+    # ---------------------------
+    def set_entity_metrics(self, rows, run, batch_size=10000, progress=None, should_stop=None):
+        written = 0
+        should_stop = should_stop or (lambda: False)
+        with self.driver.session() as session:
+            for start in range(0, len(rows), batch_size):
+                if should_stop():
+                    return written
+                chunk = rows[start:start + batch_size]
+                session.execute_write(lambda tx: self._run(tx, "set_entity_metrics", rows=chunk, run=run))
+                written += len(chunk)
+                if progress:
+                    progress(stage="writing", written=written, total=len(rows))
+            while not should_stop():
+                cleared = session.execute_write(
+                    lambda tx: self._run(tx, "clear_entity_metrics", run=run, batch_size=batch_size))[0]['count']
+                if cleared < batch_size:
+                    break
+        return written
+
+    def entity_metrics(self, names=None, community=None, component=None, limit=100):
+        with self.driver.session() as session:
+            return [dict(rec) for rec in self._run(session, "entity_metrics", names=list(names) if names is not None else None,
+                                                   community=community, component=component, limit=limit)]
+
+    # ---------------------------
+    # Async access (neo4j.AsyncGraphDatabase)
+    # ---------------------------
+    @property
+    def async_driver(self):
+        """Opened on first use, so it belongs to the worker and event loop that serve requests"""
+        if self._async_driver is None:
+            self._async_driver = AsyncGraphDatabase.driver(self.uri, auth=self._auth)
+        return self._async_driver
+
+    async def _arun_steps(self, tx, steps):
+        rows = []
+        for statement, params in steps:
+            rows += await self._arun(tx, statement, **params)
+        return [self._plain(row) for row in rows]
+
+    async def _abump(self, tx):
+        try:
+            record = (await self._arun(tx, "bump_version"))[0]
+            return self._bumped(record['version'])
+        except Exception as e:
+            log.error("Failed to bump shared graph version: %s", e)
+
+    async def aget_version(self):
+        async with self.async_driver.session() as session:
+            records = await self._arun(session, "get_version")
+            return records[0]['version'] if records else 0
+
+    async def aquery(self, subject=None, predicate=None, obj=None, limit=None, since=None, until=None):
+        statement, window = self._query_statement(limit, since, until)
+        async with self.async_driver.session() as session:
+            records = await self._arun(session, statement, subject=subject, predicate=predicate, object=obj,
+                                       limit=limit, **window)
+            return [self._plain(rec) for rec in records]
+
+    async def abatch_add(self, rows):
+        async def apply(tx):
+            added = await self._arun_steps(tx, self._add_steps(rows))
+            if added:
+                await self._abump(tx)
+            return added
+
+        async with self.async_driver.session() as session:
+            return await session.execute_write(apply)
+
+    async def aapply_batch(self, adds, update_by_id, update_by_triple, delete_by_id, delete_by_triple,
+                           current_time, new_src, new_original_message):
+        async def apply(tx):
+            applied = {
+                "deleted": await self._arun_steps(tx, self._delete_steps(delete_by_id, delete_by_triple)),
+                "updated": await self._arun_steps(tx, self._update_steps(update_by_id, update_by_triple, current_time,
+                                                                         new_src, new_original_message)),
+                "added": await self._arun_steps(tx, self._add_steps(adds))
+            }
+            if any(applied.values()):
+                await self._abump(tx)
+            return applied
+
+        async with self.async_driver.session() as session:
+            return await session.execute_write(apply)
+
+    async def aclose(self):
+        if self._async_driver is not None:
+            await self._async_driver.close()
+            self._async_driver = None
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    def _query_statement(self, limit, since, until):
+        """Statement name and time-window params of query/aquery"""
+        if since is None and until is None:
+            return ("query_limit" if limit else "query"), {}
+        return ("query_range_limit" if limit else "query_range"), self._window(since, until)
+
+    def query(self, subject=None, predicate=None, obj=None, limit=None, since=None, until=None):
+        statement, window = self._query_statement(limit, since, until)
+        with self.driver.session() as session:
+            records = self._run(session, statement, subject=subject, predicate=predicate, object=obj, limit=limit, **window)
+            return [self._plain(rec) for rec in records]
+
+    def fuzzy_query(self, keyword, threshold=0.8):
+        with self.driver.session() as session:
+            return [self._plain(rec) for rec in self._run(session, "fuzzy_query", keyword=keyword)]
+
+    def get_fact(self, subject, obj, fact_id):
+        with self.driver.session() as session:
+            records = self._run(session, "get_fact", subject=subject, object=obj, id=fact_id)
+            return self._plain(records[0]) if records else None
+
+    def page(self, skip=0, limit=100, since=None, until=None):
+        with self.driver.session() as session:
+            if since is None and until is None:
+                records = self._run(session, "page", skip=skip, limit=limit)
+            else:
+                records = self._run(session, "page_range", skip=skip, limit=limit, **self._window(since, until))
+            return [self._plain(rec) for rec in records]
+
+    def iter_facts(self, predicate=None, src=None, since=None, until=None, chunk_size=5000):
+        statement = "iter_facts" if since is None and until is None else "iter_facts_range"
+        params = {"predicate": predicate, "src": src}
+        if statement == "iter_facts_range":
+            params.update(self._window(since, until))
+        with self.driver.session(fetch_size=chunk_size) as session:
+            # streamed instead of going through _run, so only one chunk is held at a time
+            result = session.run(STATEMENTS[statement], **params)
+            rows = 0
+            chunk = []
+            for rec in result:
+                chunk.append(self._plain(rec))
+                rows += 1
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+            self._record(statement, params, result.consume(), rows)
+
+    def messages(self, ids):
+        with self.driver.session() as session:
+            return {rec['id']: rec['text'] for rec in self._run(session, "messages", ids=list(ids))}
+
+    def neighbors(self, nodes, predicates=None, direction="both", fanout=50):
+        statement = {"out": "neighbors_out", "in": "neighbors_in"}.get(direction, "neighbors")
+        expanded = {name: [] for name in nodes}
+        with self.driver.session() as session:
+            records = self._run(session, statement, names=list(nodes),
+                                predicates=list(predicates) if predicates else None,
+                                fanout=fanout)
+            for rec in records:
+                edges = expanded[rec['node']]
+                if len(edges) < fanout:
+                    fact = {key: rec[key] for key in ("id", "predicate", "src", "version")}
+                    fact['created_at'] = format_time(rec['created_at'])
+                    edges.append((rec['neighbor'], rec['outgoing'], fact))
+        return expanded
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from utils.log import get_logger, sampled
+
+log = get_logger("storage.slowquery")
+
+# statements slower than this (server time, milliseconds) are logged as warnings
+SLOW_QUERY_MS = float(os.getenv("KG_SLOW_QUERY_MS", "100"))
+
+
+def fingerprint(params):
+    """Short, stable hash of parameter values plus their shape (names, types, list sizes).
+    Identifies the call without putting values in the log."""
+    shape = []
+    for key in sorted(params):
+        value = params[key]
+        if isinstance(value, (list, tuple)):
+            shape.append(f"{key}:list[{len(value)}]")
+        else:
+            shape.append(f"{key}:{type(value).__name__}")
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode("utf-8"), digest_size=6)
+    return digest.hexdigest(), ",".join(shape)
+
+
+class QueryLog:
+    """Per-statement timings of storage queries, with a bounded list of recent slow ones.
+
+    Statements are recorded under their canonical name (e.g. "query", "batch_update_by_id"),
+    so the aggregates stay small however many parameter combinations run.
+    """
+
+    def __init__(self, threshold_ms=None, max_slow=200):
+        self.threshold_ms = SLOW_QUERY_MS if threshold_ms is None else threshold_ms
+        self._stats = {}  # name -> counters
+        self._slow = deque(maxlen=max_slow)
+        self._lock = threading.Lock()
+
+    def record(self, name, params, available_ms, consumed_ms, rows):
+        """`available_ms`: until the first record was ready; `consumed_ms`: from then until the
+        last was consumed (the driver's result_available_after / result_consumed_after)."""
+        total_ms = (available_ms or 0) + (consumed_ms or 0)
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "slow": 0}
+            stats["count"] += 1
+            stats["total_ms"] += total_ms
+            stats["max_ms"] = max(stats["max_ms"], total_ms)
+            stats["rows"] += rows
+            slow = total_ms >= self.threshold_ms
+            if slow:
+                stats["slow"] += 1
+
+        if slow:
+            params_hash, params_shape = fingerprint(params)
+            entry = {"statement": name, "available_ms": available_ms, "consumed_ms": consumed_ms,
+                     "total_ms": total_ms, "rows": rows, "params_hash": params_hash,
+                     "params_shape": params_shape, "at": time.time()}
+            with self._lock:
+                self._slow.append(entry)
+            log.warning("Slow query %s: %sms (available after %sms, consumed after %sms), %s rows, params %s [%s]",
+                        name, total_ms, available_ms, consumed_ms, rows, params_hash, params_shape, extra=entry)
+        else:
+            log.debug("Query %s: %sms, %s rows", name, total_ms, rows, extra=sampled())
+
+    def stats(self):
+        with self._lock:
+            statements = {
+                name: dict(stats, avg_ms=round(stats["total_ms"] / stats["count"], 3))
+                for name, stats in self._stats.items()
+            }
+            return {"threshold_ms": self.threshold_ms, "statements": statements, "slow": list(self._slow)}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
@@ -0,0 +1,567 @@
+import difflib
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+
+from storage.base import StorageBackend, count_groups, message_id, message_rows
+from utils.log import get_logger
+from utils.timestamps import canonical
+
+log = get_logger(__name__)
+
+FACT_COLUMNS = "id, subject, predicate, object, created_at, src, message_id, version"
+
+# created_at is ISO text, SQLite's own datetime format; only this exact shape orders correctly
+CANONICAL_GLOB = "[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9]"
+
+
+class SQLiteBackend(StorageBackend):
+    """Embedded fact store in a single SQLite file, no server required.
+
+    Triples live in one indexed `facts` table and message bodies, once each, in
+    `messages`; the graph version and update history are tables in the same
+    file, so every process opening it shares them.
+    """
+
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path="knowledgegraph.db"):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self.ensure_indexes()
+        log.info("Opened SQLite fact store at %s", path)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction; the graph version is bumped inside it by the caller"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def ensure_indexes(self):
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS facts (
+                seq INTEGER PRIMARY KEY,
+                id TEXT,
+                subject TEXT NOT NULL,
+                predicate TEXT NOT NULL,
+                object TEXT NOT NULL,
+                created_at TEXT,
+                src TEXT,
+                original_message TEXT,  -- inline bodies of older stores, see migrate_messages
+                version INTEGER DEFAULT 1,
+                message_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS messages (id TEXT PRIMARY KEY, text TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS facts_triple ON facts (subject, predicate, object);
+            CREATE INDEX IF NOT EXISTS facts_object ON facts (object);
+            CREATE INDEX IF NOT EXISTS facts_predicate ON facts (predicate);
+            CREATE INDEX IF NOT EXISTS facts_id ON facts (id);
+            CREATE INDEX IF NOT EXISTS facts_created_at ON facts (created_at);
+            CREATE TABLE IF NOT EXISTS graph_meta (name TEXT PRIMARY KEY, version INTEGER NOT NULL);
+            INSERT OR IGNORE INTO graph_meta (name, version) VALUES ('graph', 0);
+            CREATE TABLE IF NOT EXISTS update_history (
+                seq INTEGER PRIMARY KEY,
+                fact_id TEXT,
+                subject TEXT,
+                object TEXT,
+                entry TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS update_history_fact ON update_history (fact_id);
+            CREATE TABLE IF NOT EXISTS entity_aliases (key TEXT PRIMARY KEY, canonical TEXT NOT NULL);
+            CREATE INDEX IF NOT EXISTS entity_aliases_canonical ON entity_aliases (canonical);
+            CREATE TABLE IF NOT EXISTS entity_metrics (
+                name TEXT PRIMARY KEY,
+                pagerank REAL,
+                component INTEGER,
+                community INTEGER,
+                run TEXT
+            );
+            CREATE INDEX IF NOT EXISTS entity_metrics_pagerank ON entity_metrics (pagerank);
+            CREATE INDEX IF NOT EXISTS entity_metrics_community ON entity_metrics (community, pagerank);
+        """)
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(facts)")}
+        if "message_id" not in columns:
+            conn.execute("ALTER TABLE facts ADD COLUMN message_id TEXT")
+        conn.execute("CREATE INDEX IF NOT EXISTS facts_message ON facts (message_id)")
+
+    def ping(self):
+        self._connect().execute("SELECT 1").fetchone()
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    @staticmethod
+    def _store_messages(conn, texts):
+        conn.executemany("INSERT OR IGNORE INTO messages (id, text) VALUES (:id, :text)", message_rows(texts))
+
+    # ---------------------------
+    # Version
+    # ---------------------------
+    def _bump(self, conn):
+        conn.execute("UPDATE graph_meta SET version = version + 1 WHERE name = 'graph'")
+        return conn.execute("SELECT version FROM graph_meta WHERE name = 'graph'").fetchone()[0]
+
+    def get_version(self):
+        row = self._connect().execute("SELECT version FROM graph_meta WHERE name = 'graph'").fetchone()
+        return row[0] if row else 0
+
+    # ---------------------------
+    # Single-fact writes
+    # ---------------------------
+    def exists(self, subject, predicate, obj):
+        row = self._connect().execute(
+            "SELECT 1 FROM facts WHERE subject = ? AND predicate = ? AND object = ? LIMIT 1",
+            (subject, predicate, obj)).fetchone()
+        return row is not None
+
+    def add(self, fact):
+        with self._transaction() as conn:
+            self._store_messages(conn, [fact['original_message']])
+            conn.execute(f"INSERT INTO facts ({FACT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (fact['id'], fact['subject'], fact['predicate'], fact['object'], fact['created_at'],
+                          fact['src'], message_id(fact['original_message']), fact['version']))
+            version = self._bump(conn)
+        self._bumped(version)
+
+    def update(self, subject, old_predicate, obj, fact_id, new_predicate, created_at, src, original_message, version):
+        with self._transaction() as conn:
+            self._store_messages(conn, [original_message])
+            cursor = conn.execute("""
+                UPDATE facts SET predicate = ?, created_at = ?, src = ?, message_id = ?, version = ?
+                WHERE subject = ? AND predicate = ? AND object = ? AND id = ?
+            """, (new_predicate, created_at, src, message_id(original_message), version, subject, old_predicate, obj, fact_id))
+            if cursor.rowcount == 0:
+                return False
+            shared_version = self._bump(conn)
+        self._bumped(shared_version)
+        return True
+
+    def delete(self, subject, predicate, obj):
+        with self._transaction() as conn:
+            count = conn.execute("DELETE FROM facts WHERE subject = ? AND predicate = ? AND object = ?",
+                                 (subject, predicate, obj)).rowcount
+            version = self._bump(conn) if count else None
+        self._bumped(version)
+        return count
+
+    # ---------------------------
+    # Batch writes
+    # ---------------------------
+    def _update_rows(self, conn, by_id, by_triple, current_time, new_src, new_original_message):
+        changed = []
+        new_message_id = message_id(new_original_message)
+        lookups = [(item, "id = ?", (item['id'],)) for item in by_id]
+        lookups += [(item, "subject = ? AND predicate = ? AND object = ?",
+                     (item['subject'], item['old_predicate'], item['object'])) for item in by_triple]
+        for item, where, params in lookups:
+            rows = conn.execute(f"SELECT seq, {FACT_COLUMNS} FROM facts WHERE {where}", params).fetchall()
+            for row in rows:
+                if row['predicate'] == item['new_predicate']:
+                    continue
+                old_version = row['version'] or 1
+                conn.execute("""
+                    UPDATE facts SET predicate = ?, created_at = ?, src = ?, message_id = ?, version = ?
+                    WHERE seq = ?
+                """, (item['new_predicate'], current_time, new_src, new_message_id, old_version + 1, row['seq']))
+                changed.append({"idx": item['idx'], "id": row['id'], "subject": row['subject'], "object": row['object'],
+                                "old_predicate": row['predicate'], "old_created_at": row['created_at'],
+                                "old_src": row['src'], "old_message_id": row['message_id'],
+                                "old_version": old_version})
+        if changed:
+            self._store_messages(conn, [new_original_message])
+        return changed
+
+    def _delete_rows(self, conn, by_id, by_triple):
+        deleted = []
+        lookups = [(item, "id = ?", (item['id'],)) for item in by_id]
+        lookups += [(item, "subject = ? AND predicate = ? AND object = ?",
+                     (item['subject'], item['predicate'], item['object'])) for item in by_triple]
+        for item, where, params in lookups:
+            rows = conn.execute(f"SELECT seq, id, subject, predicate, object, src FROM facts WHERE {where}", params).fetchall()
+            for row in rows:
+                conn.execute("DELETE FROM facts WHERE seq = ?", (row['seq'],))
+                deleted.append({"idx": item['idx'], "id": row['id'], "subject": row['subject'],
+                                "predicate": row['predicate'], "object": row['object'], "src": row['src']})
+        return deleted
+
+    def _add_rows(self, conn, rows):
+        added = []
+        self._store_messages(conn, [row['original_message'] for row in rows])
+        for row in rows:
+            cursor = conn.execute(f"""
+                INSERT INTO facts ({FACT_COLUMNS})
+                SELECT ?, ?, ?, ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM facts WHERE subject = ? AND predicate = ? AND object = ?)
+            """, (row['id'], row['subject'], row['predicate'], row['object'], row['created_at'],
+                  row['src'], message_id(row['original_message']), row['version'],
+                  row['subject'], row['predicate'], row['object']))
+            if cursor.rowcount:
+                added.append({"idx": row['idx'], "id": row['id']})
+        return added
+
+    def batch_update(self, by_id, by_triple, current_time, new_src, new_original_message):
+        with self._transaction() as conn:
+            changed = self._update_rows(conn, by_id, by_triple, current_time, new_src, new_original_message)
+            version = self._bump(conn) if changed else None
+        self._bumped(version)
+        return changed
+
+    def batch_delete(self, by_id, by_triple):
+        with self._transaction() as conn:
+            deleted = self._delete_rows(conn, by_id, by_triple)
+            version = self._bump(conn) if deleted else None
+        self._bumped(version)
+        return deleted
+
+    def batch_add(self, rows):
+        with self._transaction() as conn:
+            added = self._add_rows(conn, rows)
+            version = self._bump(conn) if added else None
+        self._bumped(version)
+        return added
+
+    def apply_batch(self, adds, update_by_id, update_by_triple, delete_by_id, delete_by_triple,
+                    current_time, new_src, new_original_message):
+        with self._transaction() as conn:
+            applied = {
+                "deleted": self._delete_rows(conn, delete_by_id, delete_by_triple),
+                "updated": self._update_rows(conn, update_by_id, update_by_triple, current_time, new_src, new_original_message),
+                "added": self._add_rows(conn, adds)
+            }
+            version = self._bump(conn) if any(applied.values()) else None
+        self._bumped(version)
+        return applied
+
+    def bulk_add(self, rows, now):
+        with self._transaction() as conn:
+            created = 0
+            self._store_messages(conn, [row.get('original_message') for row in rows])
+            for row in rows:
+                cursor = conn.execute(f"""
+                    INSERT INTO facts ({FACT_COLUMNS})
+                    SELECT ?, ?, ?, ?, ?, ?, ?, ?
+                    WHERE NOT EXISTS (SELECT 1 FROM facts WHERE subject = ? AND predicate = ? AND object = ?)
+                """, (row.get('id') or str(uuid.uuid4()), row['subject'], row['predicate'], row['object'],
+                      canonical(row.get('created_at')) or now, row.get('src') or 'Bulk Import', message_id(row.get('original_message')),
+                      int(row['version']) if row.get('version') else 1,
+                      row['subject'], row['predicate'], row['object']))
+                created += cursor.rowcount
+            version = self._bump(conn)
+        self._bumped(version)
+        return created
+
+    def purge(self, cutoff, batch_size=10000, progress=None, should_stop=None):
+        # entities only exist through their facts here, so there are none to orphan
+        counts = {"total": None, "deleted_facts": 0, "deleted_entities": 0, "deleted_messages": 0}
+        should_stop = should_stop or (lambda: False)
+        counts['total'] = self._connect().execute("SELECT count(*) FROM facts").fetchone()[0]
+        while not should_stop():
+            with self._transaction() as conn:
+                deleted = conn.execute("""
+                    DELETE FROM facts WHERE seq IN (
+                        SELECT seq FROM facts WHERE created_at IS NULL OR created_at <= ? LIMIT ?
+                    )
+                """, (canonical(cutoff), batch_size)).rowcount
+            counts['deleted_facts'] += deleted
+            if progress:
+                progress(**counts)
+            if deleted < batch_size:
+                break
+        with self._transaction() as conn:
+            counts['deleted_messages'] = conn.execute(
+                "DELETE FROM messages WHERE id NOT IN (SELECT message_id FROM facts WHERE message_id IS NOT NULL)").rowcount
+            version = self._bump(conn)
+        self._bumped(version)
+        return counts
+
+    def migrate_timestamps(self, batch_size=10000, progress=None, should_stop=None):
+        counts = {"total": None, "converted": 0, "invalid": 0}
+        should_stop = should_stop or (lambda: False)
+        counts['total'] = self._connect().execute(
+            "SELECT count(*) FROM facts WHERE created_at IS NOT NULL AND created_at NOT GLOB ?",
+            (CANONICAL_GLOB,)).fetchone()[0]
+        while not should_stop():
+            with self._transaction() as conn:
+                rows = conn.execute("SELECT seq, created_at FROM facts WHERE created_at IS NOT NULL AND created_at NOT GLOB ? LIMIT ?",
+                                    (CANONICAL_GLOB, batch_size)).fetchall()
+                # values that are not timestamps become NULL, shown as 'Unknown' like missing ones
+                converted = [(canonical(row['created_at']), row['seq']) for row in rows]
+                conn.executemany("UPDATE facts SET created_at = ? WHERE seq = ?", converted)
+                version = self._bump(conn) if converted else None
+            self._bumped(version)
+            counts['converted'] += sum(1 for value, _ in converted if value is not None)
+            counts['invalid'] += sum(1 for value, _ in converted if value is None)
+            if progress:
+                progress(**counts)
+            if len(rows) < batch_size:
+                break
+        return counts
+
+    def migrate_messages(self, batch_size=10000, progress=None, should_stop=None):
+        counts = {"total": None, "moved": 0}
+        should_stop = should_stop or (lambda: False)
+        counts['total'] = self._connect().execute(
+            "SELECT count(*) FROM facts WHERE original_message IS NOT NULL").fetchone()[0]
+        while not should_stop():
+            with self._transaction() as conn:
+                rows = conn.execute("SELECT seq, original_message FROM facts WHERE original_message IS NOT NULL LIMIT ?",
+                                    (batch_size,)).fetchall()
+                self._store_messages(conn, [row['original_message'] for row in rows])
+                conn.executemany("UPDATE facts SET message_id = ?, original_message = NULL WHERE seq = ?",
+                                 [(message_id(row['original_message']), row['seq']) for row in rows])
+                version = self._bump(conn) if rows else None
+            self._bumped(version)
+            counts['moved'] += len(rows)
+            if progress:
+                progress(**counts)
+            if len(rows) < batch_size:
+                break
+        return counts
+
+    # ---------------------------
+    # Entities
+    # ---------------------------
+    def entity_names(self):
+        rows = self._connect().execute("SELECT subject FROM facts UNION SELECT object FROM facts").fetchall()
+        return [row[0] for row in rows]
+
+    def entity_degrees(self):
+        rows = self._connect().execute("""
+            SELECT name, count(*) FROM (
+                SELECT subject AS name FROM facts
+                UNION ALL SELECT object FROM facts WHERE object <> subject
+            ) GROUP BY name
+        """).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def merge_entities(self, pairs):
+        counts = {"merged": len(pairs), "moved": 0, "dropped": 0}
+        if not pairs:
+            return counts
+        renames = [(pair['canonical'], pair['alias']) for pair in pairs]
+        aliases = json.dumps([pair['alias'] for pair in pairs])
+        with self._transaction() as conn:
+            counts['moved'] = conn.execute("""
+                SELECT count(*) FROM facts
+                WHERE subject IN (SELECT value FROM json_each(?)) OR object IN (SELECT value FROM json_each(?))
+            """, (aliases, aliases)).fetchone()[0]
+            conn.executemany("UPDATE facts SET subject = ? WHERE subject = ?", renames)
+            conn.executemany("UPDATE facts SET object = ? WHERE object = ?", renames)
+            # triples the canonical entity now holds twice: keep the highest version
+            names = json.dumps(sorted({pair['canonical'] for pair in pairs}))
+            counts['dropped'] = conn.execute("""
+                DELETE FROM facts WHERE seq IN (
+                    SELECT seq FROM (
+                        SELECT seq, row_number() OVER (PARTITION BY subject, predicate, object
+                                                       ORDER BY version DESC, seq) AS rank
+                        FROM facts
+                        WHERE subject IN (SELECT value FROM json_each(?)) OR object IN (SELECT value FROM json_each(?))
+                    ) WHERE rank > 1
+                )
+            """, (names, names)).rowcount
+            counts['moved'] -= counts['dropped']
+            conn.executemany("UPDATE entity_aliases SET canonical = ? WHERE canonical = ?", renames)
+            conn.executemany("INSERT OR REPLACE INTO entity_aliases (key, canonical) VALUES (?, ?)",
+                             [(pair['key'], pair['canonical']) for pair in pairs])
+            version = self._bump(conn)
+        self._bumped(version)
+        return counts
+
+    def aliases(self):
+        rows = self._connect().execute("SELECT key, canonical FROM entity_aliases").fetchall()
+        return {row['key']: row['canonical'] for row in rows}
+
+    # ---------------------------
+    # Statistics
+    # ---------------------------
+    def fact_counts(self, label_predicates=()):
+        conn = self._connect()
+        groups = conn.execute("SELECT predicate, src, count(*) FROM facts GROUP BY predicate, src").fetchall()
+        labels = conn.execute("""
+            SELECT predicate, object, count(*) FROM facts
+            WHERE predicate IN (SELECT value FROM json_each(?))
+            GROUP BY predicate, object
+        """, (json.dumps(list(label_predicates)),)).fetchall()
+        return count_groups([tuple(row) for row in groups], [tuple(row) for row in labels])
+
+    # ---------------------------
+    # Graph analytics
+    # ---------------------------
+    def set_entity_metrics(self, rows, run, batch_size=10000, progress=None, should_stop=None):
+        written = 0
+        for start in range(0, len(rows), batch_size):
+            if should_stop and should_stop():
+                return written
+            chunk = rows[start:start + batch_size]
+            with self._transaction() as conn:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO entity_metrics (name, pagerank, component, community, run)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [(row['name'], row['pagerank'], row['component'], row['community'], run) for row in chunk])
+            written += len(chunk)
+            if progress:
+                progress(stage="writing", written=written, total=len(rows))
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM entity_metrics WHERE run <> ?", (run,))
+        return written
+
+    def entity_metrics(self, names=None, community=None, component=None, limit=100):
+        clauses, params = [], []
+        if names is not None:
+            clauses.append("name IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(names)))
+        for column, value in (("community", community), ("component", component)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(f"""
+            SELECT name, pagerank, component, community FROM entity_metrics {where}
+            ORDER BY pagerank DESC LIMIT ?
+        """, (*params, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    # ---------------------------
+    # Reads
+    # ---------------------------
+    def query(self, subject=None, predicate=None, obj=None, limit=None, since=None, until=None):
+        clauses, params = [], []
+        for column, value in (("subject", subject), ("predicate", predicate), ("object", obj)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        windowed = since is not None or until is not None
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(canonical(since))
+        if until is not None:
+            clauses.append("created_at <= ?")
+            params.append(canonical(until))
+        sql = f"SELECT {FACT_COLUMNS} FROM facts"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC" if windowed else " ORDER BY version DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def fuzzy_query(self, keyword, threshold=0.8):
+        keyword = keyword.lower()
+
+        def close(value):
+            return difflib.SequenceMatcher(None, value.lower(), keyword).ratio() >= threshold
+
+        return [dict(row) for row in self._connect().execute(f"SELECT {FACT_COLUMNS} FROM facts ORDER BY version DESC")
+                if close(row['subject']) or close(row['object']) or close(row['predicate'])]
+
+    def get_fact(self, subject, obj, fact_id):
+        row = self._connect().execute(
+            f"SELECT {FACT_COLUMNS} FROM facts WHERE subject = ? AND object = ? AND id = ? LIMIT 1",
+            (subject, obj, fact_id)).fetchone()
+        return dict(row) if row else None
+
+    def page(self, skip=0, limit=100, since=None, until=None):
+        if since is None and until is None:
+            rows = self._connect().execute(f"SELECT {FACT_COLUMNS} FROM facts ORDER BY seq LIMIT ? OFFSET ?", (limit, skip))
+        else:
+            rows = self._connect().execute(f"""
+                SELECT {FACT_COLUMNS} FROM facts
+                WHERE created_at >= coalesce(?, '') AND created_at <= coalesce(?, '9999-12-31 23:59:59')
+                ORDER BY created_at DESC LIMIT ? OFFSET ?
+            """, (canonical(since), canonical(until), limit, skip))
+        return [dict(row) for row in rows]
+
+    def iter_facts(self, predicate=None, src=None, since=None, until=None, chunk_size=5000):
+        # keyset pagination on seq: each chunk is one short indexed read
+        since, until = canonical(since), canonical(until)
+        last_seq = 0
+        while True:
+            rows = self._connect().execute(f"""
+                SELECT seq, {FACT_COLUMNS} FROM facts
+                WHERE seq > ?
+                  AND (? IS NULL OR predicate = ?)
+                  AND (? IS NULL OR src = ?)
+                  AND (? IS NULL OR created_at >= ?)
+                  AND (? IS NULL OR created_at <= ?)
+                ORDER BY seq LIMIT ?
+            """, (last_seq, predicate, predicate, src, src, since, since, until, until, chunk_size)).fetchall()
+            if not rows:
+                return
+            last_seq = rows[-1]['seq']
+            yield [{key: row[key] for key in row.keys() if key != 'seq'} for row in rows]
+            if len(rows) < chunk_size:
+                return
+
+    def neighbors(self, nodes, predicates=None, direction="both", fanout=50):
+        conn = self._connect()
+        predicate_clause = ""
+        predicate_params = []
+        if predicates:
+            predicate_clause = f" AND predicate IN ({', '.join('?' * len(predicates))})"
+            predicate_params = list(predicates)
+        expanded = {}
+        for node in nodes:
+            edges = []
+            sides = [("subject", "object", True)] if direction == "out" else \
+                [("object", "subject", False)] if direction == "in" else \
+                [("subject", "object", True), ("object", "subject", False)]
+            for column, other, outgoing in sides:
+                if len(edges) >= fanout:
+                    break
+                rows = conn.execute(f"""
+                    SELECT {other} AS neighbor, id, predicate, created_at, src, version FROM facts
+                    WHERE {column} = ?{predicate_clause} LIMIT ?
+                """, [node] + predicate_params + [fanout - len(edges)])
+                for row in rows:
+                    fact = {key: row[key] for key in ("id", "predicate", "created_at", "src", "version")}
+                    edges.append((row['neighbor'], outgoing, fact))
+            expanded[node] = edges
+        return expanded
+
+    def messages(self, ids):
+        rows = self._connect().execute("SELECT id, text FROM messages WHERE id IN (SELECT value FROM json_each(?))",
+                                       (json.dumps(list(ids)),))
+        return {row['id']: row['text'] for row in rows}
+
+    # ---------------------------
+    # Update history
+    # ---------------------------
+    def append_history(self, entries):
+        with self._transaction() as conn:
+            conn.executemany("INSERT INTO update_history (fact_id, subject, object, entry) VALUES (?, ?, ?, ?)",
+                             [(entry['id'], entry['subject'], entry['object'], json.dumps(entry, ensure_ascii=False))
+                              for entry in entries])
+
+    def history(self, subject, obj, fact_id):
+        rows = self._connect().execute(
+            "SELECT entry FROM update_history WHERE fact_id = ? AND subject = ? AND object = ? ORDER BY seq",
+            (fact_id, subject, obj))
+        return [json.loads(row['entry']) for row in rows]
+
+    def clear_history(self):
+        self._connect().execute("DELETE FROM update_history")
@@ -0,0 +1,131 @@
+import heapq
+from collections import defaultdict
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+
+class SubgraphBuilder:
+    """Build a viewport-sized subgraph of a KnowledgeGraph for the Cytoscape view.
+
+    Either an ego-graph around a focus node or, without a focus, the highest-degree
+    part of the in-memory graph. Nodes below the degree threshold that hang off a
+    kept node are aggregated into cluster nodes (one per anchor and predicate)
+    carrying a count, so the result always fits within the node/edge budget.
+    """
+
+    def __init__(self, kg, traversal):
+        self.kg = kg
+        self.traversal = traversal
+
+    def _degree(self, node):
+        graph = self.kg.graph
+        return graph.degree(node) if node in graph else 0
+
+    def _candidate_facts(self, focus, hops, max_edges, predicates):
+        """Facts the view is built from, before pruning and aggregation"""
+        if focus:
+            # over-fetch so pruning has something to aggregate
+            fanout = max(10, max_edges // max(hops, 1))
+            return self.traversal.neighborhood(focus, hops=hops, predicates=predicates, fanout=fanout)["facts"]
+
+        graph = self.kg.graph
+        # jobs mutate the graph on other threads
+        with self.kg.graph_lock:
+            # seed with the top hubs, then take their incident edges up to the budget
+            seeds = heapq.nlargest(max_edges, graph.nodes, key=graph.degree)
+            facts = []
+            seen = set()
+            for node in seeds:
+                for neighbor, edges in graph.succ[node].items():
+                    for key, attr in edges.items():
+                        if predicates and attr.get('predicate') not in predicates:
+                            continue
+                        if (node, neighbor, key) in seen:
+                            continue
+                        seen.add((node, neighbor, key))
+                        facts.append({"subject": node, "predicate": attr.get('predicate'), "object": neighbor, "id": attr.get('id')})
+                for neighbor, edges in graph.pred[node].items():
+                    for key, attr in edges.items():
+                        if predicates and attr.get('predicate') not in predicates:
+                            continue
+                        if (neighbor, node, key) in seen:
+                            continue
+                        seen.add((neighbor, node, key))
+                        facts.append({"subject": neighbor, "predicate": attr.get('predicate'), "object": node, "id": attr.get('id')})
+                if len(facts) >= max_edges * 4:
+                    break
+        return facts
+
+    def build(self, focus=None, hops=1, max_nodes=200, max_edges=400, min_degree=2, predicates=None):
+        facts = self._candidate_facts(focus, hops, max_edges, predicates)
+
+        # local degree within the candidate set, global degree for ranking
+        local_degree = defaultdict(int)
+        for fact in facts:
+            local_degree[fact['subject']] += 1
+            local_degree[fact['object']] += 1
+
+        def score(node):
+            return max(self._degree(node), local_degree[node])
+
+        # keep the focus plus nodes above the threshold, best first, leaving
+        # part of the node budget for cluster nodes
+        ranked = sorted(local_degree, key=score, reverse=True)
+        kept_budget = max(1, int(max_nodes * 0.8))
+        kept = set()
+        if focus and focus in local_degree:
+            kept.add(focus)
+        for node in ranked:
+            if len(kept) >= kept_budget:
+                break
+            if score(node) >= min_degree:
+                kept.add(node)
+
+        nodes = {}
+        edges = []
+        clusters = {}
+        dropped_edges = 0
+        for fact in facts:
+            subj, obj, predicate = fact['subject'], fact['object'], fact['predicate']
+            subj_kept, obj_kept = subj in kept, obj in kept
+            if subj_kept and obj_kept:
+                if len(edges) >= max_edges:
+                    dropped_edges += 1
+                    continue
+                for name in (subj, obj):
+                    if name not in nodes:
+                        nodes[name] = {"id": name, "label": name, "degree": self._degree(name), "cluster": False}
+                edges.append({"source": subj, "target": obj, "predicate": predicate, "id": fact.get('id'), "count": 1})
+            elif subj_kept or obj_kept:
+                # low-degree leaf hanging off a kept node: fold into a cluster
+                anchor, outgoing = (subj, True) if subj_kept else (obj, False)
+                cluster_key = (anchor, predicate, outgoing)
+                clusters[cluster_key] = clusters.get(cluster_key, 0) + 1
+            else:
+                dropped_edges += 1
+
+        # largest clusters first so the budget goes to the most informative ones
+        for (anchor, predicate, outgoing), count in sorted(clusters.items(), key=lambda item: item[1], reverse=True):
+            # the cluster node, plus its anchor if not placed yet, must fit the node budget
+            if len(nodes) + (anchor not in nodes) + 1 > max_nodes or len(edges) >= max_edges:
+                dropped_edges += count
+                continue
+            if anchor not in nodes:
+                nodes[anchor] = {"id": anchor, "label": anchor, "degree": self._degree(anchor), "cluster": False}
+            cluster_id = f"cluster:{anchor}:{predicate}:{'out' if outgoing else 'in'}"
+            nodes[cluster_id] = {"id": cluster_id, "label": f"{count} more", "degree": count, "cluster": True, "count": count}
+            if outgoing:
+                edges.append({"source": anchor, "target": cluster_id, "predicate": predicate, "count": count})
+            else:
+                edges.append({"source": cluster_id, "target": anchor, "predicate": predicate, "count": count})
+
+        log.debug("Subgraph built: %s nodes, %s edges, %s clusters, %s edges dropped", len(nodes), len(edges), len(clusters), dropped_edges)
+        return {
+            "focus": focus,
+            "nodes": list(nodes.values()),
+            "edges": edges,
+            "truncated": dropped_edges > 0,
+            "total_nodes": self.kg.graph.number_of_nodes(),
+            "total_edges": self.kg.graph.number_of_edges()
+        }
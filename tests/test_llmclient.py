@@ -0,0 +1,105 @@
+"""Circuit breaker of llmclient.LLMClient against utils/mock_openai.py.
+
+    python -m pytest tests
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llmclient import CircuitBreaker, LLMClient, LLMUnavailable  # noqa: E402
+from utils.mock_openai import MockOpenAIHandler, MockOpenAIServer  # noqa: E402
+
+RESET = 0.3
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.options = argparse.Namespace(latency=0.0, error_rate=0.0, rate_limit_rate=0.0, hang_rate=0.0,
+                                         hang_seconds=0.0, verbose=False)
+        MockOpenAIHandler.options = cls.options
+        cls.server = MockOpenAIServer(("127.0.0.1", 0), MockOpenAIHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.options.error_rate = 0.0
+        self.breaker = CircuitBreaker(failure_threshold=2, reset_timeout=RESET)
+        self.client = self._client(self.base_url + "/v1")
+
+    def _client(self, base_url, **kwargs):
+        return LLMClient(api_key="mock", base_url=base_url, timeout=2.0, max_retries=0,
+                         breaker=self.breaker, **kwargs)
+
+    def _complete(self, client=None):
+        return (client or self.client).complete("test", model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+
+    def _open(self):
+        self.options.error_rate = 1.0
+        for _ in range(self.breaker.failure_threshold):
+            with self.assertRaises(LLMUnavailable):
+                self._complete()
+        self.assertEqual(self.breaker.state, "open")
+        self.options.error_rate = 0.0
+
+    def test_open_half_open_recovery(self):
+        self.assertTrue(self._complete().choices[0].message.content)
+        self._open()
+        # open: calls are refused without reaching the provider
+        with self.assertRaisesRegex(LLMUnavailable, "circuit breaker is open"):
+            self._complete()
+        time.sleep(RESET)
+        self.assertEqual(self.breaker.state, "half_open")
+        self._complete()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_failed_trial_reopens(self):
+        self._open()
+        time.sleep(RESET)
+        self.options.error_rate = 1.0
+        with self.assertRaises(LLMUnavailable):
+            self._complete()
+        self.assertEqual(self.breaker.state, "open")
+        self.options.error_rate = 0.0
+        time.sleep(RESET)
+        self._complete()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_non_retryable_trial_releases_breaker(self):
+        self._open()
+        time.sleep(RESET)
+        # a 404 is not a provider failure: it settles nothing, but must not keep the trial taken
+        with self.assertRaises(Exception) as raised:
+            self._complete(self._client(self.base_url + "/missing"))
+        self.assertNotIsInstance(raised.exception, LLMUnavailable)
+        self.assertEqual(self.breaker.state, "half_open")
+        self._complete()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_trial_without_slot_releases_breaker(self):
+        client = self._client(self.base_url + "/v1", max_concurrency=1)
+        self._open()
+        time.sleep(RESET)
+        client._slots.acquire()
+        try:
+            with self.assertRaisesRegex(LLMUnavailable, "concurrency limit"):
+                client.complete("test", timeout=0.1, model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+        finally:
+            client._slots.release()
+        self._complete(client)
+        self.assertEqual(self.breaker.state, "closed")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,13 @@
+import os
 import docker
 import subprocess
 import time
+from neo4j import GraphDatabase
+from utils.log import get_logger
+
+log = get_logger(__name__)
+
+DEFAULT_NEO4J_URI = "bolt://localhost:7687"
 
 def ensure_docker_running(max_retries=3, retry_interval=5):
     for attempt in range(max_retries):
@@ -11,15 +18,15 @@ def ensure_docker_running(max_retries=3, retry_interval=5):
                 text=True,
                 check=True
             )
-            print("Docker service is running")
+            log.info("Docker service is running")
             return True
         except subprocess.CalledProcessError as e:
-            print(f"Docker service is not running (attempt {attempt + 1}/{max_retries}): {e.stderr}")
+            log.warning("Docker service is not running (attempt %s/%s): %s", attempt + 1, max_retries, e.stderr)
             if attempt < max_retries - 1:
-                print(f"Retrying after {retry_interval} seconds...")
+                log.info("Retrying after %s seconds...", retry_interval)
                 time.sleep(retry_interval)
         except FileNotFoundError:
-            print("Docker CLI not installed, please install Docker Desktop")
+            log.error("Docker CLI not installed, please install Docker Desktop")
             raise Exception("Docker CLI is unavailable")
     raise Exception("Docker service is unavailable, please check Docker Desktop or CLI configuration")
 
@@ -30,9 +37,9 @@ def start_neo4j_container():
         container = client.containers.get(container_name)
         if container.status != "running":
             container.start()
-            print("Neo4j container started")
+            log.info("Neo4j container started")
         else:
-            print("Neo4j container is already running")
+            log.info("Neo4j container is already running")
     except docker.errors.NotFound:
         client.containers.run(
             image="neo4j:latest",
@@ -45,9 +52,44 @@ def start_neo4j_container():
             ],
             detach=True
         )
-        print("Neo4j container created and started with APOC")
-        time.sleep(15)  
+        log.info("Neo4j container created and started with APOC")
     except docker.errors.APIError as e:
-        print(f"Docker API error: {str(e)}")
+        log.error("Docker API error: %s", e)
         raise
     return client
+
+def wait_for_neo4j(uri=DEFAULT_NEO4J_URI, user="neo4j", password="password", timeout=60, poll_interval=0.5):
+    """Poll the bolt endpoint until Neo4j accepts connections, instead of sleeping a fixed time"""
+    deadline = time.monotonic() + timeout
+    attempt = 0
+    while True:
+        attempt += 1
+        driver = None
+        try:
+            driver = GraphDatabase.driver(uri, auth=(user, password))
+            driver.verify_connectivity()
+            log.info("Neo4j is ready at %s (attempt %s)", uri, attempt)
+            return True
+        except Exception as e:
+            if time.monotonic() >= deadline:
+                log.warning("Neo4j not ready at %s after %ss: %s", uri, timeout, e)
+                return False
+            time.sleep(poll_interval)
+        finally:
+            if driver:
+                driver.close()
+
+def bootstrap_neo4j(uri=None, user="neo4j", password="password", timeout=60):
+    """Make sure a Neo4j instance is reachable.
+
+    When an external NEO4J_URI is configured, Docker management is skipped and
+    only bolt readiness is checked; otherwise the local container is started.
+    """
+    external_uri = uri or os.getenv("NEO4J_URI")
+    if external_uri:
+        log.info("Using external Neo4j at %s, skipping Docker management", external_uri)
+        return wait_for_neo4j(external_uri, user, password, timeout=timeout)
+
+    ensure_docker_running()
+    start_neo4j_container()
+    return wait_for_neo4j(DEFAULT_NEO4J_URI, user, password, timeout=timeout)
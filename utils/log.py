@@ -0,0 +1,142 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+
+# LOG_LEVEL         DEBUG, INFO (default), WARNING, ERROR
+# LOG_FORMAT        text (default) or json (one object per line)
+# LOG_SAMPLE_DEBUG  fraction of DEBUG records kept, e.g. 0.01 (default 1)
+# LOG_SAMPLE_INFO   fraction of INFO records kept (default 1)
+# LOG_SAMPLE_HOT    fraction kept of per-fact records marked with sampled() (default 0.1)
+# Warnings and errors are never sampled.
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+HOT_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_HOT", "0.1"))
+
+_listener = None
+_queue_handler = None
+_settings = None  # (level, fmt, rates, stream) from configure_logging
+
+
+def get_logger(name):
+    return logging.getLogger(name)
+
+
+def sampled(rate=None):
+    """`extra=` for a high-volume record kept with probability `rate` (LOG_SAMPLE_HOT by default)"""
+    return {"sample_rate": HOT_SAMPLE_RATE if rate is None else rate}
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a random fraction of DEBUG/INFO records; per-record `sample_rate` wins"""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates  # level -> fraction kept
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _RecordQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue the record itself rather than QueueHandler's formatted copy.
+
+    Only the message arguments are merged here (they may change after the call
+    returns); exc_info and stack_info stay on the record for the listener's
+    formatter, which QueueHandler.prepare would have folded into the message.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record; fields passed with `extra=` are included"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and key != "sample_rate":
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _start(level, fmt, rates, stream):
+    global _listener, _queue_handler
+    if fmt == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    output = logging.StreamHandler(stream)
+    output.setFormatter(formatter)
+
+    # callers only merge the message arguments and enqueue; formatting and I/O happen on the listener thread
+    records = queue.SimpleQueue()
+    _queue_handler = _RecordQueueHandler(records)
+    _queue_handler.addFilter(SamplingFilter(rates))
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+
+def configure_logging(level=None, fmt=None, sample_debug=None, sample_info=None, stream=None):
+    """Route all loggers through a non-blocking queue handler (idempotent)"""
+    global _settings
+    if _listener is not None:
+        return
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("LOG_FORMAT", "text")).lower()
+    rates = {
+        logging.DEBUG: float(sample_debug if sample_debug is not None else os.getenv("LOG_SAMPLE_DEBUG", "1")),
+        logging.INFO: float(sample_info if sample_info is not None else os.getenv("LOG_SAMPLE_INFO", "1"))
+    }
+    _settings = (level, fmt, rates, stream or sys.stderr)
+    _start(*_settings)
+    atexit.register(shutdown_logging)
+
+
+def restart_after_fork():
+    """The listener thread does not survive fork; give the child its own queue and thread"""
+    global _listener
+    if _settings is None:
+        return
+    _listener = None  # the inherited listener's thread is gone; do not join it
+    _start(*_settings)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,109 @@
+"""Minimal OpenAI-compatible server for exercising the LLM client layer locally.
+
+    python -m utils.mock_openai --port 8001 --latency 0.2 --error-rate 0.1
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=mock python app.py
+
+Serves POST /v1/chat/completions and GET /v1/models. Requests asking for a JSON
+object get an intent reply (everything is a query); other requests get a short
+canned answer. Latency, 500s, 429s and hung requests can be injected to see how
+deadlines, retries and the circuit breaker behave when the provider degrades.
+"""
+import argparse
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    options = None  # argparse namespace, set by serve()
+
+    def log_message(self, format, *args):
+        if self.options.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/v1/models":
+            self._send(200, {"object": "list", "data": [{"id": "gpt-4o", "object": "model", "owned_by": "mock"}]})
+        else:
+            self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/v1/chat/completions":
+            self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        options = self.options
+
+        roll = random.random()
+        if roll < options.hang_rate:
+            time.sleep(options.hang_seconds)
+        elif roll < options.hang_rate + options.error_rate:
+            self._send(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+        elif roll < options.hang_rate + options.error_rate + options.rate_limit_rate:
+            self._send(429, {"error": {"message": "Injected rate limit", "type": "rate_limit_error"}})
+            return
+        time.sleep(max(0.0, random.gauss(options.latency, options.latency / 4)))
+
+        messages = request.get("messages") or [{}]
+        prompt = str(messages[-1].get("content", ""))
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            content = json.dumps({"add": [], "update": [], "delete": [],
+                                  "query": {"keywords": prompt.split()[-5:]}})
+        else:
+            content = f"Mock answer ({len(prompt)} prompt characters)."
+        self._send(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(content.split()),
+                      "total_tokens": len(prompt.split()) + len(content.split())}
+        })
+
+
+class MockOpenAIServer(ThreadingHTTPServer):
+    # a deep accept backlog, so bursts from the async client are not refused
+    request_queue_size = 1024
+
+
+def serve(options):
+    MockOpenAIHandler.options = options
+    server = MockOpenAIServer((options.host, options.port), MockOpenAIHandler)
+    print(f"Mock OpenAI server on http://{options.host}:{options.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean response time in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction that stall for --hang-seconds")
+    parser.add_argument("--hang-seconds", type=float, default=120.0)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    serve(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
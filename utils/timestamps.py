@@ -0,0 +1,58 @@
+"""Fact timestamps.
+
+At the API, in the update history and in job parameters a timestamp is a
+'%Y-%m-%d %H:%M:%S' string in local time. Storage backends keep native values:
+LocalDateTime in Neo4j, the same ISO text (SQLite's own datetime format, which
+orders chronologically) in SQLite and the memory backend.
+"""
+import re
+from datetime import datetime, timedelta
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_DURATION = re.compile(r"^(\d+)\s*([smhdw])$")
+_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def to_datetime(value):
+    """Naive local datetime of a timestamp string, datetime or neo4j temporal value.
+    None for missing or unparseable values ('Unknown')."""
+    if value is None:
+        return None
+    if hasattr(value, "to_native"):  # neo4j.time.DateTime
+        value = value.to_native()
+    if not isinstance(value, datetime):
+        try:
+            value = datetime.fromisoformat(str(value).strip())
+        except ValueError:
+            return None
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
+def canonical(value):
+    """The canonical string of a timestamp, None when it is missing or unparseable"""
+    parsed = to_datetime(value)
+    return parsed.strftime(TIME_FORMAT) if parsed else None
+
+
+def format_time(value):
+    """The canonical string of a timestamp; values that are not timestamps pass through"""
+    parsed = to_datetime(value)
+    return parsed.strftime(TIME_FORMAT) if parsed else value
+
+
+def parse_bound(value):
+    """A since/until filter: a timestamp ('2024-05-01', '2024-05-01 12:00:00', ISO 8601)
+    or a duration back from now ('30m', '1h', '7d', '2w'). Returns the canonical
+    string, None when empty; raises ValueError otherwise."""
+    if value is None or not str(value).strip():
+        return None
+    match = _DURATION.match(str(value).strip().lower())
+    if match:
+        return (datetime.now() - timedelta(**{_UNITS[match[2]]: int(match[1])})).strftime(TIME_FORMAT)
+    parsed = to_datetime(value)
+    if parsed is None:
+        raise ValueError(f"Invalid time {value!r}: use YYYY-MM-DD[ HH:MM:SS] or a duration like 1h")
+    return parsed.strftime(TIME_FORMAT)
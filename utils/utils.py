@@ -1,9 +1,13 @@
 import re
 
-DEBUG_ENABLED = True  
+from utils.log import get_logger
+
+_debug_log = get_logger("debug")
+
+
 def debug_print(message):
-    if DEBUG_ENABLED:
-        print(f"[DEBUG] {message}")
+    """Kept for old call sites; goes to the "debug" logger (see LOG_LEVEL)"""
+    _debug_log.debug("%s", message)
 
 # Define extract_entities function (if not already present)
 def extract_entities(user_input):